@@ -0,0 +1,101 @@
+"""
+Cross-request cache of subscription validity and plan features.
+
+Subscription state changes a few times a year, so it is cached per
+company instead of being read from the database on every request.
+Entries expire no later than the moment the subscription itself
+expires, and are invalidated by signals whenever a CompanySubscription
+or SubscriptionPlan is saved (see accounts.signals).
+
+The cache alias is configurable with TENANT_CACHE_ALIAS, so a shared
+backend such as Redis can be used across workers.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .metrics import record_cache
+from .models import CompanySubscription
+
+
+@dataclass(frozen=True)
+class SubscriptionState:
+    """Snapshot of a company's subscription as seen by access checks."""
+
+    has_subscription: bool = False
+    is_valid: bool = False
+    has_inventory: bool = True
+    has_pos: bool = True
+    max_users: int = 0
+    max_products: int = 0
+
+
+def get_cache():
+    return caches[getattr(settings, 'TENANT_CACHE_ALIAS', 'default')]
+
+
+def cache_key(company_id):
+    return f'tenant:subscription:{company_id}'
+
+
+def get_subscription_state(company_id):
+    """Return the cached SubscriptionState for a company, loading it on a miss."""
+    cache = get_cache()
+    state = cache.get(cache_key(company_id))
+    record_cache('tenant', state is not None)
+    if state is None:
+        subscription = CompanySubscription.objects.select_related('plan').filter(
+            company_id=company_id
+        ).first()
+        state = build_subscription_state(subscription)
+        cache.set(cache_key(company_id), state, get_timeout(subscription))
+    return state
+
+
+def build_subscription_state(subscription):
+    if subscription is None:
+        return SubscriptionState()
+
+    plan = subscription.plan
+    return SubscriptionState(
+        has_subscription=True,
+        is_valid=bool(subscription.is_valid),
+        has_inventory=plan.has_inventory,
+        has_pos=plan.has_pos,
+        max_users=plan.max_users,
+        max_products=plan.max_products,
+    )
+
+
+def get_timeout(subscription):
+    """Cache lifetime in seconds, never outliving the subscription's validity."""
+    timeout = getattr(settings, 'TENANT_CACHE_TIMEOUT', 3600)
+    if subscription is None or not subscription.is_valid:
+        return timeout
+
+    if subscription.status == CompanySubscription.Status.TRIAL:
+        last_valid_day = subscription.trial_end_date
+    else:
+        last_valid_day = subscription.end_date
+
+    # is_valid compares against timezone.now().date(), i.e. the UTC date
+    expires_at = datetime.combine(
+        last_valid_day + timedelta(days=1), time.min, tzinfo=dt_timezone.utc
+    )
+    remaining = int((expires_at - timezone.now()).total_seconds())
+    return max(1, min(timeout, remaining))
+
+
+def invalidate_company(company_id):
+    get_cache().delete(cache_key(company_id))
+
+
+def invalidate_plan(plan_id):
+    company_ids = CompanySubscription.objects.filter(
+        plan_id=plan_id
+    ).values_list('company_id', flat=True)
+    get_cache().delete_many([cache_key(company_id) for company_id in company_ids])
@@ -0,0 +1,297 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms are sharded per thread: each thread updates its
+own dict without taking a lock, and the shards are only summed when the
+metrics endpoint is scraped. Shards of finished threads are folded into
+a retired total, so thread-per-request servers do not grow them without
+bound. The registry lives in the worker process; scrape each worker (or
+run one worker with several threads) to see all of the traffic.
+
+Business metrics are labelled by company id, request metrics by URL
+name and user role. Company is deliberately not a label of the request
+metrics, which would multiply their series by the number of companies.
+
+MetricsMiddleware records request latency, DB queries per view and the
+tills (cashiers) seen recently; the POS and inventory code records the
+rest. The endpoint is /metrics, protected by METRICS_TOKEN.
+"""
+
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .models import User
+
+
+# Registered metrics, in exposition order
+REGISTRY = []
+
+# Upper bounds of the default latency buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Live shards per metric before finished threads are folded on write
+MAX_SHARDS = 64
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Metric:
+    """A named metric with fixed label names and per-thread shards of values keyed by label values."""
+    
+    kind = None
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = {}
+        REGISTRY.append(self)
+    
+    def shard(self):
+        """This thread's values; registered under the lock on the thread's first write only."""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                if len(self._shards) >= MAX_SHARDS:
+                    self.fold()
+                self._shards.append((threading.current_thread(), values))
+            return values
+    
+    def key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def fold(self):
+        """Merge shards of finished threads into the retired total (caller holds the lock)."""
+        live = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                live.append((thread, values))
+            else:
+                self.merge(self._retired, values)
+        self._shards = live
+    
+    def collect(self):
+        """Label values -> value, summed over all shards."""
+        with self._lock:
+            self.fold()
+            total = {}
+            self.merge(total, self._retired)
+            for thread, values in self._shards:
+                # dict.copy() runs without releasing the GIL, so a writing thread cannot interleave
+                self.merge(total, values.copy())
+        return total
+    
+    def merge(self, into, values):
+        raise NotImplementedError
+    
+    def samples(self):
+        """(name suffix, label pairs, value) tuples for the exposition."""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+    
+    kind = 'counter'
+    
+    def inc(self, amount=1, **labels):
+        values = self.shard()
+        key = self.key(labels)
+        values[key] = values.get(key, 0) + amount
+    
+    def merge(self, into, values):
+        for key, value in values.items():
+            into[key] = into.get(key, 0) + value
+    
+    def samples(self):
+        for key, value in sorted(self.collect().items()):
+            yield '', tuple(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    """Distribution of observed values over fixed buckets, with their sum and count."""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+    
+    def observe(self, value, **labels):
+        values = self.shard()
+        key = self.key(labels)
+        counts = values.get(key)
+        if counts is None:
+            # One slot per bucket, then the sum
+            counts = values[key] = [0] * (len(self.buckets) + 1)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        counts[-1] += value
+    
+    def merge(self, into, values):
+        for key, counts in values.items():
+            total = into.setdefault(key, [0] * len(counts))
+            for i, count in enumerate(counts):
+                total[i] += count
+    
+    def samples(self):
+        for key, counts in sorted(self.collect().items()):
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield '_bucket', labels + (('le', format_value(bound)),), cumulative
+            yield '_sum', labels, counts[-1]
+            yield '_count', labels, cumulative
+
+
+class ActiveTills:
+    """Gauge of the cashiers per company that made a request in the last METRICS_ACTIVE_TILL_SECONDS."""
+    
+    kind = 'gauge'
+    
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        # (company_id, cashier_id) -> last request, monotonic seconds
+        self._seen = {}
+        REGISTRY.append(self)
+    
+    def seen(self, company_id, cashier_id):
+        self._seen[(company_id, cashier_id)] = time.monotonic()
+    
+    def samples(self):
+        cutoff = time.monotonic() - settings.METRICS_ACTIVE_TILL_SECONDS
+        tills = {}
+        for key, last in list(self._seen.items()):
+            if last < cutoff:
+                self._seen.pop(key, None)
+            else:
+                tills[key[0]] = tills.get(key[0], 0) + 1
+        for company_id, count in sorted(tills.items()):
+            yield '', (('company', str(company_id)),), count
+
+
+def exposition():
+    """All registered metrics in the Prometheus text format (version 0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for suffix, labels, value in metric.samples():
+            lines.append(f'{metric.name}{suffix}{format_labels(labels)} {format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+# =============================================================================
+# METRICS
+# =============================================================================
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Request latency by URL name and user role.',
+    ('view', 'role'),
+)
+VIEW_QUERIES = Histogram(
+    'http_db_queries', 'Database queries per request by URL name and user role.',
+    ('view', 'role'), buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+CHECKOUT_SECONDS = Histogram(
+    'pos_checkout_duration_seconds', 'Checkout latency by outcome (completed, rejected, error).',
+    ('company', 'outcome'),
+)
+SALE_ITEMS = Histogram(
+    'pos_sale_items', 'Lines per completed sale.',
+    ('company',), buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+BARCODE_LOOKUPS = Counter(
+    'pos_barcode_lookups_total', 'Barcode/SKU scans by result (hit, miss).',
+    ('company', 'result'),
+)
+APPROVAL_BATCH_SIZE = Histogram(
+    'inventory_approval_batch_size', 'Transactions approved or rejected per bulk action.',
+    ('company', 'action'), buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by cache (tenant, product_index, autocomplete) and result (hit, miss).',
+    ('cache', 'result'),
+)
+ACTIVE_TILLS = ActiveTills(
+    'pos_active_tills', 'Cashiers with a request in the last METRICS_ACTIVE_TILL_SECONDS.',
+)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+# =============================================================================
+# MIDDLEWARE
+# =============================================================================
+
+class QueryCounter:
+    """Execute wrapper counting statements."""
+    
+    def __init__(self):
+        self.count = 0
+    
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Record latency and DB queries of every request, and the tills seen; removed when METRICS_ENABLED is off."""
+    
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        queries = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        
+        # URL names, never paths, so the number of series stays bounded
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        user = getattr(request, 'user', None)
+        role = (user.role or 'none') if user is not None and user.is_authenticated else 'anonymous'
+        
+        REQUEST_SECONDS.observe(duration, view=view, role=role)
+        VIEW_QUERIES.observe(queries.count, view=view, role=role)
+        if role == User.Role.CASHIER and user.company_id:
+            ACTIVE_TILLS.seen(user.company_id, user.pk)
+        return response
@@ -0,0 +1,77 @@
+"""Middleware for accounts app."""
+
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Optional
+
+from django.utils.functional import SimpleLazyObject
+
+from .cache import SubscriptionState, get_subscription_state
+from .models import CompanySubscription, User
+
+
+@dataclass(frozen=True)
+class TenantContext:
+    """Company and cached subscription state of the current user, resolved once per request."""
+
+    user: Optional[User] = None
+    state: SubscriptionState = field(default_factory=SubscriptionState)
+
+    @property
+    def company_id(self):
+        return self.user.company_id if self.user else None
+
+    @property
+    def company(self):
+        """Company row, loaded on first access (cached on request.user)."""
+        return self.user.company if self.company_id else None
+
+    @property
+    def is_valid(self):
+        """Check if the company's subscription allows access."""
+        return self.state.is_valid
+
+    @property
+    def has_inventory(self):
+        """Companies without a subscription are not blocked by plan features."""
+        return self.state.has_inventory
+
+    @property
+    def has_pos(self):
+        return self.state.has_pos
+
+    @cached_property
+    def subscription(self):
+        """Full subscription row, only loaded by views that display it."""
+        if not self.company_id or not self.state.has_subscription:
+            return None
+        return CompanySubscription.objects.select_related('plan').filter(
+            company_id=self.company_id
+        ).first()
+
+    @property
+    def plan(self):
+        return self.subscription.plan if self.subscription else None
+
+
+def get_tenant(request):
+    """Resolve the user's cached subscription state; the company loads lazily."""
+    user = request.user
+    if not user.is_authenticated or not user.company_id:
+        return TenantContext()
+
+    return TenantContext(
+        user=user,
+        state=get_subscription_state(user.company_id),
+    )
+
+
+class TenantMiddleware:
+    """Attach a lazily resolved TenantContext as request.tenant."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.tenant = SimpleLazyObject(lambda: get_tenant(request))
+        return self.get_response(request)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-17 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_company_tax_enabled_company_tax_number'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['company', 'role'], name='user_company_role_idx'),
+        ),
+    ]
@@ -223,6 +223,9 @@ class User(AbstractUser):
     class Meta:
         verbose_name = 'مستخدم'
         verbose_name_plural = 'المستخدمين'
+        indexes = [
+            models.Index(fields=['company', 'role'], name='user_company_role_idx'),
+        ]
     
     def __str__(self):
         return self.get_full_name() or self.username
@@ -0,0 +1,259 @@
+"""
+SQL profiling of requests.
+
+When settings.SQL_PROFILING is on, SQLProfilingMiddleware records every
+statement of a sampled request with its fingerprint (the SQL with
+literals and placeholder lists normalised away), duration and call site
+(the innermost frame in the project's own code). Fingerprints repeated
+N_PLUS_ONE times or more in one request are reported as N+1 suspects.
+
+Each profiled request is written as one JSON line to a rotating log;
+the platform performance page aggregates the most recent records from
+that log, so it covers every worker on the host.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from contextlib import ExitStack
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+
+logger = logging.getLogger('accounts.profiling')
+
+# Records read by the performance page, newest first
+PAGE_RECORDS = 5000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+_SPACE = re.compile(r'\s+')
+
+_PROJECT_ROOT = str(settings.BASE_DIR) + os.sep
+
+# Project modules that sit between the app code and the database; never blamed
+INFRASTRUCTURE = {
+    os.path.join('accounts', 'profiling.py'),
+    os.path.join('accounts', 'metrics.py'),
+    os.path.join('accounts', 'tracing.py'),
+    os.path.join('accounts', 'middleware.py'),
+}
+
+# App modules that issue queries on purpose, preferred as the call site
+APP_MODULES = {'views.py', 'models.py', 'services.py'}
+
+
+def fingerprint(sql):
+    """Normalise a statement so the same query with other values compares equal."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('?...', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def call_site():
+    """
+    'app/file.py:line function' of the app code running the query.
+    
+    The innermost views, models or services frame wins, so a query run
+    while rendering a template is blamed on the view that rendered it;
+    otherwise the innermost project frame outside INFRASTRUCTURE.
+    """
+    fallback = ''
+    frame = sys._getframe(2)
+    while frame:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PROJECT_ROOT) and 'site-packages' not in filename:
+            path = os.path.relpath(filename, _PROJECT_ROOT)
+            if path not in INFRASTRUCTURE:
+                site = f'{path}:{frame.f_lineno} {frame.f_code.co_name}'
+                if os.path.basename(path) in APP_MODULES:
+                    return site
+                fallback = fallback or site
+        frame = frame.f_back
+    return fallback
+
+
+class QueryProfile:
+    """Execute wrapper collecting (fingerprint, duration, call site) of each statement."""
+    
+    def __init__(self):
+        self.statements = []
+    
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.statements.append({
+                'fingerprint': fingerprint(sql),
+                'ms': round((time.perf_counter() - started) * 1000, 3),
+                'site': call_site(),
+            })
+    
+    @property
+    def sql_ms(self):
+        return round(sum(statement['ms'] for statement in self.statements), 3)
+    
+    def n_plus_one(self):
+        """Fingerprints run at least N_PLUS_ONE times, with their count and call sites."""
+        repeated = {}
+        for statement in self.statements:
+            entry = repeated.setdefault(statement['fingerprint'], {'count': 0, 'sites': set()})
+            entry['count'] += 1
+            entry['sites'].add(statement['site'])
+        return [
+            {'fingerprint': key, 'count': entry['count'], 'sites': sorted(entry['sites'])}
+            for key, entry in repeated.items()
+            if entry['count'] >= settings.SQL_PROFILING_N_PLUS_ONE
+        ]
+
+
+def get_logger():
+    """The profiling logger, with the rotating file handler attached on first use."""
+    if not logger.handlers:
+        path = settings.SQL_PROFILING_LOG
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(
+            path, maxBytes=settings.SQL_PROFILING_LOG_MAX_BYTES,
+            backupCount=settings.SQL_PROFILING_LOG_BACKUPS, encoding='utf-8'
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+class SQLProfilingMiddleware:
+    """Profile the SQL of a sample of requests; removed entirely when SQL_PROFILING is off."""
+    
+    def __init__(self, get_response):
+        if not settings.SQL_PROFILING:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        if random.random() >= settings.SQL_PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        
+        profile = QueryProfile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        
+        match = getattr(request, 'resolver_match', None)
+        get_logger().info(json.dumps({
+            'time': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else '',
+            'status': response.status_code,
+            'ms': round(duration * 1000, 3),
+            'queries': len(profile.statements),
+            'sql_ms': profile.sql_ms,
+            'n_plus_one': profile.n_plus_one(),
+            'statements': profile.statements,
+        }, ensure_ascii=False))
+        return response
+
+
+# =============================================================================
+# REPORT
+# =============================================================================
+
+def read_records(limit=PAGE_RECORDS):
+    """The most recent profiled requests, newest first, from the log and its backups."""
+    path = settings.SQL_PROFILING_LOG
+    files = [path] + [f'{path}.{n}' for n in range(1, settings.SQL_PROFILING_LOG_BACKUPS + 1)]
+    
+    records = []
+    for name in files:
+        try:
+            with open(name, encoding='utf-8') as log:
+                lines = log.readlines()
+        except FileNotFoundError:
+            continue
+        for line in reversed(lines):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+            if len(records) >= limit:
+                return records
+    return records
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[max(0, -(-len(values) * p // 100) - 1)] if values else 0
+
+
+def summarize(records):
+    """Slowest views, heaviest fingerprints and N+1 suspects over profiled requests."""
+    views = {}
+    fingerprints = {}
+    suspects = {}
+    
+    for record in records:
+        view = views.setdefault(record['view'] or record['path'], {'durations': [], 'queries': 0, 'sql_ms': 0})
+        view['durations'].append(record['ms'])
+        view['queries'] += record['queries']
+        view['sql_ms'] += record['sql_ms']
+        
+        for statement in record['statements']:
+            entry = fingerprints.setdefault(statement['fingerprint'], {'count': 0, 'ms': 0, 'sites': {}})
+            entry['count'] += 1
+            entry['ms'] += statement['ms']
+            entry['sites'][statement['site']] = entry['sites'].get(statement['site'], 0) + 1
+        
+        for suspect in record['n_plus_one']:
+            key = (record['view'], suspect['fingerprint'])
+            entry = suspects.setdefault(key, {'requests': 0, 'max_count': 0, 'sites': set()})
+            entry['requests'] += 1
+            entry['max_count'] = max(entry['max_count'], suspect['count'])
+            entry['sites'].update(suspect['sites'])
+    
+    view_rows = sorted((
+        {
+            'view': name,
+            'requests': len(view['durations']),
+            'avg_ms': sum(view['durations']) / len(view['durations']),
+            'p95_ms': percentile(view['durations'], 95),
+            'avg_queries': view['queries'] / len(view['durations']),
+            'avg_sql_ms': view['sql_ms'] / len(view['durations']),
+        }
+        for name, view in views.items()
+    ), key=lambda row: -row['p95_ms'])
+    
+    fingerprint_rows = sorted((
+        {
+            'fingerprint': key,
+            'count': entry['count'],
+            'total_ms': entry['ms'],
+            'avg_ms': entry['ms'] / entry['count'],
+            'site': max(entry['sites'], key=entry['sites'].get),
+        }
+        for key, entry in fingerprints.items()
+    ), key=lambda row: -row['total_ms'])
+    
+    suspect_rows = sorted((
+        {'view': view, 'fingerprint': key, **entry, 'sites': sorted(entry['sites'])}
+        for (view, key), entry in suspects.items()
+    ), key=lambda row: (-row['requests'], -row['max_count']))
+    
+    return {'views': view_rows, 'fingerprints': fingerprint_rows, 'suspects': suspect_rows}
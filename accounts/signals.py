@@ -0,0 +1,17 @@
+"""Signal handlers for accounts app."""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_company, invalidate_plan
+from .models import CompanySubscription, SubscriptionPlan
+
+
+@receiver([post_save, post_delete], sender=CompanySubscription)
+def subscription_changed(sender, instance, **kwargs):
+    invalidate_company(instance.company_id)
+
+
+@receiver(post_save, sender=SubscriptionPlan)
+def plan_changed(sender, instance, **kwargs):
+    invalidate_plan(instance.pk)
@@ -0,0 +1,101 @@
+"""Tests for the accounts app."""
+
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+
+from inventory.models import Category
+from . import profiling, tracing
+from .models import Company, CompanySubscription, SubscriptionPlan, User
+
+
+class SQLProfilingTests(TestCase):
+    """Statements are attributed to the app code that issued them."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        plan = SubscriptionPlan.objects.create(name='plan', max_products=100, max_users=10)
+        company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        CompanySubscription.objects.create(
+            company=company, plan=plan, status=CompanySubscription.Status.ACTIVE,
+            start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=30)
+        )
+        cls.accountant = User.objects.create_user(
+            username='accountant', password='password', company=company, role=User.Role.ACCOUNTANT
+        )
+        for i in range(3):
+            Category.objects.create(company=company, name=f'category {i}')
+    
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.directory = Path(directory)
+        settings = override_settings(
+            SQL_PROFILING=True, SQL_PROFILING_SAMPLE_RATE=1.0,
+            SQL_PROFILING_LOG=str(self.directory / 'sql_profile.log'),
+            TRACING_LOG=str(self.directory / 'traces.jsonl'),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.reset_logger()
+        self.addCleanup(self.reset_logger)
+    
+    def reset_logger(self):
+        for logger in (profiling.logger, tracing.logger):
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+                handler.close()
+    
+    def get(self, path):
+        client = Client()
+        client.force_login(self.accountant)
+        self.assertEqual(client.get(path).status_code, 200)
+        return profiling.read_records()[0]
+    
+    def test_template_query_is_blamed_on_the_view(self):
+        record = self.get('/inventory/categories/')
+        
+        # {{ category.products.count }} runs while the template renders
+        counts = [
+            statement for statement in record['statements']
+            if statement['fingerprint'].startswith('SELECT COUNT(*)')
+            and 'inventory_product' in statement['fingerprint']
+        ]
+        self.assertEqual(len(counts), 3)
+        for statement in counts:
+            self.assertTrue(statement['site'].startswith('inventory/views.py:'), statement['site'])
+            self.assertIn('categories_view', statement['site'])
+    
+    def test_infrastructure_is_never_blamed(self):
+        record = self.get('/inventory/categories/')
+        
+        for statement in record['statements']:
+            self.assertFalse(
+                statement['site'].startswith(tuple(profiling.INFRASTRUCTURE)), statement['site']
+            )
+    
+    @override_settings(TRACING=True, TRACING_SAMPLE_RATE=1.0, TRACING_OTEL=False)
+    def test_profiling_with_tracing(self):
+        """The tracing template backend sits between the view and the query, but is not blamed."""
+        record = self.get('/inventory/categories/')
+        
+        sites = {statement['site'] for statement in record['statements']}
+        self.assertFalse([site for site in sites if site.startswith('accounts/tracing.py')], sites)
+        counts = [
+            statement for statement in record['statements']
+            if statement['fingerprint'].startswith('SELECT COUNT(*)')
+        ]
+        self.assertTrue(counts)
+        for statement in counts:
+            self.assertIn('categories_view', statement['site'])
+        
+        spans = [json.loads(line) for line in (self.directory / 'traces.jsonl').read_text().splitlines()]
+        self.assertIn('template', {span['name'] for span in spans})
+        self.assertEqual(
+            len([span for span in spans if span['name'] == 'sql']), len(record['statements'])
+        )
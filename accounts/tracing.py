@@ -0,0 +1,240 @@
+"""
+Request tracing with nested timing spans.
+
+TracingMiddleware starts a trace for a sampled request when
+settings.TRACING is on. Inside it, span() and @traced open child spans:
+the access decorators of accounts.views, the business methods of the
+inventory and POS models, every SQL statement and the rendering of each
+template (through the DjangoTemplates backend below). Outside a trace
+they only cost a context variable lookup, so they can stay in place.
+
+A finished trace is written to a rotating JSON-lines log, one span per
+line. With TRACING_OTEL the spans are also replayed into the
+OpenTelemetry API (the opentelemetry-api package), so whatever exporter
+the deployment configured ships them to its collector.
+"""
+
+import json
+import logging
+import os
+import random
+import secrets
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+from django.template.backends import django as django_backend
+
+from .profiling import fingerprint
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+
+logger = logging.getLogger('accounts.tracing')
+
+# The innermost open span of the current request, or None outside a trace
+_current = ContextVar('tracing_span', default=None)
+
+
+class Span:
+    """A timed, named step of a trace; a context manager that becomes the current span while open."""
+    
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'attributes', 'start_ns', 'duration_ns', 'started', 'token')
+    
+    def __init__(self, trace, name, parent_id=None, attributes=None):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes or {}
+        self.duration_ns = 0
+    
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+    
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self.started = time.perf_counter_ns()
+        self.token = _current.set(self)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ns = time.perf_counter_ns() - self.started
+        _current.reset(self.token)
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        self.trace.spans.append(self)
+    
+    def as_dict(self):
+        return {
+            'trace_id': self.trace.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start_ns / 1e9,
+            'ms': round(self.duration_ns / 1e6, 3),
+            'attributes': self.attributes,
+        }
+
+
+class NullSpan:
+    """Stands in for a span outside a trace."""
+    
+    def set(self, **attributes):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Trace:
+    """Spans of one request, in the order they finished."""
+    
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+
+
+def start_trace(name, **attributes):
+    """Root span of a new trace; the trace is in root.trace once the span has closed."""
+    return Span(Trace(), name, attributes=attributes)
+
+
+def span(name, **attributes):
+    """Child span of the current span, or a no-op outside a trace."""
+    parent = _current.get()
+    if parent is None:
+        return NULL_SPAN
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+
+def traced(name=None):
+    """Decorator running the function in a span named after it (its qualified name by default)."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# =============================================================================
+# SINKS
+# =============================================================================
+
+def get_logger():
+    """The trace logger, with the rotating file handler attached on first use."""
+    if not logger.handlers:
+        path = settings.TRACING_LOG
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(
+            path, maxBytes=settings.TRACING_LOG_MAX_BYTES,
+            backupCount=settings.TRACING_LOG_BACKUPS, encoding='utf-8'
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def write_jsonl(trace):
+    get_logger().info('\n'.join(
+        json.dumps(item.as_dict(), ensure_ascii=False, default=str) for item in trace.spans
+    ))
+
+
+def export_otel(trace):
+    """Replay the finished spans, with their original times and nesting, into the OpenTelemetry API."""
+    tracer = otel_trace.get_tracer('accounts.tracing')
+    opened = {}
+    for item in sorted(trace.spans, key=lambda item: item.start_ns):
+        parent = opened.get(item.parent_id)
+        opened[item.span_id] = tracer.start_span(
+            item.name,
+            context=otel_trace.set_span_in_context(parent) if parent else None,
+            start_time=item.start_ns,
+            attributes={
+                key: value if isinstance(value, (str, bool, int, float)) else str(value)
+                for key, value in item.attributes.items() if value is not None
+            },
+        )
+    for item in trace.spans:
+        opened[item.span_id].end(end_time=item.start_ns + item.duration_ns)
+
+
+# =============================================================================
+# MIDDLEWARE
+# =============================================================================
+
+def trace_sql(execute, sql, params, many, context):
+    """Execute wrapper running each statement in an 'sql' span."""
+    with span('sql', statement=fingerprint(sql)):
+        return execute(sql, params, many, context)
+
+
+class TracingMiddleware:
+    """Trace a sample of requests; removed entirely when TRACING is off."""
+    
+    def __init__(self, get_response):
+        if not settings.TRACING:
+            raise MiddlewareNotUsed()
+        if settings.TRACING_OTEL and otel_trace is None:
+            raise ImproperlyConfigured('TRACING_OTEL needs the opentelemetry-api package.')
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        if random.random() >= settings.TRACING_SAMPLE_RATE:
+            return self.get_response(request)
+        
+        root = start_trace('request', method=request.method, path=request.path)
+        with root, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(trace_sql))
+            response = self.get_response(request)
+            match = getattr(request, 'resolver_match', None)
+            root.set(view=match.view_name if match else '', status=response.status_code)
+        
+        write_jsonl(root.trace)
+        if settings.TRACING_OTEL:
+            export_otel(root.trace)
+        return response
+
+
+# =============================================================================
+# TEMPLATES
+# =============================================================================
+
+class Template(django_backend.Template):
+    """Template whose render() runs in a 'template' span."""
+    
+    def render(self, context=None, request=None):
+        with span('template', template=self.origin.template_name):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The Django template backend, returning templates that trace their rendering."""
+    
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+    
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
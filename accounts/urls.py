@@ -19,6 +19,7 @@ urlpatterns = [
     path('platform/', views.platform_dashboard, name='platform_dashboard'),
     path('platform/companies/', views.platform_companies, name='platform_companies'),
     path('platform/companies/<int:company_id>/approve/', views.approve_company, name='approve_company'),
+    path('platform/perf/', views.platform_perf, name='platform_perf'),
     path('platform/plans/', views.platform_plans, name='platform_plans'),
     path('platform/plans/add/', views.add_plan, name='add_plan'),
     path('platform/plans/<int:plan_id>/edit/', views.edit_plan, name='edit_plan'),
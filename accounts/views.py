@@ -4,9 +4,12 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponseForbidden
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.conf import settings
 from functools import wraps
+import hmac
 
+from . import metrics, profiling, tracing
 from .models import User, Company, CompanySubscription, SubscriptionPlan
 from .forms import CompanyRegistrationForm, CustomAuthenticationForm, UserForm, CompanySettingsForm, SubscriptionPlanForm
 
@@ -20,9 +23,10 @@ def platform_manager_required(view_func):
     @wraps(view_func)
     @login_required
     def wrapper(request, *args, **kwargs):
-        if not request.user.is_platform_manager:
-            messages.error(request, 'هذه الصفحة مخصصة لمدير المنصة فقط.')
-            return redirect('accounts:login')
+        with tracing.span('platform_manager_required'):
+            if not request.user.is_platform_manager:
+                messages.error(request, 'هذه الصفحة مخصصة لمدير المنصة فقط.')
+                return redirect('accounts:login')
         return view_func(request, *args, **kwargs)
     return wrapper
 
@@ -32,9 +36,10 @@ def company_manager_required(view_func):
     @wraps(view_func)
     @login_required
     def wrapper(request, *args, **kwargs):
-        if not request.user.is_company_manager:
-            messages.error(request, 'هذه الصفحة مخصصة لمدير الشركة فقط.')
-            return redirect('accounts:login')
+        with tracing.span('company_manager_required'):
+            if not request.user.is_company_manager:
+                messages.error(request, 'هذه الصفحة مخصصة لمدير الشركة فقط.')
+                return redirect('accounts:login')
         return view_func(request, *args, **kwargs)
     return wrapper
 
@@ -44,19 +49,19 @@ def company_required(view_func):
     @wraps(view_func)
     @login_required
     def wrapper(request, *args, **kwargs):
-        if not request.user.company:
-            messages.error(request, 'يجب أن تنتمي إلى شركة للوصول إلى هذه الصفحة.')
-            return redirect('accounts:login')
-        
-        # Check subscription validity
-        try:
-            subscription = request.user.company.subscription
-            if not subscription.is_valid:
+        with tracing.span('company_required'):
+            tenant = request.tenant
+            if not tenant.company_id:
+                messages.error(request, 'يجب أن تنتمي إلى شركة للوصول إلى هذه الصفحة.')
+                return redirect('accounts:login')
+            
+            # Check subscription validity
+            if not tenant.state.has_subscription:
+                messages.error(request, 'شركتك ليس لديها اشتراك فعال.')
+                return redirect('accounts:subscription_status')
+            if not tenant.is_valid:
                 messages.warning(request, 'اشتراك شركتك منتهي أو في انتظار التفعيل.')
                 return redirect('accounts:subscription_status')
-        except CompanySubscription.DoesNotExist:
-            messages.error(request, 'شركتك ليس لديها اشتراك فعال.')
-            return redirect('accounts:subscription_status')
         
         return view_func(request, *args, **kwargs)
     return wrapper
@@ -165,16 +170,11 @@ def registration_pending(request):
 @login_required
 def subscription_status(request):
     """Show subscription status for company users."""
-    if not request.user.company:
+    if not request.tenant.company:
         return redirect('accounts:login')
     
-    try:
-        subscription = request.user.company.subscription
-    except CompanySubscription.DoesNotExist:
-        subscription = None
-    
     return render(request, 'accounts/subscription_status.html', {
-        'subscription': subscription
+        'subscription': request.tenant.subscription
     })
 
 
@@ -238,6 +238,18 @@ def approve_company(request, company_id):
     return redirect('accounts:platform_companies')
 
 
+@platform_manager_required
+def platform_perf(request):
+    """Slowest views, heaviest SQL and N+1 suspects from the SQL profiling log."""
+    records = profiling.read_records()
+    return render(request, 'accounts/platform/perf.html', {
+        'enabled': settings.SQL_PROFILING,
+        'sample_rate': settings.SQL_PROFILING_SAMPLE_RATE,
+        'records_count': len(records),
+        **profiling.summarize(records),
+    })
+
+
 @platform_manager_required
 def platform_plans(request):
     """Manage subscription plans."""
@@ -304,23 +316,21 @@ def delete_plan(request, plan_id):
 @company_required
 def company_dashboard(request):
     """Company manager dashboard."""
-    company = request.user.company
+    company = request.tenant.company
     users = company.users.all()
     
     # Get subscription info
-    try:
-        subscription = company.subscription
-    except CompanySubscription.DoesNotExist:
-        subscription = None
+    subscription = request.tenant.subscription
+    plan = request.tenant.plan
     
     context = {
         'company': company,
         'subscription': subscription,
         'users': users,
         'user_count': users.count(),
-        'user_limit': subscription.plan.max_users if subscription else 0,
+        'user_limit': plan.max_users if plan else 0,
         'product_count': company.products.count(),
-        'product_limit': subscription.plan.max_products if subscription else 0,
+        'product_limit': plan.max_products if plan else 0,
     }
     return render(request, 'accounts/company/dashboard.html', context)
 
@@ -329,16 +339,16 @@ def company_dashboard(request):
 @company_required
 def company_users(request):
     """Manage company users."""
-    company = request.user.company
+    company = request.tenant.company
     users = company.users.exclude(id=request.user.id)
-    subscription = company.subscription
+    max_users = request.tenant.state.max_users
     
-    can_add_user = users.count() < subscription.plan.max_users - 1  # -1 for manager
+    can_add_user = users.count() < max_users - 1  # -1 for manager
     
     return render(request, 'accounts/company/users.html', {
         'users': users,
         'can_add_user': can_add_user,
-        'user_limit': subscription.plan.max_users
+        'user_limit': max_users
     })
 
 
@@ -346,11 +356,10 @@ def company_users(request):
 @company_required
 def add_user(request):
     """Add a new user to the company."""
-    company = request.user.company
-    subscription = company.subscription
+    company = request.tenant.company
     
     # Check user limit
-    if company.users.count() >= subscription.plan.max_users:
+    if company.users.count() >= request.tenant.state.max_users:
         messages.error(request, 'لقد وصلت إلى الحد الأقصى للمستخدمين في خطتك.')
         return redirect('accounts:company_users')
     
@@ -378,7 +387,7 @@ def add_user(request):
 @company_required
 def edit_user(request, user_id):
     """Edit a company user."""
-    company = request.user.company
+    company = request.tenant.company
     user = get_object_or_404(User, id=user_id, company=company)
     
     # Prevent editing self
@@ -411,7 +420,7 @@ def delete_user(request, user_id):
     return redirect('accounts:company_users')
     """Delete a company user."""
     if request.method == 'POST':
-        company = request.user.company
+        company = request.tenant.company
         user = get_object_or_404(User, id=user_id, company=company)
         
         # Prevent deleting self
@@ -429,7 +438,7 @@ def delete_user(request, user_id):
 @company_required
 def company_settings(request):
     """Company settings including tax configuration."""
-    company = request.user.company
+    company = request.tenant.company
     
     if request.method == 'POST':
         form = CompanySettingsForm(request.POST, request.FILES, instance=company)
@@ -441,3 +450,20 @@ def company_settings(request):
         form = CompanySettingsForm(instance=company)
     
     return render(request, 'accounts/company/settings.html', {'form': form})
+
+
+# =============================================================================
+# METRICS
+# =============================================================================
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, authenticated with the METRICS_TOKEN bearer token."""
+    token = settings.METRICS_TOKEN
+    if not token:
+        raise Http404
+    
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        return HttpResponseForbidden()
+    
+    return HttpResponse(metrics.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
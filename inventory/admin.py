@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product, Transaction, TransactionItem
+from .models import Category, Product, Transaction, TransactionItem, StockMovement, RepresentativeCustody
 
 
 class TransactionItemInline(admin.TabularInline):
@@ -34,10 +34,33 @@ class TransactionAdmin(admin.ModelAdmin):
     
     @admin.action(description='Approve selected transactions')
     def approve_transactions(self, request, queryset):
-        for transaction in queryset.filter(status='pending'):
-            transaction.approve(request.user)
+        queryset.approve_all(request.user)
     
     @admin.action(description='Reject selected transactions')
     def reject_transactions(self, request, queryset):
-        for transaction in queryset.filter(status='pending'):
-            transaction.reject(request.user)
+        queryset.reject_all(request.user)
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ['product', 'delta', 'reason', 'sale', 'transaction', 'created_at']
+    list_filter = ['reason', 'product__company']
+    search_fields = ['product__name', 'product__sku']
+    readonly_fields = ['product', 'delta', 'reason', 'sale', 'transaction', 'created_at']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RepresentativeCustody)
+class RepresentativeCustodyAdmin(admin.ModelAdmin):
+    list_display = ['user', 'product', 'quantity', 'updated_at']
+    list_filter = ['user__company']
+    search_fields = ['user__username', 'product__name']
+    readonly_fields = ['user', 'product', 'quantity', 'updated_at']
@@ -73,8 +73,20 @@ class ProductForm(forms.ModelForm):
     
     def __init__(self, *args, company=None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.company = company
         if company:
             self.fields['category'].queryset = Category.objects.filter(company=company)
+    
+    def clean_barcode(self):
+        """Barcodes must be unique within a company."""
+        barcode = self.cleaned_data.get('barcode', '').strip()
+        if barcode and self.company:
+            duplicates = Product.objects.filter(
+                company=self.company, barcode=barcode
+            ).exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise forms.ValidationError('هذا الباركود مستخدم لمنتج آخر.')
+        return barcode
 
 
 class TransactionForm(forms.ModelForm):
@@ -0,0 +1,25 @@
+"""Recompute Product.search_key in primary-key chunks."""
+
+from django.core.management.base import BaseCommand
+
+from inventory.models import Product
+from inventory.search import backfill_search_keys
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute Product.search_key. Run after changing the normalisation rules '
+        'in inventory.search or after bulk loads that bypass Product.save().'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Only backfill products of this company id.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Products per batch.')
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['company']:
+            products = products.filter(company_id=options['company'])
+
+        updated = backfill_search_keys(products, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated search_key on {updated} products.'))
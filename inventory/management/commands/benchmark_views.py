@@ -0,0 +1,363 @@
+"""Benchmark every project URL and compare against a JSON baseline."""
+
+import json
+import statistics
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.transaction import atomic, set_rollback
+from django.template.backends.django import Template as DjangoTemplate
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+import accounts.urls
+import pos.urls
+import reports.urls
+from accounts.models import Company, CompanySubscription, SubscriptionPlan, User
+from inventory import urls as project_urls
+from inventory.models import Category, Product, Transaction
+from pos.models import Sale
+from .check_query_plans import busiest_company
+
+
+DEFAULT_BASELINE = settings.BASE_DIR / 'benchmarks' / 'views.json'
+
+# URL namespaces that are benchmarked, with their patterns
+NAMESPACES = {
+    'accounts': accounts.urls.urlpatterns,
+    'inventory': project_urls.inventory_patterns,
+    'pos': pos.urls.urlpatterns,
+    'reports': reports.urls.urlpatterns,
+}
+
+
+class Route:
+    """
+    How to request one URL: as which role, with which method, URL
+    kwargs (mapped to subject names) and GET/POST data (a function of
+    the subjects). role None requests anonymously.
+    """
+    
+    def __init__(self, role, method='get', kwargs=None, data=None):
+        self.role = role
+        self.method = method
+        self.kwargs = kwargs or {}
+        self.data = data or (lambda subjects: {})
+
+
+ROUTES = {
+    # Accounts
+    'accounts:login': Route(None),
+    'accounts:logout': Route('cashier', 'post'),
+    'accounts:register': Route(None),
+    'accounts:registration_pending': Route(None),
+    'accounts:subscription_status': Route('cashier'),
+    'accounts:platform_dashboard': Route('platform'),
+    'accounts:platform_companies': Route('platform'),
+    'accounts:approve_company': Route('platform', 'post', {'company_id': 'pending_company'}),
+    'accounts:platform_perf': Route('platform'),
+    'accounts:platform_plans': Route('platform'),
+    'accounts:add_plan': Route('platform'),
+    'accounts:edit_plan': Route('platform', kwargs={'plan_id': 'plan'}),
+    'accounts:delete_plan': Route('platform', 'post', {'plan_id': 'scratch_plan'}),
+    'accounts:company_dashboard': Route('manager'),
+    'accounts:company_users': Route('manager'),
+    'accounts:add_user': Route('manager'),
+    'accounts:edit_user': Route('manager', kwargs={'user_id': 'cashier'}),
+    'accounts:delete_user': Route('manager', 'post', {'user_id': 'scratch_user'}),
+    'accounts:company_settings': Route('manager'),
+    
+    # Inventory
+    'inventory:dashboard': Route('accountant'),
+    'inventory:categories': Route('accountant'),
+    'inventory:add_category': Route('accountant'),
+    'inventory:edit_category': Route('accountant', kwargs={'category_id': 'category'}),
+    'inventory:delete_category': Route('accountant', 'post', {'category_id': 'scratch_category'}),
+    'inventory:products': Route('accountant'),
+    'inventory:add_product': Route('accountant'),
+    'inventory:edit_product': Route('accountant', kwargs={'product_id': 'product'}),
+    'inventory:delete_product': Route('accountant', 'post', {'product_id': 'scratch_product'}),
+    'inventory:transactions': Route('accountant'),
+    'inventory:approve_transaction': Route('accountant', 'post', {'transaction_id': 'pending_transaction'}),
+    'inventory:reject_transaction': Route('accountant', 'post', {'transaction_id': 'pending_transaction'}),
+    'inventory:bulk_transactions': Route('accountant', 'post', data=lambda s: {
+        'action': 'approve', 'transaction_ids': [s['pending_transaction'].pk],
+    }),
+    'inventory:representatives': Route('accountant'),
+    'inventory:representative_detail': Route('accountant', kwargs={'rep_id': 'representative'}),
+    'inventory:rep_dashboard': Route('representative'),
+    'inventory:rep_transactions': Route('representative'),
+    'inventory:rep_request': Route('representative'),
+    
+    # POS
+    'pos:interface': Route('cashier'),
+    'pos:checkout': Route('cashier', 'post', data=lambda s: {
+        'cart': json.dumps([{'id': s['product'].pk, 'quantity': 1}]),
+        'payment_method': Sale.PaymentMethod.CASH,
+        'amount_paid': str(s['product'].price * 2),
+    }),
+    'pos:receipt': Route('cashier', kwargs={'sale_id': 'sale'}),
+    'pos:history': Route('cashier'),
+    'pos:daily_summary': Route('cashier'),
+    'pos:search_products': Route('cashier', data=lambda s: {'q': s['product'].name.split()[0]}),
+    'pos:autocomplete': Route('cashier', data=lambda s: {'q': s['product'].name[:2]}),
+    'pos:get_by_barcode': Route('cashier', data=lambda s: {'barcode': s['product'].barcode}),
+    'pos:catalog': Route('cashier'),
+    'pos:products': Route('cashier'),
+    
+    # Reports
+    'reports:sales': Route('manager'),
+    'reports:profit': Route('manager'),
+    'reports:profit_api': Route('manager'),
+}
+
+
+class QueryRecorder:
+    """Database execute wrapper counting queries and their time."""
+    
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+    
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += perf_counter() - started
+            self.count += 1
+
+
+@contextmanager
+def render_timer():
+    """Time spent in Template.render, including queries evaluated lazily by templates."""
+    timer = {'seconds': 0.0}
+    original = DjangoTemplate.render
+    
+    def render(self, *args, **kwargs):
+        started = perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            timer['seconds'] += perf_counter() - started
+    
+    DjangoTemplate.render = render
+    try:
+        yield timer
+    finally:
+        DjangoTemplate.render = original
+
+
+def url_names():
+    return [
+        f'{namespace}:{pattern.name}'
+        for namespace, patterns in NAMESPACES.items()
+        for pattern in patterns
+        if pattern.name
+    ]
+
+
+def route_url(name, route, found):
+    return reverse(name, kwargs={kwarg: found[subject].pk for kwarg, subject in route.kwargs.items()})
+
+
+def subjects(company_id):
+    """
+    Users and objects the routes act on. Scratch objects are created for
+    routes that delete or approve; the benchmark runs in a transaction
+    that is rolled back, so nothing is kept.
+    """
+    company = Company.objects.get(pk=company_id)
+    users = User.objects.filter(company=company).order_by('pk')
+    found = {
+        'manager': users.filter(role=User.Role.COMPANY_MANAGER).first(),
+        'accountant': users.filter(role=User.Role.ACCOUNTANT).first(),
+        'representative': users.filter(role=User.Role.REPRESENTATIVE).first(),
+        'cashier': users.filter(role=User.Role.CASHIER).first(),
+        'category': Category.objects.filter(company=company).first(),
+        'product': Product.objects.filter(company=company, is_active=True, stock__gt=0).order_by('pk').first(),
+    }
+    missing = [name for name, value in found.items() if value is None]
+    if missing:
+        raise CommandError(f'Company #{company_id} has no {", ".join(missing)}; seed it with seed_load_data.')
+    
+    found['sale'] = Sale.objects.filter(cashier=found['cashier']).first()
+    if found['sale'] is None:
+        raise CommandError(f'Cashier #{found["cashier"].pk} has no sales; seed the company with seed_load_data.')
+    
+    plan = company.subscription.plan
+    found.update({
+        'platform': User.objects.filter(role=User.Role.PLATFORM_MANAGER).first() or User.objects.create(
+            username='benchmark_platform', role=User.Role.PLATFORM_MANAGER
+        ),
+        'plan': plan,
+        'scratch_plan': SubscriptionPlan.objects.create(name='benchmark'),
+        'scratch_user': User.objects.create(
+            username='benchmark_user', company=company, role=User.Role.CASHIER
+        ),
+        'scratch_category': Category.objects.create(company=company, name='benchmark'),
+        'scratch_product': Product.objects.create(company=company, name='benchmark'),
+        'pending_transaction': Transaction.objects.create(
+            company=company, user=found['representative'], type=Transaction.Type.PAYMENT, amount=1
+        ),
+    })
+    pending_company = Company.objects.create(name='benchmark', email='benchmark@example.com', phone='0')
+    CompanySubscription.objects.create(company=pending_company, plan=plan)
+    found['pending_company'] = pending_company
+    return found
+
+
+class Command(BaseCommand):
+    help = (
+        'Request every URL of the accounts, inventory, POS and reports apps with the '
+        'right role against a seeded database (see seed_load_data), recording query '
+        'count, SQL time, template render time, total time and response size. '
+        'Results are compared with a JSON baseline and the command fails when a view '
+        'runs more queries or gets slower beyond the thresholds. All writes are '
+        'rolled back.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Company id to benchmark (default: the one with most products).')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON file.')
+        parser.add_argument('--save', action='store_true', help='Write the results as the new baseline.')
+        parser.add_argument('--repeat', type=int, default=5, help='Measured requests per URL, after one warm-up request.')
+        parser.add_argument('--route', help='Only benchmark URL names containing this text.')
+        parser.add_argument('--threshold', type=float, default=0.25, help='Allowed relative slowdown of the median total time.')
+        parser.add_argument('--min-ms', type=float, default=10, help='Slowdowns below this many milliseconds are ignored.')
+        parser.add_argument('--query-threshold', type=int, default=0, help='Allowed extra queries per request.')
+    
+    def handle(self, *args, **options):
+        names = url_names()
+        unknown = sorted(set(names) - set(ROUTES))
+        if unknown:
+            raise CommandError(f'No benchmark route for: {", ".join(unknown)}. Add them to ROUTES.')
+        if options['route']:
+            names = [name for name in names if options['route'] in name]
+        
+        company_id = options['company'] or busiest_company()
+        if company_id is None:
+            raise CommandError('No products found; seed the database first.')
+        
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), atomic():
+            found = subjects(company_id)
+            results = {name: self.measure(name, found, options['repeat']) for name in names}
+            set_rollback(True)
+        
+        baseline = self.load(options['baseline'])
+        regressions = self.report(results, baseline.get('routes', {}), options)
+        
+        if options['save']:
+            self.save(options['baseline'], baseline, results, company_id, options)
+        if regressions:
+            raise CommandError(f'{len(regressions)} views regressed: {", ".join(regressions)}')
+        self.stdout.write(self.style.SUCCESS(f'Benchmarked {len(results)} views, no regressions.'))
+    
+    def measure(self, name, found, repeat):
+        route = ROUTES[name]
+        client = Client()
+        if route.role:
+            client.force_login(found[route.role])
+        url = route_url(name, route, found)
+        data = route.data(found)
+        
+        runs = []
+        for _ in range(repeat + 1):
+            recorder = QueryRecorder()
+            with atomic(), render_timer() as rendering, connection.execute_wrapper(recorder):
+                started = perf_counter()
+                try:
+                    response = getattr(client, route.method)(url, data)
+                except Exception as error:
+                    return {'status': f'error: {error.__class__.__name__}: {error}'}
+                elapsed = perf_counter() - started
+                set_rollback(True)
+            runs.append({
+                'status': response.status_code,
+                'queries': recorder.count,
+                'sql_ms': recorder.seconds * 1000,
+                'render_ms': rendering['seconds'] * 1000,
+                'total_ms': elapsed * 1000,
+                'bytes': len(response.content),
+            })
+        
+        # The first request warms caches; counts come from the last run
+        runs = runs[1:]
+        result = dict(runs[-1])
+        for field in ('sql_ms', 'render_ms', 'total_ms'):
+            result[field] = round(statistics.median(run[field] for run in runs), 2)
+        return result
+    
+    def report(self, results, baseline, options):
+        """Print one line per view and return the names of regressed views."""
+        self.stdout.write(
+            f'{"view":<36} {"status":>6} {"queries":>9} {"sql ms":>8} {"render ms":>10} {"total ms":>16} {"KB":>8}'
+        )
+        regressions = []
+        for name, result in results.items():
+            if isinstance(result['status'], str):
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f'{name:<36} {result["status"]}'))
+                continue
+            
+            base = baseline.get(name)
+            queries = str(result['queries'])
+            total = f'{result["total_ms"]:.1f}'
+            problems = []
+            if base and 'queries' in base:
+                extra = result['queries'] - base['queries']
+                if extra:
+                    queries += f' ({extra:+d})'
+                if extra > options['query_threshold']:
+                    problems.append('queries')
+                
+                slower = result['total_ms'] - base['total_ms']
+                total += f' ({slower / base["total_ms"]:+.0%})' if base['total_ms'] else ''
+                if slower > options['min_ms'] and slower > base['total_ms'] * options['threshold']:
+                    problems.append('time')
+                
+                if result['status'] != base['status']:
+                    problems.append('status')
+            
+            line = (
+                f'{name:<36} {result["status"]:>6} {queries:>9} {result["sql_ms"]:>8.1f} '
+                f'{result["render_ms"]:>10.1f} {total:>16} {result["bytes"] / 1024:>8.1f}'
+            )
+            if problems:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f'{line}  regressed: {", ".join(problems)}'))
+            else:
+                self.stdout.write(line)
+        return regressions
+    
+    def load(self, path):
+        try:
+            with open(path, encoding='utf-8') as baseline:
+                return json.load(baseline)
+        except FileNotFoundError:
+            self.stdout.write(self.style.WARNING(f'No baseline at {path}; nothing to compare with.'))
+            return {}
+    
+    def save(self, path, baseline, results, company_id, options):
+        # A partial run (--route) only replaces the views it measured
+        routes = baseline.get('routes', {}) if options['route'] else {}
+        routes.update(results)
+        data = {
+            'created': timezone.now().isoformat(),
+            'vendor': connection.vendor,
+            'company': company_id,
+            'repeat': options['repeat'],
+            'routes': dict(sorted(routes.items())),
+        }
+        
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as output:
+            json.dump(data, output, indent=2, ensure_ascii=False)
+        self.stdout.write(f'Baseline written to {path}.')
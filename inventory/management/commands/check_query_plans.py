@@ -0,0 +1,66 @@
+"""Fail when a list view's main query would scan a whole large table."""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from inventory.models import Product
+from inventory.query_plans import FULL_SCAN, LARGE_MODELS, full_scans, view_queries
+
+
+def busiest_company():
+    """Id of the company with most products, the best sample for plans and benchmarks."""
+    row = Product.objects.values('company_id').annotate(
+        count=Count('id')
+    ).order_by('-count').first()
+    return row and row['company_id']
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN on the main queries of the inventory, POS and report views '
+        'and fail if any of them scans a whole large table. The test suite checks '
+        'the same plans on a small fixture; this runs them against a seeded '
+        'database, where table statistics can change the planner\'s choices. '
+        'Tables with fewer than --min-rows rows are not checked, since the '
+        'planner rightly prefers scanning small tables.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Company id to build the queries for (default: the one with most products).')
+        parser.add_argument('--min-rows', type=int, default=1000, help='Only flag scans of tables with at least this many rows.')
+    
+    def handle(self, *args, **options):
+        if connection.vendor not in FULL_SCAN:
+            raise CommandError(f'Query plans cannot be checked on {connection.vendor}.')
+        
+        company_id = options['company'] or busiest_company()
+        if company_id is None:
+            raise CommandError('No products found; seed the database first.')
+        
+        large = {
+            model._meta.db_table
+            for model in LARGE_MODELS
+            if model.objects.count() >= options['min_rows']
+        }
+        if not large:
+            self.stdout.write(self.style.WARNING(
+                f'No table has {options["min_rows"]} rows; nothing to check.'
+            ))
+            return
+        
+        failures = 0
+        for label, queryset in view_queries(company_id):
+            plan = queryset.explain()
+            scanned = full_scans(plan, large)
+            if scanned:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f'SCAN  {label}: {", ".join(scanned)}'))
+            else:
+                self.stdout.write(f'ok    {label}')
+            if scanned or options['verbosity'] > 1:
+                self.stdout.write(plan + '\n')
+        
+        if failures:
+            raise CommandError(f'{failures} queries scan a whole large table.')
+        self.stdout.write(self.style.SUCCESS('All query plans use indexes.'))
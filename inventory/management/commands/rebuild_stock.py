@@ -0,0 +1,69 @@
+"""Verify or rebuild Product.stock from the stock movement ledger."""
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.db.transaction import atomic, on_commit
+
+from inventory.models import Product, StockMovement
+from inventory.signals import stock_changed
+
+
+class Command(BaseCommand):
+    help = 'Compare Product.stock with the stock ledger and optionally rebuild it.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Only check products of this company id.')
+        parser.add_argument('--fix', action='store_true', help='Overwrite drifted stock with the ledger balance.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        products = Product.objects.order_by('pk')
+        if options['company']:
+            products = products.filter(company_id=options['company'])
+        
+        batch_size = options['batch_size']
+        checked = drifted = 0
+        last_pk = 0
+        
+        while True:
+            batch = list(
+                products.filter(pk__gt=last_pk).values_list('pk', 'name', 'stock')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            
+            balances = dict(
+                StockMovement.objects.filter(
+                    product_id__in=[pk for pk, _, _ in batch]
+                ).values('product_id').annotate(
+                    balance=Sum('delta')
+                ).values_list('product_id', 'balance')
+            )
+            
+            fixes = []
+            for pk, name, stock in batch:
+                checked += 1
+                balance = balances.get(pk, 0)
+                if stock != balance:
+                    drifted += 1
+                    self.stdout.write(
+                        f'#{pk} {name}: stock={stock} ledger={balance} drift={stock - balance:+d}'
+                    )
+                    fixes.append((pk, balance, balance - stock))
+            
+            if options['fix'] and fixes:
+                with atomic():
+                    for pk, balance, _ in fixes:
+                        Product.objects.filter(pk=pk).update(stock=balance)
+                    # Queryset updates send no post_save; keep the POS product index current
+                    deltas = {pk: delta for pk, _, delta in fixes}
+                    on_commit(lambda deltas=deltas: stock_changed.send(sender=Product, deltas=deltas))
+        
+        summary = f'Checked {checked} products, {drifted} drifted.'
+        if drifted and options['fix']:
+            self.stdout.write(self.style.SUCCESS(summary + ' Stock rebuilt from ledger.'))
+        elif drifted:
+            self.stdout.write(self.style.WARNING(summary + ' Run with --fix to rebuild.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,106 @@
+"""Recompute representative custody and products_count from approved history."""
+
+from django.core.management.base import BaseCommand
+from django.db.models import Case, IntegerField, Sum, When, F
+from django.db.transaction import atomic
+
+from accounts.models import User
+from inventory.models import RepresentativeCustody, Transaction, TransactionItem
+
+
+class Command(BaseCommand):
+    help = 'Rebuild RepresentativeCustody and User.products_count from approved transactions.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Only reconcile representatives of this company id.')
+        parser.add_argument('--batch-size', type=int, default=200, help='Representatives per batch.')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing.')
+    
+    def handle(self, *args, **options):
+        reps = User.objects.filter(role=User.Role.REPRESENTATIVE).order_by('pk')
+        if options['company']:
+            reps = reps.filter(company_id=options['company'])
+        
+        batch_size = options['batch_size']
+        checked = drifted = drifted_rows = 0
+        last_pk = 0
+        
+        while True:
+            batch = dict(reps.filter(pk__gt=last_pk).values_list('pk', 'products_count')[:batch_size])
+            if not batch:
+                break
+            last_pk = max(batch)
+            
+            held = self.custody_from_history(list(batch))
+            current = self.custody_rows(list(batch))
+            
+            for user_id, products_count in batch.items():
+                checked += 1
+                expected = held.get(user_id, {})
+                rows = current.get(user_id, {})
+                
+                problems = []
+                if products_count != sum(expected.values()):
+                    problems.append(f'products_count={products_count} history={sum(expected.values())}')
+                for product_id in sorted(set(expected) | set(rows)):
+                    quantity, history = rows.get(product_id, 0), expected.get(product_id, 0)
+                    if quantity != history:
+                        drifted_rows += 1
+                        problems.append(f'product #{product_id} custody={quantity} history={history}')
+                
+                if problems:
+                    drifted += 1
+                    self.stdout.write(f'User #{user_id}: {", ".join(problems)}')
+            
+            if not options['dry_run']:
+                self.write_batch(batch, held)
+        
+        summary = f'Checked {checked} representatives, {drifted} drifted ({drifted_rows} custody rows).'
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(summary + ' (dry run)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary + ' Custody rebuilt.'))
+    
+    def custody_from_history(self, user_ids):
+        """Return {user_id: {product_id: quantity}} from approved take/restore items."""
+        rows = TransactionItem.objects.filter(
+            transaction__user_id__in=user_ids,
+            transaction__status=Transaction.Status.APPROVED,
+            transaction__type__in=[Transaction.Type.TAKE, Transaction.Type.RESTORE]
+        ).values('transaction__user_id', 'product_id').annotate(
+            held=Sum(Case(
+                When(transaction__type=Transaction.Type.TAKE, then=F('quantity')),
+                default=-F('quantity'),
+                output_field=IntegerField()
+            ))
+        ).values_list('transaction__user_id', 'product_id', 'held')
+        
+        held = {}
+        for user_id, product_id, quantity in rows:
+            held.setdefault(user_id, {})[product_id] = quantity
+        return held
+    
+    def custody_rows(self, user_ids):
+        """Return {user_id: {product_id: quantity}} from the stored custody rows."""
+        rows = RepresentativeCustody.objects.filter(
+            user_id__in=user_ids
+        ).exclude(quantity=0).values_list('user_id', 'product_id', 'quantity')
+        
+        current = {}
+        for user_id, product_id, quantity in rows:
+            current.setdefault(user_id, {})[product_id] = quantity
+        return current
+    
+    @atomic
+    def write_batch(self, batch, held):
+        RepresentativeCustody.objects.filter(user_id__in=list(batch)).delete()
+        RepresentativeCustody.objects.bulk_create([
+            RepresentativeCustody(user_id=user_id, product_id=product_id, quantity=quantity)
+            for user_id, products in held.items()
+            for product_id, quantity in products.items()
+            if quantity
+        ])
+        for user_id in batch:
+            User.objects.filter(pk=user_id).update(
+                products_count=sum(held.get(user_id, {}).values())
+            )
@@ -0,0 +1,522 @@
+"""Generate a deterministic, production-scale dataset for performance work."""
+
+import math
+import random
+import time as clock
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import ROUND_CEILING, Decimal
+from io import StringIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.transaction import atomic
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from accounts.models import Company, CompanySubscription, SubscriptionPlan, User
+from inventory.models import Category, Product, StockMovement, Transaction, TransactionItem
+from inventory.search import build_search_key
+from pos.models import Sale, SaleItem
+
+
+CENT = Decimal('0.01')
+
+PRODUCT_NOUNS = (
+    'أرز', 'سكر', 'زيت', 'شاي', 'قهوة', 'حليب', 'جبن', 'عصير', 'ماء', 'صابون',
+    'شامبو', 'معجون أسنان', 'تونة', 'مكرونة', 'دقيق', 'عدس', 'فول', 'بسكويت',
+    'شوكولاتة', 'مناديل', 'منظف', 'زبدة', 'عسل', 'مربى', 'بيض', 'دجاج', 'لحم',
+)
+BRANDS = ('الوادي', 'النخيل', 'الصافي', 'الريان', 'الواحة', 'السنبلة', 'الأصيل', 'الفجر', 'النور', 'البركة')
+SIZES = ('صغير', 'وسط', 'كبير', 'عائلي', '250 جم', '500 جم', '1 كجم', '1 لتر', '2 لتر')
+CATEGORY_NAMES = (
+    'مواد غذائية', 'مشروبات', 'ألبان', 'منظفات', 'عناية شخصية', 'حلويات',
+    'معلبات', 'مجمدات', 'خضروات', 'فواكه', 'مخبوزات', 'أدوات منزلية',
+)
+
+# Relative sales volume per weekday, Monday first (busiest Thursday/Friday)
+WEEKDAY_WEIGHTS = (0.9, 0.85, 0.9, 1.15, 1.35, 1.0, 0.85)
+
+# Relative sales volume per hour of the day, shops open 08:00-23:59
+HOUR_WEIGHTS = {
+    8: 2, 9: 4, 10: 6, 11: 8, 12: 10, 13: 11, 14: 9, 15: 7,
+    16: 7, 17: 9, 18: 11, 19: 12, 20: 12, 21: 9, 22: 6, 23: 3,
+}
+HOURS = list(HOUR_WEIGHTS)
+HOUR_CUM_WEIGHTS = list(accumulate(HOUR_WEIGHTS.values()))
+
+PAYMENT_WEIGHTS = {
+    Sale.PaymentMethod.CASH: 55,
+    Sale.PaymentMethod.CARD: 35,
+    Sale.PaymentMethod.TRANSFER: 10,
+}
+
+TRANSACTION_WEIGHTS = {
+    Transaction.Type.TAKE: 50,
+    Transaction.Type.PAYMENT: 35,
+    Transaction.Type.RESTORE: 15,
+}
+
+# Units per sale line: 1 to 5
+QUANTITY_WEIGHTS = (70, 18, 7, 3, 2)
+
+# Product popularity follows a Zipf law with this exponent
+POPULARITY_EXPONENT = 1.1
+
+YEARLY_GROWTH = 0.2
+DISCOUNT_RATE = 0.08
+REFUND_RATE = 0.015
+INACTIVE_RATE = 0.05
+
+# Transactions younger than this are often still pending
+PENDING_WINDOW = timedelta(days=7)
+
+# Column order of the value tuples inserted without model instances
+SALE_ITEM_FIELDS = ('sale', 'product', 'quantity', 'price', 'cost', 'total', 'created_at')
+TRANSACTION_ITEM_FIELDS = ('transaction', 'product', 'quantity', 'price', 'total', 'created_at')
+MOVEMENT_FIELDS = ('product', 'delta', 'reason', 'sale', 'transaction', 'created_at')
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk inserts write historical dates into auto_now/auto_now_add fields."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class CompanySeeder:
+    """
+    Generates one company's history in insertion-sized batches.
+    
+    All randomness comes from one Random seeded by (seed, company index),
+    so the same arguments always produce the same data, and a company's
+    data does not depend on how many other companies are generated.
+    """
+    
+    def __init__(self, company, index, options, password):
+        self.company = company
+        self.index = index
+        self.options = options
+        self.password = password
+        self.rng = random.Random(f'{options["seed"]}:{index}')
+        self.batch_size = options['batch_size']
+        self.tz = timezone.get_current_timezone()
+        now = timezone.now()
+        
+        self.end = options['end_date']
+        self.start = self.end - timedelta(days=round(365 * options['years']) - 1)
+        self.opened = datetime.combine(self.start, time.min, tzinfo=self.tz)
+        self.closed = min(now, datetime.combine(self.end + timedelta(days=1), time.min, tzinfo=self.tz))
+        
+        self.rows = 0
+        # Stock sold or taken per product, and the net stock change
+        self.outflow = {}
+        self.net = {}
+        # Approved custody per representative: {user_id: {product_id: quantity}}
+        self.held = {}
+    
+    def run(self):
+        with explicit_timestamps(User, Category, Product, Transaction, Sale):
+            self.create_users()
+            self.create_catalog()
+            self.create_transactions()
+            self.create_sales()
+            self.create_opening_stock()
+        
+        # Derived tables are rebuilt by their own commands
+        call_command('reconcile_custody', company=self.company.pk, stdout=StringIO())
+        call_command('rebuild_sales_rollups', company=self.company.pk, stdout=StringIO())
+        return self.rows
+    
+    def insert(self, model, objs):
+        created = model.objects.bulk_create(objs, batch_size=self.batch_size)
+        self.rows += len(created)
+        return created
+    
+    def insert_rows(self, model, fields, rows):
+        """
+        Multi-row INSERT of plain value tuples, for the high-volume tables
+        whose ids are never needed; skips building model instances.
+        """
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(model._meta.get_field(field).column) for field in fields)
+        placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+        size = connection.ops.bulk_batch_size(fields, rows) or len(rows)
+        
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), size):
+                chunk = rows[start:start + size]
+                cursor.execute(
+                    f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES '
+                    + ', '.join([placeholders] * len(chunk)),
+                    [value for row in chunk for value in row]
+                )
+        self.rows += len(rows)
+    
+    def db_datetime(self, value):
+        return connection.ops.adapt_datetimefield_value(value)
+    
+    def moment(self, day):
+        """A shop-hours datetime on a day, following HOUR_WEIGHTS."""
+        hour = self.rng.choices(HOURS, cum_weights=HOUR_CUM_WEIGHTS)[0]
+        return datetime.combine(
+            day, time(hour, self.rng.randrange(60), self.rng.randrange(60)), tzinfo=self.tz
+        )
+    
+    # =========================================================================
+    # USERS AND CATALOG
+    # =========================================================================
+    
+    def create_users(self):
+        prefix = f'load{self.options["seed"]}_{self.index}'
+        roles = (
+            [(User.Role.COMPANY_MANAGER, 'manager', 1), (User.Role.ACCOUNTANT, 'accountant', 1)]
+            + [(User.Role.REPRESENTATIVE, 'rep', self.options['representatives'])]
+            + [(User.Role.CASHIER, 'cashier', self.options['cashiers'])]
+        )
+        users = self.insert(User, [
+            User(
+                username=f'{prefix}_{name}{i}', password=self.password,
+                company=self.company, role=role,
+                created_at=self.opened, updated_at=self.opened,
+            )
+            for role, name, count in roles
+            for i in range(1, count + 1)
+        ])
+        
+        self.accountant = next(user for user in users if user.role == User.Role.ACCOUNTANT)
+        self.representatives = [user for user in users if user.role == User.Role.REPRESENTATIVE]
+        self.cashiers = [user for user in users if user.role == User.Role.CASHIER]
+    
+    def create_catalog(self):
+        rng = self.rng
+        categories = self.insert(Category, [
+            Category(
+                company=self.company,
+                name=CATEGORY_NAMES[i % len(CATEGORY_NAMES)] + (f' {i // len(CATEGORY_NAMES) + 1}' if i >= len(CATEGORY_NAMES) else ''),
+                created_at=self.opened, updated_at=self.opened,
+            )
+            for i in range(self.options['categories'])
+        ])
+        
+        products = []
+        for i in range(1, self.options['products'] + 1):
+            name = f'{rng.choice(PRODUCT_NOUNS)} {rng.choice(BRANDS)} {rng.choice(SIZES)}'
+            sku = f'SKU-{i:06d}'
+            barcode = f'62{self.index:04d}{i:07d}'
+            # Log-normal prices around 25, costs 55-85% of the price
+            price = Decimal(max(0.5, math.exp(rng.gauss(math.log(25), 0.9)))).quantize(CENT)
+            products.append(Product(
+                company=self.company,
+                category=rng.choice(categories) if categories else None,
+                name=name, sku=sku, barcode=barcode,
+                search_key=build_search_key(name, sku, barcode),
+                price=price,
+                cost=(price * Decimal(rng.uniform(0.55, 0.85))).quantize(CENT),
+                is_active=rng.random() >= INACTIVE_RATE,
+                created_at=self.opened, updated_at=self.opened,
+            ))
+        self.products = self.insert(Product, products)
+        
+        # Popularity rank is random; sale lines pick products by Zipf weight
+        self.active = [product for product in self.products if product.is_active]
+        rng.shuffle(self.active)
+        self.popularity = list(accumulate(
+            1 / rank ** POPULARITY_EXPONENT for rank in range(1, len(self.active) + 1)
+        ))
+    
+    def pick_products(self, count):
+        """Distinct popular products, at most count of them."""
+        picked = self.rng.choices(self.active, cum_weights=self.popularity, k=count)
+        return list({product.pk: product for product in picked}.values())
+    
+    def move(self, movements, product, delta, reason, at, sale=None, transaction=None):
+        """Queue a ledger row (in MOVEMENT_FIELDS order); at is a database value."""
+        movements.append((
+            product.pk, delta, reason, sale and sale.pk, transaction and transaction.pk, at
+        ))
+        self.net[product.pk] = self.net.get(product.pk, 0) + delta
+        if delta < 0:
+            self.outflow[product.pk] = self.outflow.get(product.pk, 0) - delta
+    
+    # =========================================================================
+    # REPRESENTATIVE TRANSACTIONS
+    # =========================================================================
+    
+    def create_transactions(self):
+        if not self.representatives or not self.active:
+            return
+        
+        rng = self.rng
+        products = {product.pk: product for product in self.products}
+        span = (self.closed - self.opened).total_seconds()
+        dates = sorted(
+            self.opened + timedelta(seconds=rng.uniform(0, span))
+            for _ in range(self.options['transactions'])
+        )
+        
+        batch = []
+        for date in dates:
+            rep = rng.choice(self.representatives)
+            held = self.held.setdefault(rep.pk, {})
+            trans_type = rng.choices(list(TRANSACTION_WEIGHTS), weights=TRANSACTION_WEIGHTS.values())[0]
+            if trans_type == Transaction.Type.RESTORE and not held:
+                trans_type = Transaction.Type.PAYMENT
+            
+            if self.closed - date < PENDING_WINDOW:
+                status = rng.choices(
+                    [Transaction.Status.PENDING, Transaction.Status.APPROVED, Transaction.Status.REJECTED],
+                    weights=[60, 35, 5]
+                )[0]
+            else:
+                status = Transaction.Status.APPROVED if rng.random() < 0.92 else Transaction.Status.REJECTED
+            
+            if trans_type == Transaction.Type.TAKE:
+                lines = [(product, rng.randint(1, 20)) for product in self.pick_products(rng.randint(1, 5))]
+            elif trans_type == Transaction.Type.RESTORE:
+                lines = [
+                    (products[pk], rng.randint(1, held[pk]))
+                    for pk in rng.sample(sorted(held), min(len(held), rng.randint(1, 3)))
+                ]
+            else:
+                lines = []
+            
+            approved_at = None
+            if status == Transaction.Status.APPROVED:
+                approved_at = min(self.closed, date + timedelta(minutes=rng.randint(5, 600)))
+                sign = -1 if trans_type == Transaction.Type.TAKE else 1
+                for product, quantity in lines:
+                    held[product.pk] = held.get(product.pk, 0) - sign * quantity
+                    if not held[product.pk]:
+                        del held[product.pk]
+            
+            transaction = Transaction(
+                company=self.company, user=rep, type=trans_type, status=status,
+                amount=(
+                    sum((product.price * quantity for product, quantity in lines), Decimal('0'))
+                    if lines else Decimal(rng.randint(100, 5000))
+                ),
+                approved_by=self.accountant if status != Transaction.Status.PENDING else None,
+                approved_at=approved_at,
+                date=date, updated_at=approved_at or date,
+            )
+            batch.append((transaction, lines))
+            if len(batch) >= self.batch_size:
+                self.flush_transactions(batch)
+                batch = []
+        self.flush_transactions(batch)
+    
+    @atomic
+    def flush_transactions(self, batch):
+        self.insert(Transaction, [transaction for transaction, _ in batch])
+        
+        items = []
+        movements = []
+        for transaction, lines in batch:
+            created_at = self.db_datetime(transaction.date)
+            approved_at = transaction.approved_at and self.db_datetime(transaction.approved_at)
+            sign = -1 if transaction.type == Transaction.Type.TAKE else 1
+            for product, quantity in lines:
+                items.append((
+                    transaction.pk, product.pk, quantity,
+                    product.price, product.price * quantity, created_at,
+                ))
+                if approved_at:
+                    self.move(
+                        movements, product, sign * quantity, transaction.type,
+                        approved_at, transaction=transaction
+                    )
+        self.insert_rows(TransactionItem, TRANSACTION_ITEM_FIELDS, items)
+        self.insert_rows(StockMovement, MOVEMENT_FIELDS, movements)
+    
+    # =========================================================================
+    # POS SALES
+    # =========================================================================
+    
+    def sales_on(self, day):
+        """Expected number of sales on a day: trend, season, weekday and noise."""
+        years = self.options['years']
+        elapsed = (day - self.start).days / 365
+        trend = 1 + YEARLY_GROWTH * (elapsed - years / 2)
+        season = 1 + 0.1 * math.sin(2 * math.pi * day.timetuple().tm_yday / 365.25)
+        weekday = WEEKDAY_WEIGHTS[day.weekday()] / (sum(WEEKDAY_WEIGHTS) / 7)
+        noise = max(0, self.rng.gauss(1, 0.1))
+        return round(self.options['sales_per_day'] * trend * season * weekday * noise)
+    
+    def create_sales(self):
+        if not self.cashiers or not self.active:
+            return
+        
+        rng = self.rng
+        tax_rate = self.company.tax_rate
+        methods = list(PAYMENT_WEIGHTS)
+        method_weights = list(PAYMENT_WEIGHTS.values())
+        receipt = 0
+        
+        batch = []
+        lines_in_batch = 0
+        day = self.start
+        while day <= self.end:
+            for _ in range(self.sales_on(day)):
+                at = self.moment(day)
+                if at >= self.closed:
+                    continue
+                
+                lines = [
+                    (product, rng.choices(range(1, 6), weights=QUANTITY_WEIGHTS)[0])
+                    for product in self.pick_products(1 + min(int(rng.expovariate(0.55)), 11))
+                ]
+                subtotal = sum((product.price * quantity for product, quantity in lines), Decimal('0'))
+                
+                discount_percentage = Decimal(rng.choice((5, 10, 15))) if rng.random() < DISCOUNT_RATE else Decimal('0')
+                discount = (subtotal * discount_percentage / 100).quantize(CENT)
+                tax_amount = ((subtotal - discount) * tax_rate / 100).quantize(CENT)
+                total = subtotal - discount + tax_amount
+                
+                method = rng.choices(methods, weights=method_weights)[0]
+                amount_paid = total
+                if method == Sale.PaymentMethod.CASH:
+                    amount_paid = (total / 5).to_integral_value(ROUND_CEILING) * 5
+                
+                refunded_at = None
+                if rng.random() < REFUND_RATE:
+                    refunded_at = min(self.closed, at + timedelta(minutes=rng.randint(5, 240)))
+                
+                receipt += 1
+                sale = Sale(
+                    company=self.company, cashier=rng.choice(self.cashiers),
+                    receipt_number=f'LD{self.options["seed"]}-{self.index}-{receipt:08d}',
+                    subtotal=subtotal, discount=discount, discount_percentage=discount_percentage,
+                    tax_amount=tax_amount, total=total, payment_method=method,
+                    amount_paid=amount_paid, change=amount_paid - total,
+                    status=Sale.Status.REFUNDED if refunded_at else Sale.Status.COMPLETED,
+                    created_at=at, updated_at=refunded_at or at,
+                )
+                batch.append((sale, lines, refunded_at))
+                lines_in_batch += len(lines)
+                if lines_in_batch >= self.batch_size:
+                    self.flush_sales(batch)
+                    batch = []
+                    lines_in_batch = 0
+            day += timedelta(days=1)
+        self.flush_sales(batch)
+    
+    @atomic
+    def flush_sales(self, batch):
+        self.insert(Sale, [sale for sale, _, _ in batch])
+        
+        items = []
+        movements = []
+        for sale, lines, refunded_at in batch:
+            created_at = self.db_datetime(sale.created_at)
+            refunded_at = refunded_at and self.db_datetime(refunded_at)
+            for product, quantity in lines:
+                items.append((
+                    sale.pk, product.pk, quantity,
+                    product.price, product.cost, product.price * quantity, created_at,
+                ))
+                self.move(movements, product, -quantity, StockMovement.Reason.SALE, created_at, sale=sale)
+                if refunded_at:
+                    self.move(movements, product, quantity, StockMovement.Reason.REFUND, refunded_at, sale=sale)
+        self.insert_rows(SaleItem, SALE_ITEM_FIELDS, items)
+        self.insert_rows(StockMovement, MOVEMENT_FIELDS, movements)
+    
+    # =========================================================================
+    # STOCK
+    # =========================================================================
+    
+    @atomic
+    def create_opening_stock(self):
+        """
+        Opening balances that cover every later outflow, so stock never
+        went negative, and Product.stock equal to the ledger balance.
+        """
+        opened = self.db_datetime(self.opened)
+        movements = []
+        for product in self.products:
+            opening = self.outflow.get(product.pk, 0) + self.rng.randint(0, 300)
+            product.stock = opening + self.net.get(product.pk, 0)
+            movements.append((product.pk, opening, StockMovement.Reason.OPENING, None, None, opened))
+        self.insert_rows(StockMovement, MOVEMENT_FIELDS, movements)
+        Product.objects.bulk_update(self.products, ['stock'], batch_size=500)
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate companies with users, a product catalog, representative '
+        'transactions and years of POS sales, using bulk inserts. The data is '
+        'deterministic for a given --seed and --end-date; use it as the fixture '
+        'for performance work. Companies are added next to existing data.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=3, help='Companies to generate.')
+        parser.add_argument('--products', type=int, default=500, help='Products per company.')
+        parser.add_argument('--categories', type=int, default=20, help='Categories per company.')
+        parser.add_argument('--representatives', type=int, default=10, help='Representatives per company.')
+        parser.add_argument('--cashiers', type=int, default=5, help='Cashiers per company.')
+        parser.add_argument('--transactions', type=int, default=2000, help='Representative transactions per company.')
+        parser.add_argument('--years', type=float, default=2, help='Years of history, ending at --end-date.')
+        parser.add_argument('--sales-per-day', type=int, default=200, help='Average POS sales per company per day.')
+        parser.add_argument('--end-date', help='Last day of history, YYYY-MM-DD (default: today).')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed; also part of company names and usernames.')
+        parser.add_argument('--password', default='loadtest', help='Password of every generated user.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert.')
+    
+    def handle(self, *args, **options):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError(f'{connection.vendor} does not return ids from bulk inserts.')
+        
+        if options['end_date']:
+            options['end_date'] = parse_date(options['end_date'])
+            if options['end_date'] is None:
+                raise CommandError('--end-date must be YYYY-MM-DD.')
+        else:
+            options['end_date'] = timezone.localdate()
+        
+        names = [f'شركة اختبار الحمل {options["seed"]}-{index}' for index in range(1, options['companies'] + 1)]
+        if Company.objects.filter(name__in=names).exists():
+            raise CommandError(f'Companies for seed {options["seed"]} already exist; use another --seed.')
+        
+        plan, _ = SubscriptionPlan.objects.get_or_create(
+            name='اختبار الحمل',
+            defaults={'max_users': 1000000, 'max_products': 1000000, 'is_active': False}
+        )
+        password = make_password(options['password'])
+        
+        total = 0
+        for index, name in enumerate(names, start=1):
+            started = clock.monotonic()
+            company = Company.objects.create(
+                name=name, email=f'load{options["seed"]}-{index}@example.com', phone='0000000000',
+                tax_rate=Decimal(15) if index % 2 else Decimal(0),
+            )
+            CompanySubscription.objects.create(
+                company=company, plan=plan, status=CompanySubscription.Status.ACTIVE,
+                start_date=options['end_date'] - timedelta(days=round(365 * options['years'])),
+                end_date=options['end_date'] + timedelta(days=3650),
+                payment_verified=True,
+            )
+            
+            rows = CompanySeeder(company, index, options, password).run()
+            total += rows
+            self.stdout.write(
+                f'{name} (#{company.pk}): {rows:,} rows in {clock.monotonic() - started:.1f}s'
+            )
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {total:,} rows for {len(names)} companies. Users log in with password "{options["password"]}".'
+        ))
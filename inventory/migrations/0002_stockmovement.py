@@ -0,0 +1,45 @@
+# Generated by Django 4.2.11 on 2026-10-17 01:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_opening_balances(apps, schema_editor):
+    """Seed the ledger with each existing product's current stock."""
+    Product = apps.get_model('inventory', 'Product')
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    
+    movements = [
+        StockMovement(product_id=pk, delta=stock, reason='opening')
+        for pk, stock in Product.objects.exclude(stock=0).values_list('pk', 'stock').iterator()
+    ]
+    StockMovement.objects.bulk_create(movements, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0001_initial'),
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField(verbose_name='التغيير')),
+                ('reason', models.CharField(choices=[('opening', 'رصيد افتتاحي'), ('adjustment', 'تعديل يدوي'), ('take', 'أخذ'), ('restore', 'إرجاع'), ('sale', 'بيع'), ('refund', 'استرداد')], max_length=20, verbose_name='السبب')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='التاريخ')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='inventory.product', verbose_name='المنتج')),
+                ('sale', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='pos.sale', verbose_name='عملية البيع')),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='inventory.transaction', verbose_name='المعاملة')),
+            ],
+            options={
+                'verbose_name': 'حركة مخزون',
+                'verbose_name_plural': 'حركات المخزون',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.RunPython(create_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.11 on 2026-10-17 01:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_custody(apps, schema_editor):
+    """Build custody rows from approved take/restore history."""
+    TransactionItem = apps.get_model('inventory', 'TransactionItem')
+    RepresentativeCustody = apps.get_model('inventory', 'RepresentativeCustody')
+    
+    rows = TransactionItem.objects.filter(
+        transaction__user__isnull=False,
+        transaction__status='approved',
+        transaction__type__in=['take', 'restore']
+    ).values('transaction__user_id', 'product_id').annotate(
+        held=models.Sum(models.Case(
+            models.When(transaction__type='take', then=models.F('quantity')),
+            default=-models.F('quantity'),
+            output_field=models.IntegerField()
+        ))
+    ).values_list('transaction__user_id', 'product_id', 'held')
+    
+    RepresentativeCustody.objects.bulk_create([
+        RepresentativeCustody(user_id=user_id, product_id=product_id, quantity=held)
+        for user_id, product_id, held in rows.iterator()
+        if held
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0002_stockmovement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepresentativeCustody',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0, verbose_name='الكمية')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='custody', to='inventory.product', verbose_name='المنتج')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='custody', to=settings.AUTH_USER_MODEL, verbose_name='المندوب')),
+            ],
+            options={
+                'verbose_name': 'عهدة مندوب',
+                'verbose_name_plural': 'عهد المندوبين',
+                'unique_together': {('user', 'product')},
+            },
+        ),
+        migrations.RunPython(populate_custody, migrations.RunPython.noop),
+    ]
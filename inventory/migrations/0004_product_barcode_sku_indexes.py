@@ -0,0 +1,52 @@
+# Generated by Django 4.2.11 on 2026-10-17 01:50
+
+from django.db import migrations, models
+
+
+def check_duplicate_barcodes(apps, schema_editor):
+    """Report duplicate barcodes before the unique constraint is enforced."""
+    Product = apps.get_model('inventory', 'Product')
+    
+    duplicates = Product.objects.exclude(barcode='').values(
+        'company_id', 'barcode'
+    ).annotate(
+        count=models.Count('id')
+    ).filter(count__gt=1).order_by('company_id', 'barcode')
+    
+    if duplicates:
+        lines = []
+        for row in duplicates:
+            ids = Product.objects.filter(
+                company_id=row['company_id'], barcode=row['barcode']
+            ).values_list('id', flat=True)
+            lines.append(
+                f"  company={row['company_id']} barcode={row['barcode']!r} "
+                f"products={list(ids)}"
+            )
+        raise RuntimeError(
+            'Duplicate product barcodes must be resolved before this migration '
+            'can enforce unique barcodes per company:\n' + '\n'.join(lines)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_representativecustody'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['company', 'barcode'], name='product_company_barcode_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['company', 'sku'], name='product_company_sku_idx'),
+        ),
+        migrations.RunPython(check_duplicate_barcodes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(condition=models.Q(('barcode', ''), _negated=True), fields=('company', 'barcode'), name='unique_product_barcode_per_company'),
+        ),
+    ]
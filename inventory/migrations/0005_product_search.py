@@ -0,0 +1,91 @@
+from django.db import migrations
+
+
+FTS_TABLE = 'inventory_product_fts'
+
+POSTGRES_FIELDS = ('name', 'sku', 'barcode')
+
+SQLITE_CREATE = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        name, sku, barcode,
+        content='inventory_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER inventory_product_fts_insert AFTER INSERT ON inventory_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, sku, barcode)
+        VALUES (new.id, new.name, new.sku, new.barcode);
+    END
+    """,
+    f"""
+    CREATE TRIGGER inventory_product_fts_delete AFTER DELETE ON inventory_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, sku, barcode)
+        VALUES ('delete', old.id, old.name, old.sku, old.barcode);
+    END
+    """,
+    # Stock updates touch every sale; only reindex when searched text changes
+    f"""
+    CREATE TRIGGER inventory_product_fts_update AFTER UPDATE ON inventory_product
+    WHEN old.name IS NOT new.name OR old.sku IS NOT new.sku OR old.barcode IS NOT new.barcode
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, sku, barcode)
+        VALUES ('delete', old.id, old.name, old.sku, old.barcode);
+        INSERT INTO {FTS_TABLE}(rowid, name, sku, barcode)
+        VALUES (new.id, new.name, new.sku, new.barcode);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS inventory_product_fts_insert',
+    'DROP TRIGGER IF EXISTS inventory_product_fts_delete',
+    'DROP TRIGGER IF EXISTS inventory_product_fts_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def sqlite_has_fts5(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_search_index(apps, schema_editor):
+    """Create the product search index for the database in use."""
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for field in POSTGRES_FIELDS:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS product_{field}_trgm_idx '
+                f'ON inventory_product USING gin ((UPPER({field}::text)) gin_trgm_ops)'
+            )
+    elif vendor == 'sqlite' and sqlite_has_fts5(schema_editor):
+        for sql in SQLITE_CREATE:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        for field in POSTGRES_FIELDS:
+            schema_editor.execute(f'DROP INDEX IF EXISTS product_{field}_trgm_idx')
+    elif vendor == 'sqlite':
+        for sql in SQLITE_DROP:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_product_barcode_sku_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
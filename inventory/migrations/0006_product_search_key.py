@@ -0,0 +1,128 @@
+# Generated by Django 4.2.11 on 2026-10-17 01:55
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+
+# Search index over name, sku and barcode created by the previous migration
+previous = import_module('inventory.migrations.0005_product_search')
+
+FTS_TABLE = 'inventory_product_fts'
+
+SQLITE_CREATE = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        search_key,
+        content='inventory_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER inventory_product_fts_insert AFTER INSERT ON inventory_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, search_key) VALUES (new.id, new.search_key);
+    END
+    """,
+    f"""
+    CREATE TRIGGER inventory_product_fts_delete AFTER DELETE ON inventory_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_key)
+        VALUES ('delete', old.id, old.search_key);
+    END
+    """,
+    # Stock updates touch every sale; only reindex when the search key changes
+    f"""
+    CREATE TRIGGER inventory_product_fts_update AFTER UPDATE ON inventory_product
+    WHEN old.search_key IS NOT new.search_key
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_key)
+        VALUES ('delete', old.id, old.search_key);
+        INSERT INTO {FTS_TABLE}(rowid, search_key) VALUES (new.id, new.search_key);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+# Normalisation as of this migration, frozen here so later changes to
+# inventory.search do not change what the migration writes
+SEARCH_KEY_LENGTH = 500
+
+ARABIC_FOLDING = {
+    **{code: None for code in range(0x064B, 0x0660)},
+    0x0670: None,
+    0x0640: None,
+    **{ord(c): 'ا' for c in 'أإآٱ'},
+    ord('ة'): 'ه',
+    ord('ى'): 'ي',
+    ord('ئ'): 'ي',
+    ord('ؤ'): 'و',
+    **{0x0660 + i: str(i) for i in range(10)},
+    **{0x06F0 + i: str(i) for i in range(10)},
+}
+
+
+def build_search_key(name, sku, barcode):
+    text = ' '.join(filter(None, (name, sku, barcode)))
+    return ' '.join(text.translate(ARABIC_FOLDING).casefold().split())[:SEARCH_KEY_LENGTH]
+
+
+def backfill(apps, schema_editor):
+    """Fill search_key for existing products, in primary-key chunks."""
+    Product = apps.get_model('inventory', 'Product')
+    last_pk = 0
+    while True:
+        rows = list(
+            Product.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', 'name', 'sku', 'barcode'
+            )[:500]
+        )
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        Product.objects.bulk_update([
+            Product(pk=pk, search_key=build_search_key(name, sku, barcode))
+            for pk, name, sku, barcode in rows
+        ], ['search_key'])
+
+
+def create_search_index(apps, schema_editor):
+    """Index search_key instead of the raw name, SKU and barcode."""
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS product_search_key_trgm_idx '
+            'ON inventory_product USING gin (search_key gin_trgm_ops)'
+        )
+    elif vendor == 'sqlite' and previous.sqlite_has_fts5(schema_editor):
+        for sql in SQLITE_CREATE:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS product_search_key_trgm_idx')
+    elif vendor == 'sqlite':
+        for sql in previous.SQLITE_DROP:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_product_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_key',
+            field=models.CharField(blank=True, editable=False, max_length=500, verbose_name='مفتاح البحث'),
+        ),
+        migrations.RunPython(previous.drop_search_index, previous.create_search_index),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
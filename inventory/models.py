@@ -6,12 +6,26 @@ This module contains models for:
 - Products
 - Transactions (take/restore/payment)
 - Transaction Items
+- Stock Movements (append-only stock ledger)
+- Representative Custody (products held by each representative)
 """
 
 from django.db import models
-from django.db.models import Sum
+from django.db.models import Case, F, Q, Sum, When
+from django.db.models.functions import Now
+from django.db.transaction import atomic, on_commit
+from contextlib import contextmanager
+from contextvars import ContextVar
 from decimal import Decimal
 
+from accounts.tracing import traced
+from .search import build_search_key
+from .signals import stock_changed
+
+
+# Primary keys of transactions whose total recomputation is deferred
+_deferred_totals = ContextVar('deferred_totals', default=frozenset())
+
 
 # =============================================================================
 # CATEGORY
@@ -91,6 +105,12 @@ class Product(models.Model):
         verbose_name='صورة المنتج'
     )
     
+    # Normalised name, SKU and barcode, indexed for search (see inventory.search)
+    search_key = models.CharField(
+        max_length=500, blank=True, editable=False,
+        verbose_name='مفتاح البحث'
+    )
+    
     is_active = models.BooleanField(default=True, verbose_name='نشط')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -99,10 +119,79 @@ class Product(models.Model):
         verbose_name = 'منتج'
         verbose_name_plural = 'المنتجات'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['company', 'barcode'], name='product_company_barcode_idx'),
+            models.Index(fields=['company', 'sku'], name='product_company_sku_idx'),
+            # Product list (name, id keyset) and POS catalog (active, by name)
+            models.Index(fields=['company', 'name', 'id'], name='product_company_name_idx'),
+            models.Index(fields=['company', 'is_active', 'name'], name='product_company_active_idx'),
+            # POS catalog version (Max updated_at)
+            models.Index(fields=['company', 'updated_at'], name='product_company_updated_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'barcode'], condition=~Q(barcode=''),
+                name='unique_product_barcode_per_company'
+            ),
+        ]
     
     def __str__(self):
         return self.name
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded stock so save() can turn edits into deltas
+        instance._loaded_stock = instance.__dict__.get('stock')
+        return instance
+    
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        # Reloaded stock is the new baseline, not an edit to record
+        if fields is None or 'stock' in fields:
+            self._loaded_stock = self.stock
+    
+    def save(self, *args, **kwargs):
+        """
+        Save the product without ever writing stock as an absolute value.
+        
+        New products record their initial stock as an opening movement.
+        Edits to stock on existing products are applied as a ledger delta
+        with an F-expression, so concurrent sales are never overwritten.
+        """
+        self.search_key = build_search_key(self.name, self.sku, self.barcode)
+        
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            if self.stock:
+                StockMovement.objects.create(
+                    product=self, delta=self.stock,
+                    reason=StockMovement.Reason.OPENING
+                )
+            self._loaded_stock = self.stock
+            return
+        
+        update_fields = kwargs.pop('update_fields', None)
+        if update_fields is None:
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+            ]
+        update_fields = [name for name in update_fields if name != 'stock']
+        if {'name', 'sku', 'barcode'} & set(update_fields) and 'search_key' not in update_fields:
+            update_fields.append('search_key')
+        
+        with atomic():
+            super().save(*args, update_fields=update_fields, **kwargs)
+            
+            loaded_stock = getattr(self, '_loaded_stock', None)
+            if loaded_stock is not None and self.stock != loaded_stock:
+                StockMovement.objects.record(
+                    {self.pk: self.stock - loaded_stock},
+                    StockMovement.Reason.ADJUSTMENT
+                )
+        self._loaded_stock = self.stock
+    
     @property
     def is_low_stock(self):
         """Check if product is below low stock threshold."""
@@ -120,6 +209,71 @@ class Product(models.Model):
 # TRANSACTION
 # =============================================================================
 
+class TransactionQuerySet(models.QuerySet):
+    """Batch operations over transactions."""
+    
+    @traced()
+    @atomic
+    def approve_all(self, approved_by):
+        """
+        Approve every pending transaction in the queryset in one DB transaction.
+        
+        Stock deltas are summed per product and custody deltas per
+        representative, so each product and user row is written once per
+        batch. Returns the number of transactions approved.
+        """
+        from django.utils import timezone
+        
+        pending = list(self.filter(status=Transaction.Status.PENDING).values_list('pk', flat=True))
+        if not pending:
+            return 0
+        
+        approved_at = timezone.now()
+        claimed = Transaction.objects.filter(
+            pk__in=pending, status=Transaction.Status.PENDING
+        ).update(
+            status=Transaction.Status.APPROVED,
+            approved_by=approved_by,
+            approved_at=approved_at,
+            updated_at=approved_at
+        )
+        if claimed != len(pending):
+            # Another approver got to some rows first; keep only ours
+            pending = list(Transaction.objects.filter(
+                pk__in=pending, approved_by=approved_by, approved_at=approved_at
+            ).values_list('pk', flat=True))
+        
+        items = TransactionItem.objects.filter(
+            transaction_id__in=pending,
+            transaction__type__in=[Transaction.Type.TAKE, Transaction.Type.RESTORE]
+        ).values_list('transaction_id', 'transaction__type', 'transaction__user_id', 'product_id', 'quantity')
+        
+        movements = []
+        custody = {}
+        for transaction_id, trans_type, user_id, product_id, quantity in items.iterator():
+            delta = -quantity if trans_type == Transaction.Type.TAKE else quantity
+            movements.append(StockMovement(
+                product_id=product_id, delta=delta,
+                reason=trans_type, transaction_id=transaction_id
+            ))
+            if user_id:
+                held = custody.setdefault(user_id, {})
+                held[product_id] = held.get(product_id, 0) - delta
+        
+        StockMovement.objects.apply(movements)
+        RepresentativeCustody.objects.record_many(custody)
+        return len(pending)
+    
+    @traced()
+    def reject_all(self, rejected_by):
+        """Reject every pending transaction in the queryset with one UPDATE."""
+        return self.filter(status=Transaction.Status.PENDING).update(
+            status=Transaction.Status.REJECTED,
+            approved_by=rejected_by,
+            updated_at=Now()
+        )
+
+
 class Transaction(models.Model):
     """Transaction for tracking product movements and payments."""
     
@@ -169,20 +323,95 @@ class Transaction(models.Model):
     date = models.DateTimeField(auto_now_add=True, verbose_name='التاريخ')
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TransactionQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'معاملة'
         verbose_name_plural = 'المعاملات'
         ordering = ['-date']
+        indexes = [
+            # Transaction list (date, id keyset) and dashboards
+            models.Index(fields=['company', '-date', '-id'], name='transaction_company_date_idx'),
+            models.Index(fields=['company', 'status', '-date'], name='transaction_company_status_idx'),
+            models.Index(fields=['company', 'type', 'status'], name='transaction_company_type_idx'),
+            # Representative's own transactions, pending counts and totals
+            models.Index(fields=['user', 'status', 'type'], name='transaction_user_status_idx'),
+            models.Index(fields=['user', '-date'], name='transaction_user_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_type_display()} - {self.user} - {self.amount}"
     
+    @traced()
     def update_totals(self):
         """Update transaction amount from items."""
         total = self.items.aggregate(total=Sum('total'))['total'] or Decimal('0')
         self.amount = total
         self.save(update_fields=['amount'])
     
+    @contextmanager
+    def deferred_totals(self):
+        """
+        Skip per-item total updates inside the block and update once on exit.
+        
+        Use when adding items one by one in a loop:
+        
+            with transaction.deferred_totals():
+                for ...:
+                    TransactionItem.objects.create(transaction=transaction, ...)
+        """
+        deferred = _deferred_totals.get()
+        if self.pk in deferred:
+            yield self
+            return
+        
+        token = _deferred_totals.set(deferred | {self.pk})
+        try:
+            yield self
+        finally:
+            _deferred_totals.reset(token)
+        self.update_totals()
+    
+    @traced()
+    def add_items(self, lines):
+        """
+        Bulk-create items from (product_id, quantity) pairs.
+        
+        All products are validated with a single query against the
+        transaction's company, the items are inserted with one bulk INSERT
+        and the amount is updated once. Raises Product.DoesNotExist if any
+        product id is unknown.
+        """
+        try:
+            lines = [(int(product_id), int(quantity)) for product_id, quantity in lines]
+        except (TypeError, ValueError):
+            raise Product.DoesNotExist('Invalid product id or quantity.')
+        if not lines:
+            return []
+        
+        products = Product.objects.filter(company_id=self.company_id).in_bulk(
+            {product_id for product_id, _ in lines}
+        )
+        if len(products) != len({product_id for product_id, _ in lines}):
+            raise Product.DoesNotExist('Product not found in this company.')
+        
+        items = TransactionItem.objects.bulk_create([
+            TransactionItem(
+                transaction=self,
+                product=products[product_id],
+                quantity=quantity,
+                price=products[product_id].price,
+                total=products[product_id].price * quantity
+            )
+            for product_id, quantity in lines
+        ])
+        
+        added = sum((item.total for item in items), Decimal('0'))
+        Transaction.objects.filter(pk=self.pk).update(amount=F('amount') + added)
+        self.amount += added
+        return items
+    
+    @traced()
     def approve(self, approved_by):
         """Approve the transaction and apply stock changes."""
         from django.utils import timezone
@@ -190,23 +419,39 @@ class Transaction(models.Model):
         if self.status != self.Status.PENDING:
             return False
         
-        self.status = self.Status.APPROVED
-        self.approved_by = approved_by
-        self.approved_at = timezone.now()
-        self.save()
-        
-        # Apply stock changes
-        for item in self.items.all():
-            if self.type == self.Type.TAKE:
-                item.product.stock -= item.quantity
-            elif self.type == self.Type.RESTORE:
-                item.product.stock += item.quantity
-            item.product.save()
-        
-        # Update user's products count
-        self._update_user_products_count()
+        with atomic():
+            # Claim the row so two approvers cannot apply it twice
+            approved_at = timezone.now()
+            claimed = Transaction.objects.filter(
+                pk=self.pk, status=self.Status.PENDING
+            ).update(
+                status=self.Status.APPROVED,
+                approved_by=approved_by,
+                approved_at=approved_at,
+                updated_at=approved_at
+            )
+            if not claimed:
+                return False
+            
+            self.status = self.Status.APPROVED
+            self.approved_by = approved_by
+            self.approved_at = approved_at
+            
+            # Apply stock changes
+            stock_deltas = self.stock_deltas()
+            if stock_deltas:
+                StockMovement.objects.record(
+                    stock_deltas, self.type, transaction=self
+                )
+            
+            # Move the items into or out of the representative's custody
+            if stock_deltas and self.user_id:
+                RepresentativeCustody.objects.record(
+                    self.user_id, {pk: -delta for pk, delta in stock_deltas.items()}
+                )
         return True
     
+    @traced()
     def reject(self, rejected_by):
         """Reject the transaction."""
         if self.status != self.Status.PENDING:
@@ -217,25 +462,19 @@ class Transaction(models.Model):
         self.save()
         return True
     
-    def _update_user_products_count(self):
-        """Recalculate user's product count from approved transactions."""
-        if not self.user:
-            return
+    def stock_deltas(self):
+        """Return {product_id: stock delta} this transaction applies on approval."""
+        if self.type == self.Type.TAKE:
+            sign = -1
+        elif self.type == self.Type.RESTORE:
+            sign = 1
+        else:
+            return {}
         
-        taken = Transaction.objects.filter(
-            user=self.user, 
-            type=self.Type.TAKE, 
-            status=self.Status.APPROVED
-        ).aggregate(total=Sum('items__quantity'))['total'] or 0
-        
-        restored = Transaction.objects.filter(
-            user=self.user, 
-            type=self.Type.RESTORE, 
-            status=self.Status.APPROVED
-        ).aggregate(total=Sum('items__quantity'))['total'] or 0
-        
-        self.user.products_count = taken - restored
-        self.user.save(update_fields=['products_count'])
+        deltas = {}
+        for product_id, quantity in self.items.values_list('product_id', 'quantity'):
+            deltas[product_id] = deltas.get(product_id, 0) + sign * quantity
+        return deltas
 
 
 # =============================================================================
@@ -280,5 +519,220 @@ class TransactionItem(models.Model):
         self.total = self.price * self.quantity
         super().save(*args, **kwargs)
         
-        # Update transaction total
-        self.transaction.update_totals()
+        # Update transaction total, unless the caller deferred it
+        if self.transaction_id not in _deferred_totals.get():
+            self.transaction.update_totals()
+
+
+# =============================================================================
+# STOCK MOVEMENT
+# =============================================================================
+
+class InsufficientStock(Exception):
+    """Raised when a stock decrement would take a product below zero."""
+
+
+class StockMovementManager(models.Manager):
+    """Applies stock changes and appends them to the ledger."""
+    
+    # Keeps the conditional UPDATE well below SQLite's bound-parameter limit.
+    batch_size = 200
+    
+    def record(self, deltas, reason, sale=None, transaction=None, require_stock=False):
+        """Apply {product_id: delta} to Product.stock and log one movement each."""
+        return self.apply([
+            self.model(
+                product_id=product_id, delta=delta, reason=reason,
+                sale=sale, transaction=transaction
+            )
+            for product_id, delta in deltas.items()
+        ], require_stock=require_stock)
+    
+    @traced()
+    @atomic
+    def apply(self, movements, require_stock=False):
+        """
+        Apply unsaved movements to Product.stock and append them to the ledger.
+        
+        Deltas are summed per product first, so each product row is written
+        once, with a single CASE UPDATE per batch using F-expressions;
+        concurrent writers never clobber each other. With require_stock,
+        decrements only succeed while stock >= quantity and
+        InsufficientStock is raised (rolling back) otherwise.
+        """
+        movements = [movement for movement in movements if movement.delta]
+        
+        deltas = {}
+        for movement in movements:
+            deltas[movement.product_id] = deltas.get(movement.product_id, 0) + movement.delta
+        product_ids = [pk for pk, delta in deltas.items() if delta]
+        
+        for start in range(0, len(product_ids), self.batch_size):
+            batch = product_ids[start:start + self.batch_size]
+            
+            condition = Q()
+            for product_id in batch:
+                if require_stock and deltas[product_id] < 0:
+                    condition |= Q(pk=product_id, stock__gte=-deltas[product_id])
+                else:
+                    condition |= Q(pk=product_id)
+            
+            updated = Product.objects.filter(condition).update(
+                stock=Case(
+                    *[When(pk=product_id, then=F('stock') + deltas[product_id])
+                      for product_id in batch],
+                    default=F('stock'),
+                ),
+                updated_at=Now(),
+            )
+            if updated != len(batch):
+                raise InsufficientStock()
+        
+        if product_ids:
+            changed = {pk: deltas[pk] for pk in product_ids}
+            on_commit(lambda: stock_changed.send(sender=StockMovement, deltas=changed))
+        return self.bulk_create(movements)
+
+
+class StockMovement(models.Model):
+    """Append-only ledger entry for a single change to a product's stock."""
+    
+    class Reason(models.TextChoices):
+        OPENING = 'opening', 'رصيد افتتاحي'
+        ADJUSTMENT = 'adjustment', 'تعديل يدوي'
+        TAKE = 'take', 'أخذ'
+        RESTORE = 'restore', 'إرجاع'
+        SALE = 'sale', 'بيع'
+        REFUND = 'refund', 'استرداد'
+    
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE,
+        related_name='stock_movements', verbose_name='المنتج'
+    )
+    delta = models.IntegerField(verbose_name='التغيير')
+    reason = models.CharField(
+        max_length=20, choices=Reason.choices,
+        verbose_name='السبب'
+    )
+    
+    # Source documents
+    sale = models.ForeignKey(
+        'pos.Sale', on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='stock_movements',
+        verbose_name='عملية البيع'
+    )
+    transaction = models.ForeignKey(
+        Transaction, on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='stock_movements',
+        verbose_name='المعاملة'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='التاريخ')
+    
+    objects = StockMovementManager()
+    
+    class Meta:
+        verbose_name = 'حركة مخزون'
+        verbose_name_plural = 'حركات المخزون'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.product} {self.delta:+d}"
+
+
+# =============================================================================
+# REPRESENTATIVE CUSTODY
+# =============================================================================
+
+class RepresentativeCustodyManager(models.Manager):
+    """Keeps custody rows and User.products_count in step with approvals."""
+    
+    # Keeps the conditional UPDATE well below SQLite's bound-parameter limit.
+    batch_size = 200
+    
+    def record(self, user_id, deltas):
+        """Add {product_id: delta} to a representative's custody."""
+        self.record_many({user_id: deltas})
+    
+    @traced()
+    @atomic
+    def record_many(self, deltas_by_user):
+        """
+        Add {user_id: {product_id: delta}} to custody and products_count.
+        
+        Missing rows are created first (ignoring conflicts) and then rows are
+        incremented with one CASE UPDATE per batch, so concurrent approvals
+        never lose each other's changes and each row is written once.
+        """
+        from accounts.models import User
+        
+        changes = [
+            (user_id, product_id, delta)
+            for user_id, deltas in deltas_by_user.items()
+            for product_id, delta in deltas.items()
+            if delta
+        ]
+        if not changes:
+            return
+        
+        self.bulk_create(
+            [self.model(user_id=user_id, product_id=product_id, quantity=0)
+             for user_id, product_id, _ in changes],
+            ignore_conflicts=True
+        )
+        
+        for start in range(0, len(changes), self.batch_size):
+            batch = changes[start:start + self.batch_size]
+            condition = Q()
+            for user_id, product_id, _ in batch:
+                condition |= Q(user_id=user_id, product_id=product_id)
+            
+            self.filter(condition).update(
+                quantity=Case(
+                    *[When(user_id=user_id, product_id=product_id, then=F('quantity') + delta)
+                      for user_id, product_id, delta in batch],
+                    default=F('quantity'),
+                ),
+                updated_at=Now(),
+            )
+        
+        totals = {}
+        for user_id, _, delta in changes:
+            totals[user_id] = totals.get(user_id, 0) + delta
+        user_ids = [user_id for user_id, total in totals.items() if total]
+        
+        for start in range(0, len(user_ids), self.batch_size):
+            batch = user_ids[start:start + self.batch_size]
+            User.objects.filter(pk__in=batch).update(
+                products_count=Case(
+                    *[When(pk=user_id, then=F('products_count') + totals[user_id])
+                      for user_id in batch],
+                    default=F('products_count'),
+                )
+            )
+
+
+class RepresentativeCustody(models.Model):
+    """Quantity of a product currently held by a representative."""
+    
+    user = models.ForeignKey(
+        'accounts.User', on_delete=models.CASCADE,
+        related_name='custody', verbose_name='المندوب'
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE,
+        related_name='custody', verbose_name='المنتج'
+    )
+    quantity = models.IntegerField(default=0, verbose_name='الكمية')
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = RepresentativeCustodyManager()
+    
+    class Meta:
+        verbose_name = 'عهدة مندوب'
+        verbose_name_plural = 'عهد المندوبين'
+        unique_together = ['user', 'product']
+    
+    def __str__(self):
+        return f"{self.user} - {self.product} x {self.quantity}"
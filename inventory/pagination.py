@@ -0,0 +1,125 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of OFFSET and COUNT(*), each page continues after the ordering
+values of the previous page's last row, so every page costs the same
+single indexed query however deep it is, and rows inserted meanwhile do
+not shift later pages.
+
+The ordering must end with a unique field (usually id) and its fields
+must not be null. Cursors are opaque URL-safe strings.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """One page of rows plus the cursor and query string of the next page."""
+
+    def __init__(self, object_list, next_cursor, query):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.query = query
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return 'cursor' not in self.query
+
+    @property
+    def next_query(self):
+        """Current query string with the cursor moved to the next page."""
+        query = self.query.copy()
+        query['cursor'] = self.next_cursor
+        return query.urlencode()
+
+    @property
+    def first_query(self):
+        """Current query string without a cursor."""
+        query = self.query.copy()
+        query.pop('cursor', None)
+        return query.urlencode()
+
+
+def encode_cursor(values):
+    values = [
+        value.isoformat() if isinstance(value, (date, datetime))
+        else str(value) if isinstance(value, Decimal)
+        else value
+        for value in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(model, ordering, cursor):
+    """Return the ordering values encoded in a cursor, or None if it is invalid."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(ordering):
+        return None
+
+    try:
+        return [
+            model._meta.get_field(name.lstrip('-')).to_python(value)
+            for name, value in zip(ordering, values)
+        ]
+    except ValidationError:
+        return None
+
+
+def after(ordering, values):
+    """Condition selecting rows that sort strictly after the given ordering values."""
+    condition = Q()
+    for i, name in enumerate(ordering):
+        field = name.lstrip('-')
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        step = Q(**{f'{field}__{lookup}': values[i]})
+        for previous, value in zip(ordering[:i], values[:i]):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def keyset_page(request, queryset, ordering, per_page):
+    """
+    Return the page of queryset after ?cursor=, ordered by ordering.
+
+    Fetches one extra row to know whether there is a next page, so no
+    COUNT query is needed. An invalid cursor restarts at the first page.
+    """
+    ordering = tuple(ordering)
+    queryset = queryset.order_by(*ordering)
+
+    cursor = request.GET.get('cursor')
+    values = decode_cursor(queryset.model, ordering, cursor) if cursor else None
+    if values is not None:
+        queryset = queryset.filter(after(ordering, values))
+
+    rows = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, name.lstrip('-')) for name in ordering])
+
+    return KeysetPage(rows, next_cursor, request.GET)
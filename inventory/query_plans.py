@@ -0,0 +1,92 @@
+"""
+EXPLAIN checks for the main list view queries.
+
+view_queries() builds, for one company, the querysets the inventory,
+POS and report views run on every page load; full_scans() reads a
+query plan and names the large tables it scans from end to end. The
+test suite asserts that none of them does (inventory.tests), and the
+check_query_plans command runs the same check against a seeded
+database.
+"""
+
+import re
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.models import User
+from pos.models import Sale, SaleItem
+from pos.views import day_range
+from reports import analytics
+from .models import Product, Transaction
+from .search import filter_products
+
+
+# Tables that grow with usage; a full scan of any of them is a failure
+LARGE_MODELS = (Transaction, Sale, SaleItem, Product, User)
+
+# Plan lines that read every row of a table
+FULL_SCAN = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(\w+)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+
+
+def full_scans(plan, tables):
+    """Sorted names of the given tables that the plan scans from end to end."""
+    return sorted({table for table in FULL_SCAN[connection.vendor].findall(plan) if table in tables})
+
+
+def view_queries(company_id):
+    """(label, queryset) pairs mirroring what the views run."""
+    transactions = Transaction.objects.filter(company_id=company_id)
+    products = Product.objects.filter(company_id=company_id)
+    today = timezone.localdate()
+    
+    yield 'inventory dashboard: recent transactions', transactions.order_by('-date')[:10]
+    yield 'inventory dashboard: pending count', transactions.filter(status=Transaction.Status.PENDING)
+    yield 'inventory dashboard: representatives count', User.objects.filter(
+        company_id=company_id, role=User.Role.REPRESENTATIVE
+    )
+    yield 'transactions list', transactions.order_by('-date', '-id')[:21]
+    yield 'transactions list: by status', transactions.filter(
+        status=Transaction.Status.PENDING
+    ).order_by('-date', '-id')[:21]
+    yield 'transactions list: by type', transactions.filter(
+        type=Transaction.Type.TAKE
+    ).order_by('-date', '-id')[:21]
+    yield 'products list', products.order_by('name', 'id')[:21]
+    
+    sample = products.values_list('name', flat=True).first()
+    if sample:
+        yield 'products search', filter_products(products, sample.split()[0])[:21]
+    
+    yield 'POS catalog', products.filter(is_active=True).order_by('name')
+    yield 'POS catalog: version', products.values('company_id').annotate(updated_at=Max('updated_at'))
+    yield 'POS catalog: changes', products.filter(updated_at__gte=timezone.now() - timedelta(hours=1))
+    
+    rep = User.objects.filter(company_id=company_id, role=User.Role.REPRESENTATIVE).first()
+    if rep:
+        mine = Transaction.objects.filter(user=rep)
+        yield 'representative transactions', mine.order_by('-date')
+        yield 'representative dashboard: pending count', mine.filter(status=Transaction.Status.PENDING)
+        yield 'representative dashboard: totals', mine.filter(
+            type=Transaction.Type.TAKE, status=Transaction.Status.APPROVED
+        )
+    
+    cashier = User.objects.filter(company_id=company_id, role=User.Role.CASHIER).first()
+    if cashier:
+        sales = Sale.objects.filter(cashier=cashier)
+        yield 'sales history', sales.order_by('-created_at', '-id')[:51]
+        yield 'sales history: today', sales.filter(status=Sale.Status.COMPLETED, **day_range(today))
+        yield 'daily summary', sales.filter(
+            status__in=[Sale.Status.COMPLETED, Sale.Status.REFUNDED], **day_range(today)
+        )
+    
+    items = analytics.sale_items(company_id, today - timedelta(days=29), today)
+    yield 'profit report: by product', items.values('product_id').annotate(**analytics.METRICS)
+    yield 'profit report: by period', items.values(
+        period=analytics.PERIODS['day']('sale__created_at')
+    ).annotate(**analytics.METRICS)
@@ -0,0 +1,195 @@
+"""
+Product search backends.
+
+Product search (POS search box, POS grid filter, inventory product list)
+goes through filter_products(), which picks a backend for the database
+in use. All backends search Product.search_key, the product's name, SKU
+and barcode passed through normalize(), and normalise the query the
+same way, so Arabic spelling variants and diacritics match:
+
+- PostgreSQL: substring matching served by a pg_trgm GIN index on
+  search_key, ranked by trigram word similarity.
+- SQLite: an FTS5 table over search_key kept in sync with
+  inventory_product by triggers, matching word prefixes, ranked by bm25;
+  SKU and barcode fragments also match mid-word.
+- Anything else (or SQLite built without FTS5): plain substring matching.
+
+The indexes, FTS table and triggers are created by migrations
+0005_product_search and 0006_product_search_key. PRODUCT_SEARCH_BACKEND
+may name a backend class explicitly (dotted path).
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+FTS_TABLE = 'inventory_product_fts'
+
+SEARCH_KEY_LENGTH = 500
+
+# A single term with a digit in it, such as a barcode or SKU fragment
+CODE_QUERY = re.compile(r'[\w.-]*\d[\w.-]*')
+
+# Tashkeel (harakat, tanween, shadda, sukun, Quranic marks), superscript
+# alef and tatweel are dropped; letter variants fold to one base letter.
+_ARABIC_FOLDING = {
+    **{code: None for code in range(0x064B, 0x0660)},
+    0x0670: None,
+    0x0640: None,
+    **{ord(c): 'ا' for c in 'أإآٱ'},
+    ord('ة'): 'ه',
+    ord('ى'): 'ي',
+    ord('ئ'): 'ي',
+    ord('ؤ'): 'و',
+    # Arabic-Indic and Persian digits, as typed from Arabic keyboards
+    **{0x0660 + i: str(i) for i in range(10)},
+    **{0x06F0 + i: str(i) for i in range(10)},
+}
+
+_backend = None
+
+
+def normalize(text):
+    """Fold Arabic letter variants, strip diacritics, lowercase Latin and collapse spaces."""
+    return ' '.join(text.translate(_ARABIC_FOLDING).casefold().split())
+
+
+def build_search_key(name, sku='', barcode=''):
+    """Search key stored on Product.search_key."""
+    return normalize(' '.join(filter(None, (name, sku, barcode))))[:SEARCH_KEY_LENGTH]
+
+
+class SearchBackend:
+    """Substring matching; works on every database but scans all company products."""
+
+    def filter(self, queryset, query):
+        return queryset.filter(search_key__contains=query)
+
+    def rank(self, queryset, query):
+        return queryset.order_by('name', 'id')
+
+
+class PostgresSearchBackend(SearchBackend):
+    """search_key LIKE '%q%' is served by the search_key gin_trgm_ops index."""
+
+    def rank(self, queryset, query):
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        return queryset.annotate(
+            search_rank=TrigramWordSimilarity(query, 'search_key')
+        ).order_by('-search_rank', 'name', 'id')
+
+
+class SqliteFtsSearchBackend(SearchBackend):
+    """
+    Word-prefix matching over the FTS5 index of search_key.
+
+    FTS5 cannot match inside a word, so a query that looks like a code (a
+    single term containing a digit) also matches anywhere in the SKU or
+    barcode, as the other backends do; "0010" still finds 6281000010123.
+    """
+
+    def match_expression(self, query):
+        # Quote every term so FTS5 syntax in the input is taken literally
+        terms = re.findall(r'\w+', query)
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def filter(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return super().filter(queryset, query)
+        condition = Q(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]
+        ))
+        if CODE_QUERY.fullmatch(query):
+            condition |= Q(sku__icontains=query) | Q(barcode__icontains=query)
+        return queryset.filter(condition)
+
+    def rank(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return super().rank(queryset, query)
+        table = queryset.model._meta.db_table
+        return queryset.annotate(search_rank=RawSQL(
+            f'SELECT rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'AND {FTS_TABLE}.rowid = "{table}"."id"',
+            [match]
+        )).order_by(F('search_rank').asc(nulls_last=True), 'name', 'id')
+
+
+def sqlite_fts_available():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def get_backend():
+    """Return the search backend for the default database, chosen once per process."""
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'PRODUCT_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'postgresql':
+            _backend = PostgresSearchBackend()
+        elif connection.vendor == 'sqlite' and sqlite_fts_available():
+            _backend = SqliteFtsSearchBackend()
+        else:
+            _backend = SearchBackend()
+    return _backend
+
+
+def filter_products(queryset, query, ranked=False):
+    """
+    Restrict a Product queryset to products matching the query.
+
+    With ranked=True the result is ordered by relevance; otherwise the
+    caller's ordering applies.
+    """
+    query = normalize(query)
+    if not query:
+        return queryset
+
+    backend = get_backend()
+    queryset = backend.filter(queryset, query)
+    if ranked:
+        queryset = backend.rank(queryset, query)
+    return queryset
+
+
+def backfill_search_keys(queryset, batch_size=500):
+    """
+    Recompute search_key for the products in queryset, in primary-key chunks.
+
+    Only rows whose key changed are written. Returns the number of rows
+    updated.
+    """
+    model = queryset.model
+    updated = 0
+    last_pk = 0
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', 'name', 'sku', 'barcode', 'search_key'
+            )[:batch_size]
+        )
+        if not rows:
+            return updated
+        last_pk = rows[-1][0]
+
+        changed = []
+        for pk, name, sku, barcode, search_key in rows:
+            key = build_search_key(name, sku, barcode)
+            if key != search_key:
+                changed.append(model(pk=pk, search_key=key))
+        if changed:
+            model._base_manager.bulk_update(changed, ['search_key'])
+            updated += len(changed)
@@ -51,11 +51,15 @@ INSTALLED_APPS = [
 ]
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'accounts.profiling.SQLProfilingMiddleware',
+    'accounts.metrics.MetricsMiddleware',
+    'accounts.tracing.TracingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.TenantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,7 +68,8 @@ ROOT_URLCONF = 'inventory.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's backend with template rendering spans (accounts.tracing)
+        'BACKEND': 'accounts.tracing.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -105,6 +110,61 @@ if os.environ.get('DB_NAME'):
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Shared cache across workers (requires the `redis` package)
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+
+# Subscription validity and plan features cached per company (accounts.cache)
+TENANT_CACHE_ALIAS = 'default'
+TENANT_CACHE_TIMEOUT = int(os.environ.get('TENANT_CACHE_TIMEOUT', 3600))
+
+# Barcode/SKU scanner index (pos.product_index); shared between workers
+# only when a shared cache alias is set
+PRODUCT_INDEX_CACHE_ALIAS = 'default' if os.environ.get('REDIS_URL') else None
+PRODUCT_INDEX_TIMEOUT = int(os.environ.get('PRODUCT_INDEX_TIMEOUT', 300))
+
+# SQL profiling (accounts.profiling): off unless SQL_PROFILING is set.
+# Profiled requests go to a rotating JSON-lines log, summarised at
+# /accounts/platform/perf/
+SQL_PROFILING = os.environ.get('SQL_PROFILING', 'False').lower() in ('true', '1', 't')
+SQL_PROFILING_SAMPLE_RATE = float(os.environ.get('SQL_PROFILING_SAMPLE_RATE', 1.0))
+SQL_PROFILING_N_PLUS_ONE = int(os.environ.get('SQL_PROFILING_N_PLUS_ONE', 5))
+SQL_PROFILING_LOG = os.environ.get('SQL_PROFILING_LOG', str(BASE_DIR / 'logs' / 'sql_profile.log'))
+SQL_PROFILING_LOG_MAX_BYTES = 5 * 1024 * 1024
+SQL_PROFILING_LOG_BACKUPS = 3
+
+# Prometheus metrics (accounts.metrics), cheap enough to leave on.
+# /metrics answers only requests with "Authorization: Bearer <METRICS_TOKEN>",
+# and is disabled while no token is set
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() in ('true', '1', 't')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ACTIVE_TILL_SECONDS = int(os.environ.get('METRICS_ACTIVE_TILL_SECONDS', 300))
+
+# Request tracing (accounts.tracing): off unless TRACING is set. Spans go
+# to a rotating JSON-lines log and, with TRACING_OTEL, to the OpenTelemetry
+# API (needs opentelemetry-api and an exporter configured by the deployment)
+TRACING = os.environ.get('TRACING', 'False').lower() in ('true', '1', 't')
+TRACING_SAMPLE_RATE = float(os.environ.get('TRACING_SAMPLE_RATE', 1.0))
+TRACING_OTEL = os.environ.get('TRACING_OTEL', 'False').lower() in ('true', '1', 't')
+TRACING_LOG = os.environ.get('TRACING_LOG', str(BASE_DIR / 'logs' / 'traces.jsonl'))
+TRACING_LOG_MAX_BYTES = 10 * 1024 * 1024
+TRACING_LOG_BACKUPS = 3
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,9 @@
+"""Signals for inventory app."""
+
+from django.dispatch import Signal
+
+
+# Sent after a committed stock change made by StockMovementManager.apply
+# or rebuild_stock --fix, with deltas={product_id: delta}. Stock is updated
+# with queryset UPDATEs, so Product post_save does not fire for these changes.
+stock_changed = Signal()
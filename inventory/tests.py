@@ -0,0 +1,576 @@
+"""Tests for the inventory app."""
+
+import base64
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Company, CompanySubscription, SubscriptionPlan, User
+from pos import product_index
+from pos.models import Sale
+from pos.services import checkout
+from .management.commands.benchmark_views import url_names
+from .pagination import encode_cursor, keyset_page
+from .models import (
+    Category, InsufficientStock, Product, RepresentativeCustody, StockMovement, Transaction,
+)
+from .query_plans import LARGE_MODELS, full_scans, view_queries
+from .search import SEARCH_KEY_LENGTH, build_search_key, filter_products, normalize
+from .signals import stock_changed
+
+
+class ProductStockLedgerTests(TestCase):
+    """Product.save() turns stock edits into ledger movements."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        cls.category = Category.objects.create(company=cls.company, name='category')
+    
+    def create_product(self, stock):
+        return Product.objects.create(
+            company=self.company, category=self.category, name='product',
+            price=Decimal('10'), cost=Decimal('7'), stock=stock
+        )
+    
+    def ledger_total(self, product):
+        return StockMovement.objects.filter(product=product).aggregate(total=Sum('delta'))['total']
+    
+    def test_refresh_then_save_records_no_adjustment(self):
+        product = self.create_product(323)
+        StockMovement.objects.record({product.pk: -2}, StockMovement.Reason.SALE)
+        
+        product.refresh_from_db()
+        product.description = 'changed'
+        product.save()
+        
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 321)
+        self.assertEqual(self.ledger_total(product), 321)
+        self.assertFalse(StockMovement.objects.filter(
+            product=product, reason=StockMovement.Reason.ADJUSTMENT
+        ).exists())
+    
+    def test_stock_edit_records_adjustment(self):
+        product = self.create_product(10)
+        product.stock = 15
+        product.save()
+        
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 15)
+        self.assertEqual(self.ledger_total(product), 15)
+    
+    def test_new_product_records_opening(self):
+        product = self.create_product(12)
+        
+        self.assertEqual(
+            list(StockMovement.objects.filter(product=product).values_list('reason', 'delta')),
+            [(StockMovement.Reason.OPENING, 12)]
+        )
+
+
+class RebuildStockTests(TestCase):
+    """rebuild_stock --fix restores stock from the ledger, and the POS index follows."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        cls.products = [
+            Product.objects.create(
+                company=cls.company, name=f'product {i}', price=Decimal('10'), barcode=f'code{i}', stock=10
+            )
+            for i in range(3)
+        ]
+    
+    def setUp(self):
+        product_index.invalidate(self.company.pk)
+        self.addCleanup(product_index.invalidate, self.company.pk)
+    
+    def test_fix_updates_stock_and_index(self):
+        drifted = {self.products[0].pk: 4, self.products[2].pk: 25}
+        for pk, stock in drifted.items():
+            Product.objects.filter(pk=pk).update(stock=stock)
+        product_index.get_index(self.company.pk)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_stock', fix=True, batch_size=2, stdout=StringIO())
+        
+        for i, product in enumerate(self.products):
+            with self.subTest(product=i):
+                self.assertEqual(Product.objects.get(pk=product.pk).stock, 10)
+                self.assertEqual(product_index.lookup(self.company.pk, f'code{i}')['stock'], 10)
+    
+    def test_check_only_changes_nothing(self):
+        Product.objects.filter(pk=self.products[0].pk).update(stock=4)
+        out = StringIO()
+        
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            call_command('rebuild_stock', stdout=out)
+        
+        self.assertEqual(callbacks, [])
+        self.assertIn('1 drifted', out.getvalue())
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock, 4)
+
+class ReconcileCustodyTests(TestCase):
+    """reconcile_custody compares custody rows and products_count with approved history."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        cls.rep = User.objects.create_user(
+            username='rep', password='password', company=company, role=User.Role.REPRESENTATIVE
+        )
+        cls.tea = Product.objects.create(company=company, name='tea', price=Decimal('10'), stock=50)
+        cls.sugar = Product.objects.create(company=company, name='sugar', price=Decimal('4'), stock=50)
+        take = Transaction.objects.create(company=company, user=cls.rep, type=Transaction.Type.TAKE)
+        take.add_items([(cls.tea.pk, 5), (cls.sugar.pk, 3)])
+        take.approve(cls.rep)
+    
+    def custody(self):
+        return dict(RepresentativeCustody.objects.filter(user=self.rep).values_list('product_id', 'quantity'))
+    
+    def test_dry_run_reports_custody_row_drift(self):
+        # Rows move between products, products_count stays right
+        RepresentativeCustody.objects.filter(user=self.rep, product=self.tea).update(quantity=6)
+        RepresentativeCustody.objects.filter(user=self.rep, product=self.sugar).update(quantity=2)
+        out = StringIO()
+        
+        call_command('reconcile_custody', dry_run=True, stdout=out)
+        
+        output = out.getvalue()
+        self.assertIn(f'product #{self.tea.pk} custody=6 history=5', output)
+        self.assertIn(f'product #{self.sugar.pk} custody=2 history=3', output)
+        self.assertNotIn('products_count=', output)
+        self.assertIn('1 drifted (2 custody rows)', output)
+        self.assertEqual(self.custody(), {self.tea.pk: 6, self.sugar.pk: 2})
+    
+    def test_missing_and_extra_rows(self):
+        RepresentativeCustody.objects.filter(user=self.rep, product=self.tea).delete()
+        User.objects.filter(pk=self.rep.pk).update(products_count=3)
+        out = StringIO()
+        
+        call_command('reconcile_custody', dry_run=True, stdout=out)
+        self.assertIn('products_count=3 history=8', out.getvalue())
+        self.assertIn(f'product #{self.tea.pk} custody=0 history=5', out.getvalue())
+        
+        call_command('reconcile_custody', stdout=StringIO())
+        self.assertEqual(self.custody(), {self.tea.pk: 5, self.sugar.pk: 3})
+        self.assertEqual(User.objects.get(pk=self.rep.pk).products_count, 8)
+        
+        out = StringIO()
+        call_command('reconcile_custody', dry_run=True, stdout=out)
+        self.assertIn('0 drifted (0 custody rows)', out.getvalue())
+
+class StockMovementManagerTests(TestCase):
+    """StockMovementManager.apply() keeps stock and the ledger in step."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        cls.products = [
+            Product.objects.create(company=cls.company, name=f'product {i}', price=Decimal('10'), stock=10)
+            for i in range(7)
+        ]
+    
+    def stocks(self):
+        return dict(Product.objects.filter(company=self.company).values_list('pk', 'stock'))
+    
+    def test_batches_apply_every_delta(self):
+        deltas = {product.pk: i - 3 for i, product in enumerate(self.products)}
+        
+        # 7 products in batches of 3: two full CASE UPDATEs and a partial one
+        with mock.patch.object(StockMovement.objects, 'batch_size', 3):
+            StockMovement.objects.record(deltas, StockMovement.Reason.ADJUSTMENT)
+        
+        self.assertEqual(self.stocks(), {pk: 10 + delta for pk, delta in deltas.items()})
+        ledger = StockMovement.objects.filter(product__company=self.company).values('product')
+        self.assertEqual(
+            dict(ledger.annotate(total=Sum('delta')).values_list('product', 'total')), self.stocks()
+        )
+    
+    def test_movements_are_summed_per_product(self):
+        product = self.products[0]
+        StockMovement.objects.apply([
+            StockMovement(product=product, delta=-4, reason=StockMovement.Reason.TAKE),
+            StockMovement(product=product, delta=-5, reason=StockMovement.Reason.TAKE),
+            StockMovement(product=product, delta=2, reason=StockMovement.Reason.RESTORE),
+        ], require_stock=True)
+        
+        self.assertEqual(self.stocks()[product.pk], 3)
+    
+    def test_require_stock_refuses_negative_balance(self):
+        enough, short = self.products[0], self.products[-1]
+        
+        with mock.patch.object(StockMovement.objects, 'batch_size', 3):
+            with self.assertRaises(InsufficientStock):
+                StockMovement.objects.record(
+                    {enough.pk: -10, short.pk: -11}, StockMovement.Reason.SALE, require_stock=True
+                )
+        
+        # The whole call rolls back, including batches that succeeded
+        self.assertEqual(set(self.stocks().values()), {10})
+        self.assertFalse(StockMovement.objects.filter(reason=StockMovement.Reason.SALE).exists())
+    
+    def test_without_require_stock_balance_may_go_negative(self):
+        product = self.products[0]
+        StockMovement.objects.record({product.pk: -11}, StockMovement.Reason.ADJUSTMENT)
+        
+        self.assertEqual(self.stocks()[product.pk], -1)
+    
+    def test_stock_changed_fires_on_commit(self):
+        received = []
+        
+        def receiver(sender, deltas, **kwargs):
+            received.append(deltas)
+        
+        stock_changed.connect(receiver)
+        self.addCleanup(stock_changed.disconnect, receiver)
+        product = self.products[0]
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            StockMovement.objects.record({product.pk: -2}, StockMovement.Reason.SALE)
+            self.assertEqual(received, [])
+        self.assertEqual(received, [{product.pk: -2}])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    StockMovement.objects.record({product.pk: -3}, StockMovement.Reason.SALE)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(received, [{product.pk: -2}])
+
+
+class BulkApprovalTests(TestCase):
+    """Batch approval moves stock and custody exactly once per transaction."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        plan = SubscriptionPlan.objects.create(name='plan', max_products=100, max_users=10)
+        cls.company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        CompanySubscription.objects.create(
+            company=cls.company, plan=plan, status=CompanySubscription.Status.ACTIVE,
+            start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=30)
+        )
+        cls.accountant = User.objects.create_user(
+            username='accountant', password='password', company=cls.company, role=User.Role.ACCOUNTANT
+        )
+        cls.first, cls.second = (
+            User.objects.create_user(
+                username=name, password='password', company=cls.company, role=User.Role.REPRESENTATIVE
+            )
+            for name in ('first', 'second')
+        )
+        cls.tea = Product.objects.create(company=cls.company, name='tea', price=Decimal('10'), stock=50)
+        cls.sugar = Product.objects.create(company=cls.company, name='sugar', price=Decimal('4'), stock=50)
+    
+    def create_transaction(self, user, trans_type, lines):
+        trans = Transaction.objects.create(company=self.company, user=user, type=trans_type)
+        trans.add_items(lines)
+        return trans
+    
+    def stock(self, product):
+        return Product.objects.get(pk=product.pk).stock
+    
+    def custody(self, user):
+        return dict(RepresentativeCustody.objects.filter(user=user).values_list('product_id', 'quantity'))
+    
+    def products_count(self, user):
+        return User.objects.get(pk=user.pk).products_count
+    
+    def test_approving_twice_applies_once(self):
+        take = self.create_transaction(self.first, Transaction.Type.TAKE, [(self.tea.pk, 5), (self.sugar.pk, 2)])
+        self.client.force_login(self.accountant)
+        
+        for _ in range(2):
+            self.client.post(reverse('inventory:bulk_transactions'), {
+                'action': 'approve', 'transaction_ids': [str(take.pk)],
+            })
+        
+        take.refresh_from_db()
+        self.assertEqual(take.status, Transaction.Status.APPROVED)
+        self.assertEqual(take.approved_by, self.accountant)
+        self.assertEqual(self.stock(self.tea), 45)
+        self.assertEqual(self.stock(self.sugar), 48)
+        self.assertEqual(self.custody(self.first), {self.tea.pk: 5, self.sugar.pk: 2})
+        self.assertEqual(self.products_count(self.first), 7)
+        self.assertEqual(StockMovement.objects.filter(transaction=take).count(), 2)
+    
+    def test_mixed_take_and_restore_batch(self):
+        self.create_transaction(self.first, Transaction.Type.TAKE, [(self.tea.pk, 5)]).approve(self.accountant)
+        batch = [
+            self.create_transaction(self.first, Transaction.Type.TAKE, [(self.tea.pk, 3), (self.sugar.pk, 4)]),
+            self.create_transaction(self.first, Transaction.Type.RESTORE, [(self.tea.pk, 6)]),
+            self.create_transaction(self.second, Transaction.Type.TAKE, [(self.sugar.pk, 10)]),
+            self.create_transaction(self.second, Transaction.Type.RESTORE, [(self.sugar.pk, 1)]),
+            self.create_transaction(self.second, Transaction.Type.PAYMENT, []),
+        ]
+        
+        approved = Transaction.objects.filter(pk__in=[t.pk for t in batch]).approve_all(self.accountant)
+        
+        self.assertEqual(approved, 5)
+        self.assertEqual(self.stock(self.tea), 50 - 5 - 3 + 6)
+        self.assertEqual(self.stock(self.sugar), 50 - 4 - 10 + 1)
+        self.assertEqual(self.custody(self.first), {self.tea.pk: 2, self.sugar.pk: 4})
+        self.assertEqual(self.custody(self.second), {self.sugar.pk: 9})
+        self.assertEqual(self.products_count(self.first), 6)
+        self.assertEqual(self.products_count(self.second), 9)
+        self.assertEqual(Transaction.objects.filter(status=Transaction.Status.APPROVED).count(), 6)
+    
+    def test_reject_all_skips_decided_rows(self):
+        approved = self.create_transaction(self.first, Transaction.Type.TAKE, [(self.tea.pk, 5)])
+        approved.approve(self.accountant)
+        pending = self.create_transaction(self.first, Transaction.Type.TAKE, [(self.tea.pk, 1)])
+        
+        rejected = Transaction.objects.filter(pk__in=[approved.pk, pending.pk]).reject_all(self.accountant)
+        
+        self.assertEqual(rejected, 1)
+        approved.refresh_from_db()
+        pending.refresh_from_db()
+        self.assertEqual(approved.status, Transaction.Status.APPROVED)
+        self.assertEqual(pending.status, Transaction.Status.REJECTED)
+        self.assertEqual(self.stock(self.tea), 45)
+        self.assertEqual(self.custody(self.first), {self.tea.pk: 5})
+        
+        # Rejected rows are not approvable any more
+        self.assertEqual(Transaction.objects.filter(pk=pending.pk).approve_all(self.accountant), 0)
+        self.assertEqual(self.stock(self.tea), 45)
+
+
+class QueryPlanTests(TestCase):
+    """The main list view queries are served by indexes, not full table scans."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('company', 'other'):
+            company = Company.objects.create(name=name, email=f'{name}@example.com', phone='1')
+            rep = User.objects.create_user(
+                username=f'{name} rep', password='password', company=company, role=User.Role.REPRESENTATIVE
+            )
+            cashier = User.objects.create_user(
+                username=f'{name} cashier', password='password', company=company, role=User.Role.CASHIER
+            )
+            products = [
+                Product.objects.create(company=company, name=f'منتج {i}', price=Decimal('10'), stock=100)
+                for i in range(5)
+            ]
+            for trans_type in (Transaction.Type.TAKE, Transaction.Type.RESTORE):
+                trans = Transaction.objects.create(company=company, user=rep, type=trans_type)
+                trans.add_items([(products[0].pk, 1)])
+            checkout(
+                company, cashier, [{'id': product.pk, 'quantity': 1} for product in products],
+                payment_method=Sale.PaymentMethod.CASH, amount_paid=Decimal('100')
+            )
+        cls.company = company
+    
+    def test_no_full_scans(self):
+        if connection.vendor == 'postgresql':
+            # Small tables are cheaper to scan; ask whether an index could serve the query at all
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        large = {model._meta.db_table for model in LARGE_MODELS}
+        
+        labels = []
+        for label, queryset in view_queries(self.company.pk):
+            labels.append(label)
+            plan = queryset.explain()
+            with self.subTest(label):
+                self.assertEqual(full_scans(plan, large), [], plan)
+        
+        # Every optional query had data to be built from
+        self.assertIn('products search', labels)
+        self.assertIn('representative transactions', labels)
+        self.assertIn('daily summary', labels)
+
+
+class BenchmarkViewsTests(TestCase):
+    """benchmark_views requests every URL of a small seeded company and compares with its baseline."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_load_data', companies=1, products=30, categories=3, representatives=2, cashiers=2,
+            transactions=20, years=0.02, sales_per_day=5, stdout=StringIO()
+        )
+    
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.baseline = Path(directory) / 'views.json'
+    
+    def benchmark(self, **options):
+        call_command(
+            'benchmark_views', baseline=str(self.baseline), repeat=1,
+            threshold=100, min_ms=10000, stdout=StringIO(), **options
+        )
+        return json.loads(self.baseline.read_text(encoding='utf-8'))['routes']
+    
+    def test_every_view_answers(self):
+        routes = self.benchmark(save=True)
+        
+        self.assertEqual(sorted(routes), sorted(url_names()))
+        for name, result in routes.items():
+            with self.subTest(name):
+                self.assertIsInstance(result['status'], int, result['status'])
+                self.assertLess(result['status'], 500)
+        
+        # Writes are rolled back
+        self.assertFalse(Product.objects.filter(name='benchmark').exists())
+    
+    def test_extra_queries_fail(self):
+        self.benchmark(save=True)
+        baseline = json.loads(self.baseline.read_text(encoding='utf-8'))
+        baseline['routes']['inventory:products']['queries'] -= 1
+        self.baseline.write_text(json.dumps(baseline), encoding='utf-8')
+        
+        with self.assertRaisesMessage(CommandError, 'inventory:products'):
+            self.benchmark(route='inventory:products')
+
+
+class ProductSearchTests(TestCase):
+    """filter_products() behaves the same on every search backend."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        cls.juice = Product.objects.create(
+            company=cls.company, name='Orange juice', price=Decimal('5'),
+            sku='JU-2210-B', barcode='6281000010123'
+        )
+        cls.tea = Product.objects.create(
+            company=cls.company, name='Green tea', price=Decimal('5'), sku='TEA-7', barcode='5000000000017'
+        )
+    
+    def search(self, query, ranked=False):
+        products = Product.objects.filter(company=self.company).order_by('pk')
+        return list(filter_products(products, query, ranked=ranked))
+    
+    def test_code_fragments_match_anywhere(self):
+        for query in ('0010', '0010123', '2210', '2210-b', 'ju-2210'):
+            with self.subTest(query):
+                self.assertEqual(self.search(query), [self.juice])
+                self.assertEqual(self.search(query, ranked=True), [self.juice])
+    
+    def test_words_match_by_prefix(self):
+        self.assertEqual(self.search('oran'), [self.juice])
+        self.assertEqual(self.search('GREEN'), [self.tea])
+        self.assertEqual(self.search('000'), [self.juice, self.tea])
+
+
+class ArabicNormalizationTests(TestCase):
+    """normalize() folds spelling variants so they find each other."""
+    
+    def test_hamza_forms_fold_to_bare_letters(self):
+        self.assertEqual(normalize('أحمد إبراهيم آمال ٱلله'), 'احمد ابراهيم امال الله')
+        self.assertEqual(normalize('شاطئ مؤسسة'), 'شاطي موسسه')
+    
+    def test_alef_maqsura_and_taa_marbuta(self):
+        self.assertEqual(normalize('مستشفى'), normalize('مستشفي'))
+        self.assertEqual(normalize('مدرسة'), 'مدرسه')
+    
+    def test_diacritics_and_tatweel_are_dropped(self):
+        self.assertEqual(normalize('شَايٌ أَخْضَرُ'), 'شاي اخضر')
+        self.assertEqual(normalize('قـــهـوة'), 'قهوه')
+        self.assertEqual(normalize('رحمٰن'), 'رحمن')
+    
+    def test_digits_case_and_spaces(self):
+        self.assertEqual(normalize('١٢٣ ۴۵۶'), '123 456')
+        self.assertEqual(normalize('  Green\tTEA  '), 'green tea')
+    
+    def test_search_key(self):
+        self.assertEqual(build_search_key('زيت الزيتون', 'OIL-1', '628'), 'زيت الزيتون oil-1 628')
+        self.assertEqual(build_search_key('عسل', '', None), 'عسل')
+        self.assertEqual(len(build_search_key('ا' * 600)), SEARCH_KEY_LENGTH)
+    
+    def test_variants_find_each_other(self):
+        company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        product = Product.objects.create(company=company, name='مُسْتَشْفَى الأطفال', price=Decimal('1'))
+        
+        self.assertEqual(product.search_key, 'مستشفي الاطفال')
+        for query in ('مستشفي', 'مستشفى الاطفال', 'الأطفال', 'الإطفال'):
+            with self.subTest(query):
+                self.assertEqual(list(filter_products(Product.objects.all(), query)), [product])
+
+
+class KeysetPaginationTests(TestCase):
+    """keyset_page() walks a queryset with duplicate sort values without skipping or repeating rows."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        # Three names and four prices for 13 products, so most sort values repeat
+        Product.objects.bulk_create([
+            Product(company=cls.company, name=f'product {i % 3}', price=Decimal(i % 4), stock=0)
+            for i in range(13)
+        ])
+        trans = Transaction.objects.bulk_create([
+            Transaction(company=cls.company, type=Transaction.Type.PAYMENT) for _ in range(9)
+        ])
+        moments = [timezone.now() - timedelta(days=i % 2) for i in range(len(trans))]
+        for item, moment in zip(trans, moments):
+            Transaction.objects.filter(pk=item.pk).update(date=moment)
+    
+    def walk(self, queryset, ordering, per_page, **params):
+        """Rows of every page, following next cursors from the first page."""
+        rows = []
+        cursor = None
+        # A cursor that does not advance would loop forever
+        for _ in range(queryset.count() + 1):
+            query = {**params, **({'cursor': cursor} if cursor else {})}
+            page = keyset_page(RequestFactory().get('/', query), queryset, ordering, per_page)
+            self.assertLessEqual(len(page), per_page)
+            rows.extend(page)
+            if not page.has_next:
+                return rows
+            self.assertEqual(len(page), per_page)
+            self.assertIn('q=x', page.next_query)
+            cursor = page.next_cursor
+        self.fail('Pagination did not reach the last page.')
+    
+    def assertWalks(self, queryset, ordering):
+        expected = list(queryset.order_by(*ordering))
+        for per_page in (1, 2, 4, 5, len(expected), len(expected) + 1):
+            with self.subTest(ordering=ordering, per_page=per_page):
+                self.assertEqual(self.walk(queryset, ordering, per_page, q='x'), expected)
+    
+    def test_ties_on_the_sort_key(self):
+        products = Product.objects.filter(company=self.company)
+        self.assertWalks(products, ('name', 'id'))
+        self.assertWalks(products, ('-price', 'id'))
+        self.assertWalks(products, ('price', '-name', '-id'))
+        self.assertWalks(Transaction.objects.filter(company=self.company), ('-date', '-id'))
+    
+    def test_invalid_cursor_restarts(self):
+        products = Product.objects.filter(company=self.company)
+        first = list(keyset_page(RequestFactory().get('/'), products, ('name', 'id'), 3))
+        
+        cursors = [
+            'not a cursor', '!!!', encode_cursor(['product 1']), encode_cursor(['product 1', 'x']),
+            base64.urlsafe_b64encode(b'{"name": "product 1"}').decode(),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                page = keyset_page(RequestFactory().get('/', {'cursor': cursor}), products, ('name', 'id'), 3)
+                self.assertEqual(list(page), first)
+    
+    def test_last_page(self):
+        products = Product.objects.filter(company=self.company)
+        page = keyset_page(RequestFactory().get('/', {'q': 'x'}), products, ('name', 'id'), 13)
+        
+        self.assertEqual(len(page), 13)
+        self.assertFalse(page.has_next)
+        self.assertTrue(page.is_first)
+        self.assertEqual(page.first_query, 'q=x')
@@ -13,6 +13,7 @@ from django.shortcuts import redirect
 
 # Import inventory views for direct use
 from . import views as inventory_views
+from accounts import views as account_views
 
 
 def home_redirect(request):
@@ -44,6 +45,7 @@ inventory_patterns = [
     path('transactions/', inventory_views.transactions_view, name='transactions'),
     path('transactions/<int:transaction_id>/approve/', inventory_views.approve_transaction, name='approve_transaction'),
     path('transactions/<int:transaction_id>/reject/', inventory_views.reject_transaction, name='reject_transaction'),
+    path('transactions/bulk/', inventory_views.bulk_transactions, name='bulk_transactions'),
     
     # Representatives (viewed by accountant)
     path('representatives/', inventory_views.representatives_view, name='representatives'),
@@ -66,7 +68,10 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
     path('inventory/', include((inventory_patterns, 'inventory'), namespace='inventory')),
     path('pos/', include('pos.urls')),
-    # path('reports/', include('reports.urls')),  # TODO: Add reports
+    path('reports/', include('reports.urls')),
+    
+    # Prometheus scrape endpoint
+    path('metrics', account_views.metrics_view, name='metrics'),
     
 
 ]
@@ -3,16 +3,19 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Sum, Q, F
-from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
+from django.db.models import Sum, F
+from django.db.transaction import atomic
 from functools import wraps
 from decimal import Decimal
 
+from accounts import metrics
 from accounts.models import User
 from accounts.views import company_required
-from .models import Category, Product, Transaction, TransactionItem
+from .models import Category, Product, Transaction
 from .forms import CategoryForm, ProductForm, TransactionForm
+from .pagination import keyset_page
+from .search import filter_products
 
 
 # =============================================================================
@@ -47,11 +50,9 @@ def inventory_feature_required(view_func):
     """Check if company has inventory feature enabled."""
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if request.user.company:
-            subscription = getattr(request.user.company, 'subscription', None)
-            if subscription and not subscription.plan.has_inventory:
-                messages.error(request, 'خطة شركتك لا تتضمن ميزة المخزون.')
-                return redirect('accounts:company_dashboard')
+        if request.tenant.company_id and not request.tenant.has_inventory:
+            messages.error(request, 'خطة شركتك لا تتضمن ميزة المخزون.')
+            return redirect('accounts:company_dashboard')
         return view_func(request, *args, **kwargs)
     return wrapper
 
@@ -65,7 +66,7 @@ def inventory_feature_required(view_func):
 @inventory_feature_required
 def dashboard(request):
     """Accountant inventory dashboard."""
-    company = request.user.company
+    company = request.tenant.company
     
     # Stats
     context = {
@@ -102,7 +103,7 @@ def dashboard(request):
 @inventory_feature_required
 def categories_view(request):
     """List and manage categories."""
-    company = request.user.company
+    company = request.tenant.company
     categories = Category.objects.filter(company=company).order_by('name')
     
     return render(request, 'inventory/categories.html', {
@@ -119,7 +120,7 @@ def add_category(request):
         form = CategoryForm(request.POST)
         if form.is_valid():
             category = form.save(commit=False)
-            category.company = request.user.company
+            category.company = request.tenant.company
             category.save()
             messages.success(request, 'تم إضافة الفئة بنجاح!')
         else:
@@ -132,7 +133,7 @@ def add_category(request):
 def edit_category(request, category_id):
     """Edit a category."""
     category = get_object_or_404(
-        Category, id=category_id, company=request.user.company
+        Category, id=category_id, company=request.tenant.company
     )
     
     if request.method == 'POST':
@@ -150,7 +151,7 @@ def delete_category(request, category_id):
     """Delete a category."""
     if request.method == 'POST':
         category = get_object_or_404(
-            Category, id=category_id, company=request.user.company
+            Category, id=category_id, company=request.tenant.company
         )
         category.delete()
         messages.success(request, 'تم حذف الفئة بنجاح!')
@@ -166,27 +167,21 @@ def delete_category(request, category_id):
 @inventory_feature_required
 def products_view(request):
     """List and manage products."""
-    company = request.user.company
+    company = request.tenant.company
     products = Product.objects.filter(company=company).select_related('category')
     
     # Search
     search = request.GET.get('search', '')
     if search:
-        products = products.filter(
-            Q(name__icontains=search) | 
-            Q(sku__icontains=search) |
-            Q(barcode__icontains=search)
-        )
+        products = filter_products(products, search)
     
     # Filter by category
     category_id = request.GET.get('category')
     if category_id:
         products = products.filter(category_id=category_id)
     
-    # Pagination
-    paginator = Paginator(products.order_by('name'), 20)
-    page = request.GET.get('page')
-    products = paginator.get_page(page)
+    # Keyset pagination (no OFFSET/COUNT)
+    products = keyset_page(request, products, ('name', 'id'), 20)
     
     categories = Category.objects.filter(company=company)
     form = ProductForm(company=company)
@@ -203,11 +198,10 @@ def products_view(request):
 @company_required
 def add_product(request):
     """Add a new product."""
-    company = request.user.company
+    company = request.tenant.company
     
     # Check product limit
-    subscription = company.subscription
-    if company.products.count() >= subscription.plan.max_products:
+    if company.products.count() >= request.tenant.state.max_products:
         messages.error(request, 'لقد وصلت إلى الحد الأقصى للمنتجات في خطتك.')
         return redirect('inventory:products')
     
@@ -227,7 +221,7 @@ def add_product(request):
 @company_required
 def edit_product(request, product_id):
     """Edit a product."""
-    company = request.user.company
+    company = request.tenant.company
     product = get_object_or_404(Product, id=product_id, company=company)
     
     if request.method == 'POST':
@@ -245,7 +239,7 @@ def delete_product(request, product_id):
     """Delete a product."""
     if request.method == 'POST':
         product = get_object_or_404(
-            Product, id=product_id, company=request.user.company
+            Product, id=product_id, company=request.tenant.company
         )
         product.delete()
         messages.success(request, 'تم حذف المنتج بنجاح!')
@@ -261,7 +255,7 @@ def delete_product(request, product_id):
 @inventory_feature_required
 def transactions_view(request):
     """List and manage transactions."""
-    company = request.user.company
+    company = request.tenant.company
     transactions = Transaction.objects.filter(
         company=company
     ).select_related('user', 'approved_by').prefetch_related('items__product')
@@ -276,10 +270,8 @@ def transactions_view(request):
     if trans_type:
         transactions = transactions.filter(type=trans_type)
     
-    # Pagination
-    paginator = Paginator(transactions.order_by('-date'), 20)
-    page = request.GET.get('page')
-    transactions = paginator.get_page(page)
+    # Keyset pagination (no OFFSET/COUNT)
+    transactions = keyset_page(request, transactions, ('-date', '-id'), 20)
     
     return render(request, 'inventory/transactions.html', {
         'transactions': transactions,
@@ -294,7 +286,7 @@ def approve_transaction(request, transaction_id):
     """Approve a pending transaction."""
     if request.method == 'POST':
         transaction = get_object_or_404(
-            Transaction, id=transaction_id, company=request.user.company
+            Transaction, id=transaction_id, company=request.tenant.company
         )
         if transaction.approve(request.user):
             messages.success(request, 'تمت الموافقة على المعاملة بنجاح!')
@@ -309,7 +301,7 @@ def reject_transaction(request, transaction_id):
     """Reject a pending transaction."""
     if request.method == 'POST':
         transaction = get_object_or_404(
-            Transaction, id=transaction_id, company=request.user.company
+            Transaction, id=transaction_id, company=request.tenant.company
         )
         if transaction.reject(request.user):
             messages.success(request, 'تم رفض المعاملة.')
@@ -318,6 +310,31 @@ def reject_transaction(request, transaction_id):
     return redirect('inventory:transactions')
 
 
+@accountant_required
+@company_required
+def bulk_transactions(request):
+    """Approve or reject many pending transactions at once."""
+    if request.method == 'POST':
+        transactions = Transaction.objects.filter(
+            company=request.tenant.company,
+            id__in=[pk for pk in request.POST.getlist('transaction_ids') if pk.isdigit()]
+        )
+        action = request.POST.get('action')
+        
+        if action == 'approve':
+            count = transactions.approve_all(request.user)
+            messages.success(request, f'تمت الموافقة على {count} معاملة.')
+        elif action == 'reject':
+            count = transactions.reject_all(request.user)
+            messages.success(request, f'تم رفض {count} معاملة.')
+        else:
+            messages.error(request, 'إجراء غير صالح.')
+            return redirect('inventory:transactions')
+        
+        metrics.APPROVAL_BATCH_SIZE.observe(count, company=request.tenant.company_id, action=action)
+    return redirect('inventory:transactions')
+
+
 # =============================================================================
 # REPRESENTATIVES
 # =============================================================================
@@ -327,7 +344,7 @@ def reject_transaction(request, transaction_id):
 @inventory_feature_required
 def representatives_view(request):
     """List representatives and their product counts."""
-    company = request.user.company
+    company = request.tenant.company
     representatives = User.objects.filter(
         company=company, role=User.Role.REPRESENTATIVE
     )
@@ -341,7 +358,7 @@ def representatives_view(request):
 @company_required
 def representative_detail(request, rep_id):
     """View representative details and transactions."""
-    company = request.user.company
+    company = request.tenant.company
     rep = get_object_or_404(
         User, id=rep_id, company=company, role=User.Role.REPRESENTATIVE
     )
@@ -350,9 +367,12 @@ def representative_detail(request, rep_id):
         user=rep
     ).prefetch_related('items__product').order_by('-date')
     
+    custody = rep.custody.filter(quantity__gt=0).select_related('product').order_by('product__name')
+    
     return render(request, 'inventory/representative_detail.html', {
         'representative': rep,
-        'transactions': transactions
+        'transactions': transactions,
+        'custody': custody
     })
 
 
@@ -412,7 +432,7 @@ def rep_transactions(request):
 @company_required
 def rep_request(request):
     """Representative request a new transaction."""
-    company = request.user.company
+    company = request.tenant.company
     products = Product.objects.filter(company=company, is_active=True)
     
     if request.method == 'POST':
@@ -434,21 +454,22 @@ def rep_request(request):
             quantities = request.POST.getlist('quantity')
             
             if product_ids and quantities:
-                transaction = Transaction.objects.create(
-                    company=company,
-                    user=request.user,
-                    type=trans_type
-                )
+                lines = [
+                    (prod_id, int(qty))
+                    for prod_id, qty in zip(product_ids, quantities)
+                    if prod_id and qty and int(qty) > 0
+                ]
                 
-                for prod_id, qty in zip(product_ids, quantities):
-                    if prod_id and qty and int(qty) > 0:
-                        product = get_object_or_404(Product, id=prod_id, company=company)
-                        TransactionItem.objects.create(
-                            transaction=transaction,
-                            product=product,
-                            quantity=int(qty),
-                            price=product.price
-                        )
+                with atomic():
+                    transaction = Transaction.objects.create(
+                        company=company,
+                        user=request.user,
+                        type=trans_type
+                    )
+                    try:
+                        transaction.add_items(lines)
+                    except Product.DoesNotExist:
+                        raise Http404('المنتج غير موجود')
                 
                 messages.success(request, 'تم إرسال الطلب بنجاح!')
         
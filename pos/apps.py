@@ -5,3 +5,6 @@ class PosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pos'
     verbose_name = 'نقطة البيع'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
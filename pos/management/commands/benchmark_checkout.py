@@ -0,0 +1,278 @@
+"""Stress the checkout endpoint with concurrent simulated cashiers."""
+
+import json
+import math
+import random
+import threading
+import time
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F, Max, Sum
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from accounts.models import User
+from inventory.management.commands.check_query_plans import busiest_company
+from inventory.models import Product, StockMovement
+from pos.models import Sale
+
+
+# Error messages that mean the database refused the write and it may be retried
+LOCK_ERRORS = {
+    'deadlock': ('deadlock detected', 'deadlock found'),
+    'serialization': ('could not serialize',),
+    'locked': ('database is locked', 'database table is locked', 'lock wait timeout'),
+}
+
+# Checkout messages that mean a cart asked for more than the stock
+STOCK_ERRORS = ('غير متوفرة', 'تغير المخزون')
+
+# Longest wait before retrying a checkout, in seconds
+MAX_BACKOFF = 1.0
+
+# Lines per cart and units per line
+LINE_WEIGHTS = (35, 30, 20, 10, 5)
+QUANTITY_WEIGHTS = (75, 18, 7)
+
+
+def percentile(values, p):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def lock_error(message):
+    """Kind of lock error in a checkout error message, or None."""
+    message = message.lower()
+    for kind, needles in LOCK_ERRORS.items():
+        if any(needle in message for needle in needles):
+            return kind
+    return None
+
+
+class StockUpdateTimer:
+    """Execute wrapper timing the product stock UPDATEs, where tills wait on each other's row locks."""
+    
+    def __init__(self):
+        self.seconds = 0.0
+    
+    def __call__(self, execute, sql, params, many, context):
+        if not (sql.startswith('UPDATE') and Product._meta.db_table in sql):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+
+class Till(threading.Thread):
+    """One simulated cashier posting carts back to back through the WSGI handler."""
+    
+    def __init__(self, number, cashier, products, weights, options, start):
+        super().__init__(name=f'till-{number}')
+        self.cashier = cashier
+        self.products = products
+        self.weights = weights
+        self.options = options
+        self.start_event = start
+        self.rng = random.Random(f'{options["seed"]}:{number}')
+        
+        self.latencies = []
+        self.stock_waits = []
+        self.sold = {}
+        self.sales = 0
+        self.stock_rejections = 0
+        self.failures = {}
+        self.retries = {kind: 0 for kind in LOCK_ERRORS}
+    
+    def cart(self):
+        lines = self.rng.choices(range(1, 6), weights=LINE_WEIGHTS)[0]
+        picked = self.rng.choices(self.products, cum_weights=self.weights, k=lines)
+        cart = {}
+        for product in picked:
+            cart[product.pk] = cart.get(product.pk, 0) + self.rng.choices(range(1, 4), weights=QUANTITY_WEIGHTS)[0]
+        return cart
+    
+    def run(self):
+        client = Client()
+        client.force_login(self.cashier)
+        url = reverse('pos:checkout')
+        timer = StockUpdateTimer()
+        
+        self.start_event.wait()
+        try:
+            with connection.execute_wrapper(timer):
+                for _ in range(self.options['sales']):
+                    self.checkout(client, url, timer)
+        finally:
+            connection.close()
+    
+    def checkout(self, client, url, timer):
+        cart = self.cart()
+        data = {
+            'cart': json.dumps([{'id': pk, 'quantity': quantity} for pk, quantity in cart.items()]),
+            'payment_method': Sale.PaymentMethod.CASH,
+            'amount_paid': '1000000',
+        }
+        
+        for attempt in range(self.options['retries'] + 1):
+            timer.seconds = 0.0
+            started = time.perf_counter()
+            try:
+                result = json.loads(client.post(url, data).content)
+            except Exception as error:
+                result = {'success': False, 'error': f'{error.__class__.__name__}: {error}'}
+            elapsed = time.perf_counter() - started
+            
+            if result.get('success'):
+                self.sales += 1
+                self.latencies.append(elapsed)
+                self.stock_waits.append(timer.seconds)
+                for pk, quantity in cart.items():
+                    self.sold[pk] = self.sold.get(pk, 0) + quantity
+                return
+            
+            error = result.get('error', '')
+            if any(needle in error for needle in STOCK_ERRORS):
+                self.stock_rejections += 1
+                return
+            
+            kind = lock_error(error)
+            if kind is None or attempt == self.options['retries']:
+                break
+            self.retries[kind] += 1
+            # Exponential backoff with jitter so retrying tills do not collide again
+            time.sleep(self.rng.uniform(0, min(MAX_BACKOFF, 0.01 * 2 ** attempt)))
+        
+        self.failures[error] = self.failures.get(error, 0) + 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent simulated cashiers against the checkout view (in-process, '
+        'through the WSGI handler) selling a small set of hot products, and report '
+        'throughput, latency percentiles, time spent in stock UPDATEs (row lock '
+        'waits), lock errors and retries, then check stock against the ledger. '
+        'Fails if stock is inconsistent or any checkout still fails after its '
+        'retries for a reason other than stock. '
+        'Completed sales are real: run it on a seeded, disposable database.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Company id to sell for (default: the one with most products).')
+        parser.add_argument('--cashiers', type=int, default=8, help='Concurrent tills.')
+        parser.add_argument('--sales', type=int, default=50, help='Carts posted by each till.')
+        parser.add_argument('--hot', type=int, default=20, help='Number of hot products carts are drawn from.')
+        parser.add_argument('--retries', type=int, default=10, help='Retries of a checkout that hit a lock error.')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for carts.')
+    
+    def handle(self, *args, **options):
+        company_id = options['company'] or busiest_company()
+        if company_id is None:
+            raise CommandError('No products found; seed the database first.')
+        
+        cashiers = list(User.objects.filter(company_id=company_id, role=User.Role.CASHIER).order_by('pk'))
+        if not cashiers:
+            raise CommandError(f'Company #{company_id} has no cashiers.')
+        
+        # The best sellers, or simply the first products on a fresh database
+        products = list(
+            Product.objects.filter(company_id=company_id, is_active=True, stock__gt=0).annotate(
+                sold=Sum('sale_items__quantity')
+            ).order_by(F('sold').desc(nulls_last=True), 'pk')[:options['hot']]
+        )
+        if not products:
+            raise CommandError(f'Company #{company_id} has no products in stock.')
+        # Zipf weights: the hottest product is in most carts
+        weights = list(accumulate(1 / rank for rank in range(1, len(products) + 1)))
+        
+        stock_before = dict(Product.objects.filter(pk__in=[p.pk for p in products]).values_list('pk', 'stock'))
+        last_movement = StockMovement.objects.aggregate(last=Max('pk'))['last'] or 0
+        
+        start = threading.Event()
+        tills = [
+            Till(number, cashiers[number % len(cashiers)], products, weights, options, start)
+            for number in range(options['cashiers'])
+        ]
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for till in tills:
+                till.start()
+            started = time.perf_counter()
+            start.set()
+            for till in tills:
+                till.join()
+            elapsed = time.perf_counter() - started
+        
+        self.report(tills, elapsed, options)
+        self.check_stock(tills, stock_before, last_movement)
+        
+        failed = sum(sum(till.failures.values()) for till in tills)
+        if failed:
+            raise CommandError(
+                f'{failed} checkouts failed after {options["retries"]} retries '
+                f'for reasons other than stock.'
+            )
+    
+    def report(self, tills, elapsed, options):
+        latencies = [value * 1000 for till in tills for value in till.latencies]
+        waits = [value * 1000 for till in tills for value in till.stock_waits]
+        sales = sum(till.sales for till in tills)
+        retries = {kind: sum(till.retries[kind] for till in tills) for kind in LOCK_ERRORS}
+        failures = {}
+        for till in tills:
+            for error, count in till.failures.items():
+                failures[error] = failures.get(error, 0) + count
+        
+        write = self.stdout.write
+        write(f'{options["cashiers"]} tills x {options["sales"]} carts in {elapsed:.2f}s ({connection.vendor})')
+        write(f'Completed sales: {sales} ({sales / elapsed:.1f}/s)')
+        write(f'Rejected for stock: {sum(till.stock_rejections for till in tills)}')
+        write(f'Failed: {sum(failures.values())}')
+        for error, count in sorted(failures.items(), key=lambda item: -item[1]):
+            write(f'  {count} x {error[:120]}')
+        write(f'Retries: {sum(retries.values())} (' + ', '.join(f'{kind}: {count}' for kind, count in retries.items()) + ')')
+        write(
+            f'{"ms":<24} {"p50":>8} {"p95":>8} {"p99":>8} {"max":>8}'
+        )
+        for label, values in (('checkout latency', latencies), ('stock UPDATE (lock wait)', waits)):
+            write(
+                f'{label:<24} ' + ' '.join(f'{percentile(values, p):>8.1f}' for p in (50, 95, 99, 100))
+            )
+    
+    def check_stock(self, tills, stock_before, last_movement):
+        """Stock after the run must equal stock before minus what was sold, and match the ledger."""
+        sold = {}
+        for till in tills:
+            for pk, quantity in till.sold.items():
+                sold[pk] = sold.get(pk, 0) + quantity
+        
+        stock_after = dict(Product.objects.filter(pk__in=list(stock_before)).values_list('pk', 'stock'))
+        ledger = dict(
+            StockMovement.objects.filter(
+                pk__gt=last_movement, product_id__in=list(stock_before)
+            ).values('product_id').annotate(delta=Sum('delta')).values_list('product_id', 'delta')
+        )
+        
+        problems = []
+        for pk, before in stock_before.items():
+            expected = before - sold.get(pk, 0)
+            if stock_after[pk] != expected:
+                problems.append(f'#{pk}: stock {stock_after[pk]}, expected {expected} from completed sales')
+            if before + ledger.get(pk, 0) != stock_after[pk]:
+                problems.append(f'#{pk}: stock {stock_after[pk]}, ledger says {before + ledger.get(pk, 0)}')
+            if stock_after[pk] < 0:
+                problems.append(f'#{pk}: negative stock {stock_after[pk]}')
+        
+        if problems:
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(problem))
+            raise CommandError(f'Stock is inconsistent for {len(problems)} checks.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Stock of {len(stock_before)} hot products matches completed sales and the ledger.'
+        ))
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.11 on 2026-10-17 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['cashier', '-created_at', '-id'], name='sale_cashier_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['company', 'created_at'], name='sale_company_created_idx'),
+        ),
+    ]
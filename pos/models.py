@@ -7,10 +7,16 @@ This module contains models for:
 """
 
 from django.db import models
-from django.db.models import Sum
+from django.db.models import F, Sum
+from django.db.models.functions import Now
+from django.db.transaction import atomic
 from decimal import Decimal
 import uuid
 
+from accounts.tracing import traced
+from inventory.models import StockMovement
+from .signals import sale_refunded
+
 
 def generate_receipt_number():
     """Generate a unique receipt number."""
@@ -109,17 +115,32 @@ class Sale(models.Model):
         verbose_name = 'عملية بيع'
         verbose_name_plural = 'عمليات البيع'
         ordering = ['-created_at']
+        indexes = [
+            # Sales history (created_at, id keyset) and daily summary
+            models.Index(fields=['cashier', '-created_at', '-id'], name='sale_cashier_created_idx'),
+            # Reports and analytics date ranges
+            models.Index(fields=['company', 'created_at'], name='sale_company_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.receipt_number} - {self.total}"
     
+    @traced()
     def calculate_totals(self):
         """Calculate subtotal, tax, and total from items."""
         # Calculate subtotal from items
-        self.subtotal = self.items.aggregate(
+        subtotal = self.items.aggregate(
             total=Sum('total')
         )['total'] or Decimal('0')
         
+        self.set_totals(subtotal)
+        self.save()
+    
+    @traced()
+    def set_totals(self, subtotal):
+        """Derive discount, tax, total and change from a known subtotal."""
+        self.subtotal = subtotal
+        
         # Apply discount
         if self.discount_percentage > 0:
             self.discount = self.subtotal * (self.discount_percentage / 100)
@@ -135,29 +156,55 @@ class Sale(models.Model):
         
         # Calculate change
         self.change = max(Decimal('0'), self.amount_paid - self.total)
-        
-        self.save()
     
+    @traced()
+    def items_cost(self):
+        """Total cost of the sold items."""
+        return self.items.aggregate(
+            cost=Sum(F('cost') * F('quantity'))
+        )['cost'] or Decimal('0')
+    
+    def item_quantities(self):
+        """Return {product_id: quantity} for this sale's items."""
+        quantities = {}
+        for product_id, quantity in self.items.values_list('product_id', 'quantity'):
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        return quantities
+    
+    @traced()
     def apply_stock_changes(self):
         """Reduce product stock after sale."""
-        for item in self.items.all():
-            item.product.stock -= item.quantity
-            item.product.save()
+        StockMovement.objects.record(
+            {pk: -qty for pk, qty in self.item_quantities().items()},
+            StockMovement.Reason.SALE, sale=self
+        )
     
+    @traced()
     def reverse_stock_changes(self):
         """Restore product stock (for refunds/cancellations)."""
-        for item in self.items.all():
-            item.product.stock += item.quantity
-            item.product.save()
+        StockMovement.objects.record(
+            self.item_quantities(),
+            StockMovement.Reason.REFUND, sale=self
+        )
     
+    @traced()
     def refund(self):
         """Process refund for this sale."""
-        if self.status == self.Status.COMPLETED:
+        if self.status != self.Status.COMPLETED:
+            return False
+        
+        with atomic():
+            # Claim the row so a sale cannot be refunded twice
+            claimed = Sale.objects.filter(
+                pk=self.pk, status=self.Status.COMPLETED
+            ).update(status=self.Status.REFUNDED, updated_at=Now())
+            if not claimed:
+                return False
+            
             self.status = self.Status.REFUNDED
             self.reverse_stock_changes()
-            self.save()
-            return True
-        return False
+            sale_refunded.send(sender=Sale, sale=self, cost=self.items_cost())
+        return True
 
 
 # =============================================================================
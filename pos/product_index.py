@@ -0,0 +1,196 @@
+"""
+In-memory barcode/SKU index for scanner lookups.
+
+Each worker process keeps a hash index of barcode and SKU to a small
+product summary per company. An index is built lazily on the first scan
+for that company and then answers lookups without touching the database.
+
+Invalidation:
+- Product post_save/post_delete bumps the company's generation
+  (see pos.signals), dropping the index in this process and, when a
+  shared cache is configured, in every other worker on its next lookup.
+- Committed ledger stock changes (inventory.signals.stock_changed) are
+  applied to the summaries in place, so stock stays current in this
+  process. Other processes pick up new stock when their index expires
+  after PRODUCT_INDEX_TIMEOUT. Checkout always re-validates stock.
+
+The same index answers search-box autocompletion from a sorted list of
+normalised name keys (one per word start, searched with bisect), and
+keeps an LRU of recent completions that is dropped with the index.
+
+Set PRODUCT_INDEX_CACHE_ALIAS to a shared cache (e.g. Redis) to share
+built indexes and generations between workers.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from accounts.metrics import record_cache
+from inventory.models import Product
+from inventory.search import normalize
+
+
+# company_id -> ProductIndex
+_indexes = {}
+
+# Completions returned per query
+AUTOCOMPLETE_LIMIT = 10
+
+# Completed queries remembered per company
+RECENT_QUERIES = 256
+
+
+class ProductIndex:
+    """Barcode, SKU and name-prefix lookups for the active products of one company."""
+
+    __slots__ = (
+        'by_barcode', 'by_sku', 'by_id', 'name_keys', 'recent', 'lock',
+        'generation', 'expires_at',
+    )
+
+    def __init__(self, rows, generation):
+        self.by_barcode = {}
+        self.by_sku = {}
+        self.by_id = {}
+        self.name_keys = []
+        for pk, name, price, stock, barcode, sku in rows:
+            summary = {'id': pk, 'name': name, 'price': price, 'stock': stock}
+            self.by_id[pk] = summary
+            if barcode:
+                self.by_barcode[barcode] = summary
+            if sku:
+                self.by_sku.setdefault(sku, summary)
+            # Index every word start, so "شاي" completes "احمد شاي"
+            words = normalize(name).split(' ')
+            for i in range(len(words)):
+                self.name_keys.append((' '.join(words[i:]), pk))
+        self.name_keys.sort()
+        self.recent = OrderedDict()
+        self.lock = threading.Lock()
+        self.generation = generation
+        self.expires_at = time.monotonic() + get_timeout()
+
+    def lookup(self, code):
+        return self.by_barcode.get(code) or self.by_sku.get(code)
+
+    def complete(self, prefix):
+        """Return up to AUTOCOMPLETE_LIMIT (id, name, price) tuples whose name starts with prefix."""
+        with self.lock:
+            results = self.recent.get(prefix)
+            if results is not None:
+                self.recent.move_to_end(prefix)
+        record_cache('autocomplete', results is not None)
+        if results is not None:
+            return results
+
+        results = []
+        seen = set()
+        keys = self.name_keys
+        i = bisect_left(keys, (prefix,))
+        while i < len(keys) and len(results) < AUTOCOMPLETE_LIMIT:
+            key, pk = keys[i]
+            if not key.startswith(prefix):
+                break
+            if pk not in seen:
+                seen.add(pk)
+                summary = self.by_id[pk]
+                results.append((pk, summary['name'], summary['price']))
+            i += 1
+
+        with self.lock:
+            self.recent[prefix] = results
+            if len(self.recent) > RECENT_QUERIES:
+                self.recent.popitem(last=False)
+        return results
+
+
+def get_timeout():
+    return getattr(settings, 'PRODUCT_INDEX_TIMEOUT', 300)
+
+
+def get_shared_cache():
+    alias = getattr(settings, 'PRODUCT_INDEX_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def generation_key(company_id):
+    return f'product-index:generation:{company_id}'
+
+
+def rows_key(company_id, generation):
+    return f'product-index:rows:{company_id}:{generation}'
+
+
+def load_rows(company_id):
+    return [
+        (pk, name, str(price), stock, barcode, sku)
+        for pk, name, price, stock, barcode, sku in Product.objects.filter(
+            company_id=company_id, is_active=True
+        ).values_list('id', 'name', 'price', 'stock', 'barcode', 'sku').iterator()
+    ]
+
+
+def get_index(company_id):
+    """Return the company's index, building it on first access or after invalidation."""
+    shared = get_shared_cache()
+    generation = shared.get(generation_key(company_id), 0) if shared else 0
+
+    index = _indexes.get(company_id)
+    if index and index.generation == generation and index.expires_at > time.monotonic():
+        record_cache('product_index', True)
+        return index
+    record_cache('product_index', False)
+
+    rows = shared.get(rows_key(company_id, generation)) if shared else None
+    if rows is None:
+        rows = load_rows(company_id)
+        if shared:
+            shared.set(rows_key(company_id, generation), rows, get_timeout())
+
+    index = _indexes[company_id] = ProductIndex(rows, generation)
+    return index
+
+
+def lookup(company_id, code):
+    """Return the product summary for a barcode or SKU, or None."""
+    if not code:
+        return None
+    return get_index(company_id).lookup(code)
+
+
+def complete(company_id, query):
+    """Return name completions for a search-box query, or an empty list."""
+    prefix = normalize(query)
+    if not prefix:
+        return []
+    return get_index(company_id).complete(prefix)
+
+
+def invalidate(company_id):
+    """Drop the company's index here and, via the generation, in other workers."""
+    _indexes.pop(company_id, None)
+
+    shared = get_shared_cache()
+    if shared:
+        key = generation_key(company_id)
+        if not shared.add(key, 1, None):
+            try:
+                shared.incr(key)
+            except ValueError:
+                shared.set(key, 1, None)
+
+
+def apply_stock_deltas(deltas):
+    """Adjust stock in locally built summaries after a committed ledger change."""
+    for index in list(_indexes.values()):
+        # Concurrent commits in other threads update the same summaries
+        with index.lock:
+            for product_id, delta in deltas.items():
+                summary = index.by_id.get(product_id)
+                if summary is not None:
+                    summary['stock'] += delta
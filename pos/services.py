@@ -0,0 +1,95 @@
+"""
+Checkout service for the POS app.
+
+Turns a cart into a completed sale with a fixed number of queries,
+no matter how many lines the basket holds:
+- one SELECT for all cart products
+- one INSERT for the sale
+- one bulk INSERT for the sale items
+- one conditional UPDATE per batch of products for stock
+- one bulk INSERT for the stock ledger
+- the sale_completed receivers (daily sales rollup)
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+
+from accounts import metrics
+from accounts.tracing import traced
+from inventory.models import InsufficientStock, Product, StockMovement
+from .models import Sale, SaleItem
+from .signals import sale_completed
+
+
+class CheckoutError(Exception):
+    """Raised when a cart cannot be turned into a sale."""
+
+
+def parse_cart(cart_data):
+    """Merge cart lines into a {product_id: quantity} mapping."""
+    quantities = {}
+    for line in cart_data:
+        try:
+            product_id = int(line['id'])
+            quantity = int(line['quantity'])
+        except (KeyError, TypeError, ValueError):
+            raise CheckoutError('بيانات السلة غير صالحة')
+
+        if quantity <= 0:
+            raise CheckoutError('بيانات السلة غير صالحة')
+
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+@traced()
+def checkout(company, cashier, cart_data, **sale_fields):
+    """Create a completed sale from cart lines and deduct its stock atomically."""
+    quantities = parse_cart(cart_data)
+    if not quantities:
+        raise CheckoutError('السلة فارغة')
+
+    with transaction.atomic():
+        products = Product.objects.filter(company=company).in_bulk(list(quantities))
+        if len(products) != len(quantities):
+            raise CheckoutError('بعض المنتجات غير موجودة')
+
+        # Validate stock in memory before writing anything
+        for product_id, quantity in quantities.items():
+            product = products[product_id]
+            if product.stock < quantity:
+                raise CheckoutError(f'الكمية المطلوبة من {product.name} غير متوفرة')
+
+        sale = Sale(company=company, cashier=cashier, **sale_fields)
+        items = [
+            SaleItem(
+                sale=sale,
+                product=products[product_id],
+                quantity=quantity,
+                price=products[product_id].price,
+                cost=products[product_id].cost,
+                total=products[product_id].price * quantity,
+            )
+            for product_id, quantity in quantities.items()
+        ]
+
+        sale.set_totals(sum((item.total for item in items), Decimal('0')))
+        sale.save()
+        SaleItem.objects.bulk_create(items)
+
+        try:
+            StockMovement.objects.record(
+                {pk: -qty for pk, qty in quantities.items()},
+                StockMovement.Reason.SALE, sale=sale, require_stock=True
+            )
+        except InsufficientStock:
+            raise CheckoutError('تغير المخزون أثناء المعالجة، يرجى المحاولة مرة أخرى')
+
+        sale_completed.send(
+            sender=Sale, sale=sale,
+            cost=sum((item.cost * item.quantity for item in items), Decimal('0'))
+        )
+
+    metrics.SALE_ITEMS.observe(len(items), company=company.pk)
+    return sale
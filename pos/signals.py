@@ -0,0 +1,29 @@
+"""Signals and signal handlers for POS app."""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from inventory.models import Product
+from inventory.signals import stock_changed
+from . import product_index
+
+
+# Sent inside the checkout/refund transaction with sale=<Sale> and
+# cost=<Decimal, sum of item cost x quantity>, so receivers that keep
+# aggregates commit or roll back together with the sale.
+sale_completed = Signal()
+sale_refunded = Signal()
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, instance, **kwargs):
+    # After commit, so a concurrent lookup cannot rebuild the index from
+    # the old rows, and a rolled back change invalidates nothing
+    company_id = instance.company_id
+    transaction.on_commit(lambda: product_index.invalidate(company_id))
+
+
+@receiver(stock_changed)
+def product_stock_changed(sender, deltas, **kwargs):
+    product_index.apply_stock_deltas(deltas)
@@ -0,0 +1,401 @@
+"""Tests for the POS app."""
+
+import threading
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db import transaction
+from django.db.models import Sum
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Company, CompanySubscription, SubscriptionPlan, User
+from inventory.models import Product, StockMovement
+from . import product_index
+from .models import Sale, SaleItem
+from .services import CheckoutError, checkout
+from .product_index import AUTOCOMPLETE_LIMIT
+from .views import CATALOG_OVERLAP, DAILY_SUMMARY_FIELDS, catalog_version
+
+
+class CheckoutTests(TestCase):
+    """checkout() turns a cart into a sale, its items and stock movements, or into nothing."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        cls.other = Company.objects.create(name='other', email='other@example.com', phone='2')
+        cls.cashier = User.objects.create_user(
+            username='cashier', password='password', company=cls.company, role=User.Role.CASHIER
+        )
+        cls.tea = Product.objects.create(
+            company=cls.company, name='tea', price=Decimal('10'), cost=Decimal('6'), stock=5
+        )
+        cls.sugar = Product.objects.create(
+            company=cls.company, name='sugar', price=Decimal('4'), cost=Decimal('3'), stock=20
+        )
+    
+    def checkout(self, cart):
+        return checkout(
+            self.company, self.cashier, cart,
+            payment_method=Sale.PaymentMethod.CASH, amount_paid=Decimal('100')
+        )
+    
+    def stock(self, product):
+        return Product.objects.get(pk=product.pk).stock
+    
+    def ledger_total(self, product):
+        return StockMovement.objects.filter(product=product).aggregate(total=Sum('delta'))['total']
+    
+    def assertNothingWritten(self):
+        self.assertFalse(Sale.objects.exists())
+        self.assertFalse(SaleItem.objects.exists())
+        self.assertFalse(StockMovement.objects.filter(reason=StockMovement.Reason.SALE).exists())
+        self.assertEqual(self.stock(self.tea), 5)
+        self.assertEqual(self.stock(self.sugar), 20)
+    
+    def test_sale(self):
+        # Repeated lines for a product are merged
+        sale = self.checkout([
+            {'id': self.tea.pk, 'quantity': 2},
+            {'id': self.sugar.pk, 'quantity': 3},
+            {'id': self.tea.pk, 'quantity': 1},
+        ])
+        
+        self.assertEqual(sale.status, Sale.Status.COMPLETED)
+        self.assertEqual(sale.subtotal, Decimal('42'))
+        self.assertEqual(
+            dict(sale.items.values_list('product_id', 'quantity')),
+            {self.tea.pk: 3, self.sugar.pk: 3}
+        )
+        tea = sale.items.get(product=self.tea)
+        self.assertEqual((tea.price, tea.cost, tea.total), (Decimal('10'), Decimal('6'), Decimal('30')))
+        
+        self.assertEqual(self.stock(self.tea), 2)
+        self.assertEqual(self.stock(self.sugar), 17)
+        self.assertEqual(
+            dict(sale.stock_movements.values_list('product_id', 'delta')),
+            {self.tea.pk: -3, self.sugar.pk: -3}
+        )
+    
+    def test_refund_restores_stock_and_ledger(self):
+        sale = self.checkout([{'id': self.tea.pk, 'quantity': 4}, {'id': self.sugar.pk, 'quantity': 1}])
+        
+        self.assertTrue(sale.refund())
+        self.assertFalse(sale.refund())
+        
+        self.assertEqual(self.stock(self.tea), 5)
+        self.assertEqual(self.stock(self.sugar), 20)
+        for product in (self.tea, self.sugar):
+            self.assertEqual(self.ledger_total(product), self.stock(product))
+        self.assertEqual(
+            dict(sale.stock_movements.filter(reason=StockMovement.Reason.REFUND).values_list('product_id', 'delta')),
+            {self.tea.pk: 4, self.sugar.pk: 1}
+        )
+    
+    def test_insufficient_stock_rolls_back(self):
+        with self.assertRaises(CheckoutError):
+            self.checkout([{'id': self.sugar.pk, 'quantity': 2}, {'id': self.tea.pk, 'quantity': 6}])
+        self.assertNothingWritten()
+    
+    def test_stock_taken_concurrently_rolls_back(self):
+        """Stock sold by another till after the cart was validated fails the conditional UPDATE."""
+        bulk_create = SaleItem.objects.bulk_create
+        
+        def sell_elsewhere(items):
+            Product.objects.filter(pk=self.tea.pk).update(stock=1)
+            return bulk_create(items)
+        
+        with mock.patch.object(SaleItem.objects, 'bulk_create', side_effect=sell_elsewhere):
+            with self.assertRaises(CheckoutError):
+                self.checkout([{'id': self.sugar.pk, 'quantity': 2}, {'id': self.tea.pk, 'quantity': 3}])
+        
+        self.assertFalse(Sale.objects.exists())
+        self.assertFalse(StockMovement.objects.filter(reason=StockMovement.Reason.SALE).exists())
+        self.assertEqual(self.stock(self.sugar), 20)
+    
+    def test_invalid_carts(self):
+        foreign = Product.objects.create(company=self.other, name='foreign', price=Decimal('1'), stock=9)
+        carts = [
+            [],
+            [{'id': self.tea.pk}],
+            [{'id': 'tea', 'quantity': 1}],
+            [{'id': self.tea.pk, 'quantity': 0}],
+            [{'id': self.tea.pk, 'quantity': -1}],
+            [{'id': self.tea.pk, 'quantity': 1}, {'id': 999999, 'quantity': 1}],
+            [{'id': foreign.pk, 'quantity': 1}],
+        ]
+        for cart in carts:
+            with self.subTest(cart=cart), self.assertRaises(CheckoutError):
+                self.checkout(cart)
+        self.assertNothingWritten()
+        self.assertEqual(self.stock(foreign), 9)
+
+
+class ProductIndexInvalidationTests(TestCase):
+    """Product changes drop the barcode index only once they are committed."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        cls.product = Product.objects.create(
+            company=cls.company, name='product', price=Decimal('10'), barcode='111'
+        )
+    
+    def setUp(self):
+        product_index.invalidate(self.company.pk)
+        self.index = product_index.get_index(self.company.pk)
+    
+    def test_save_invalidates_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.barcode = '222'
+            self.product.save()
+            # Not dropped before commit
+            self.assertIs(product_index._indexes.get(self.company.pk), self.index)
+        
+        self.assertIsNone(product_index.lookup(self.company.pk, '111'))
+        self.assertEqual(product_index.lookup(self.company.pk, '222')['id'], self.product.pk)
+    
+    def test_rolled_back_save_keeps_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.product.barcode = '333'
+                    self.product.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        
+        self.assertIs(product_index._indexes.get(self.company.pk), self.index)
+    
+    def test_delete_invalidates_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+            self.assertIs(product_index._indexes.get(self.company.pk), self.index)
+        
+        self.assertIsNone(product_index.lookup(self.company.pk, '111'))
+
+
+class ProductIndexStockTests(TestCase):
+    """Committed stock deltas reach the index summaries, from any number of threads."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        cls.product = Product.objects.create(
+            company=cls.company, name='product', price=Decimal('10'), barcode='111', stock=50
+        )
+    
+    def setUp(self):
+        product_index.invalidate(self.company.pk)
+        self.addCleanup(product_index.invalidate, self.company.pk)
+    
+    def test_committed_movement_updates_stock(self):
+        product_index.get_index(self.company.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            StockMovement.objects.record({self.product.pk: -7}, StockMovement.Reason.SALE)
+        
+        self.assertEqual(product_index.lookup(self.company.pk, '111')['stock'], 43)
+    
+    def test_concurrent_deltas_are_not_lost(self):
+        product_index.get_index(self.company.pk)
+        threads = [
+            threading.Thread(target=lambda: [
+                product_index.apply_stock_deltas({self.product.pk: 1}) for _ in range(2000)
+            ])
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(product_index.lookup(self.company.pk, '111')['stock'], 50 + 8 * 2000)
+
+class ProductCatalogTests(TestCase):
+    """Catalog deltas catch products committed after later-stamped ones."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        plan = SubscriptionPlan.objects.create(name='plan', max_products=100, max_users=10)
+        cls.company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        CompanySubscription.objects.create(
+            company=cls.company, plan=plan, status=CompanySubscription.Status.ACTIVE,
+            start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=30)
+        )
+        cls.cashier = User.objects.create_user(
+            username='cashier', password='password', company=cls.company, role=User.Role.CASHIER
+        )
+        cls.first = Product.objects.create(company=cls.company, name='first', price=Decimal('10'))
+        cls.late = Product.objects.create(company=cls.company, name='late', price=Decimal('10'))
+    
+    def get_catalog(self, **params):
+        self.client.force_login(self.cashier)
+        return self.client.get(reverse('pos:catalog'), params).json()
+    
+    def test_delta_overlaps_since(self):
+        seen_at = timezone.now() - CATALOG_OVERLAP * 2
+        Product.objects.filter(pk=self.first.pk).update(updated_at=seen_at)
+        # Stamped before the version the till holds, committed after it
+        Product.objects.filter(pk=self.late.pk).update(updated_at=seen_at - timedelta(seconds=5))
+        
+        data = self.get_catalog(since=catalog_version(seen_at, 2))
+        self.assertFalse(data['full'])
+        self.assertIn(self.late.pk, [product['id'] for product in data['products']])
+    
+    def test_recent_version_is_provisional(self):
+        self.assertTrue(self.get_catalog()['version'].endswith('-p'))
+        
+        Product.objects.filter(company=self.company).update(updated_at=timezone.now() - CATALOG_OVERLAP * 2)
+        self.assertFalse(self.get_catalog()['version'].endswith('-p'))
+
+
+class AutocompleteTests(TestCase):
+    """Search-box completions match normalised word starts, up to AUTOCOMPLETE_LIMIT."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        plan = SubscriptionPlan.objects.create(name='plan', max_products=100, max_users=10)
+        cls.company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        CompanySubscription.objects.create(
+            company=cls.company, plan=plan, status=CompanySubscription.Status.ACTIVE,
+            start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=30)
+        )
+        cls.cashier = User.objects.create_user(
+            username='cashier', password='password', company=cls.company, role=User.Role.CASHIER
+        )
+        cls.green = Product.objects.create(company=cls.company, name='شاي أخضر', price=Decimal('5'))
+        cls.black = Product.objects.create(company=cls.company, name='شاي أحمر', price=Decimal('4'))
+        cls.mint = Product.objects.create(company=cls.company, name='نعناع مع شاي', price=Decimal('6'))
+        cls.coffee = Product.objects.create(company=cls.company, name='قهوة عربية', price=Decimal('9'))
+        Product.objects.create(company=cls.company, name='شاي قديم', price=Decimal('1'), is_active=False)
+    
+    def setUp(self):
+        product_index.invalidate(self.company.pk)
+        self.client.force_login(self.cashier)
+    
+    def complete(self, query):
+        response = self.client.get(reverse('pos:autocomplete'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [row[0] for row in response.json()['results']]
+    
+    def test_word_start_prefixes(self):
+        # In key order: the word start "شاي" of the mint tea sorts first
+        self.assertEqual(self.complete('شا'), [self.mint.pk, self.black.pk, self.green.pk])
+        self.assertEqual(self.complete('شاي ا'), [self.black.pk, self.green.pk])
+        self.assertEqual(self.complete('عرب'), [self.coffee.pk])
+        # Inside a word is not a prefix
+        self.assertEqual(self.complete('اي'), [])
+    
+    def test_query_is_normalised(self):
+        self.assertEqual(self.complete('شاي أخ'), [self.green.pk])
+        self.assertEqual(self.complete('قهوه'), [self.coffee.pk])
+        self.assertEqual(self.complete('  '), [])
+    
+    def test_rows(self):
+        response = self.client.get(reverse('pos:autocomplete'), {'q': 'قهو'})
+        self.assertEqual(response.json()['results'], [[self.coffee.pk, 'قهوة عربية', '9.00']])
+    
+    def test_limit(self):
+        Product.objects.bulk_create([
+            Product(company=self.company, name=f'شاي {i:02d}', price=Decimal('1'))
+            for i in range(AUTOCOMPLETE_LIMIT + 5)
+        ])
+        product_index.invalidate(self.company.pk)
+        
+        results = self.complete('شاي')
+        self.assertEqual(len(results), AUTOCOMPLETE_LIMIT)
+        self.assertEqual(len(set(results)), AUTOCOMPLETE_LIMIT)
+
+
+class DailySummaryTests(TestCase):
+    """The grouped daily summary query agrees with summing the cashier's sales one by one."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        plan = SubscriptionPlan.objects.create(name='plan', max_products=100, max_users=10)
+        cls.company = Company.objects.create(
+            name='company', email='company@example.com', phone='1', tax_rate=Decimal('15')
+        )
+        CompanySubscription.objects.create(
+            company=cls.company, plan=plan, status=CompanySubscription.Status.ACTIVE,
+            start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=30)
+        )
+        cls.cashier, other = (
+            User.objects.create_user(
+                username=name, password='password', company=cls.company, role=User.Role.CASHIER
+            )
+            for name in ('cashier', 'other')
+        )
+        product = Product.objects.create(
+            company=cls.company, name='product', price=Decimal('12.50'), cost=Decimal('7'), stock=1000
+        )
+        
+        today = timezone.localdate()
+        tz = timezone.get_current_timezone()
+        methods = [Sale.PaymentMethod.CASH, Sale.PaymentMethod.CARD, Sale.PaymentMethod.TRANSFER]
+        for i in range(12):
+            sale = checkout(
+                cls.company, cls.cashier, [{'id': product.pk, 'quantity': i % 4 + 1}],
+                payment_method=methods[i % 3], amount_paid=Decimal('100'),
+                discount_percentage=Decimal(5 * (i % 2))
+            )
+            # Spread over three hours of today
+            midnight = datetime.combine(today, time.min, tzinfo=tz)
+            Sale.objects.filter(pk=sale.pk).update(created_at=midnight + timedelta(hours=9 + i % 3, minutes=i))
+            if i % 5 == 0:
+                sale.refund()
+        
+        # Not counted: yesterday's sale and another cashier's sale
+        yesterday = checkout(
+            cls.company, cls.cashier, [{'id': product.pk, 'quantity': 1}],
+            payment_method=Sale.PaymentMethod.CASH, amount_paid=Decimal('100')
+        )
+        Sale.objects.filter(pk=yesterday.pk).update(created_at=timezone.now() - timedelta(days=1, hours=1))
+        checkout(
+            cls.company, other, [{'id': product.pk, 'quantity': 1}],
+            payment_method=Sale.PaymentMethod.CASH, amount_paid=Decimal('100')
+        )
+    
+    def naive_totals(self, sales):
+        totals = dict.fromkeys(DAILY_SUMMARY_FIELDS, 0)
+        for sale in sales:
+            if sale.status == Sale.Status.REFUNDED:
+                totals['refunds_count'] += 1
+                totals['refunds_amount'] += sale.total
+                continue
+            totals['sales_count'] += 1
+            totals['total_amount'] += sale.total
+            totals[f'{sale.payment_method}_amount'] += sale.total
+            totals['discount_total'] += sale.discount
+            totals['tax_total'] += sale.tax_amount
+        return totals
+    
+    def test_totals_match_naive_sum(self):
+        self.client.force_login(self.cashier)
+        response = self.client.get(reverse('pos:daily_summary'))
+        self.assertEqual(response.status_code, 200)
+        context = response.context
+        
+        sales = [
+            sale for sale in Sale.objects.filter(cashier=self.cashier)
+            if timezone.localtime(sale.created_at).date() == timezone.localdate()
+        ]
+        expected = self.naive_totals(sales)
+        self.assertEqual(expected['refunds_count'], 3)
+        self.assertEqual(context['total_sales'], expected['sales_count'])
+        for field in DAILY_SUMMARY_FIELDS:
+            if field != 'sales_count':
+                self.assertEqual(context[field], expected[field], field)
+        
+        by_hour = {}
+        for sale in sales:
+            by_hour.setdefault(timezone.localtime(sale.created_at).hour, []).append(sale)
+        self.assertEqual([row['hour'] for row in context['hours']], sorted(by_hour))
+        for row in context['hours']:
+            hourly = self.naive_totals(by_hour[row['hour']])
+            self.assertEqual({field: row[field] for field in DAILY_SUMMARY_FIELDS}, hourly)
+        
+        self.assertEqual(context['sales'].paginator.count, len(sales))
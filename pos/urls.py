@@ -17,5 +17,8 @@ urlpatterns = [
     
     # API endpoints
     path('api/search/', views.search_products, name='search_products'),
+    path('api/autocomplete/', views.autocomplete, name='autocomplete'),
     path('api/barcode/', views.get_product_by_barcode, name='get_by_barcode'),
+    path('api/catalog/', views.product_catalog, name='catalog'),
+    path('api/products/', views.product_page, name='products'),
 ]
@@ -1,20 +1,64 @@
 """Views for POS app."""
 
 import json
+from datetime import datetime, time, timedelta, timezone as dt_timezone
 from decimal import Decimal
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Sum, Q
+from django.http import HttpResponseNotModified, JsonResponse
+from django.db.models import Count, Max, Sum, Q
+from django.db.models.functions import ExtractHour
+from django.core.paginator import Paginator
 from django.views.decorators.http import require_POST
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from functools import wraps
+from time import perf_counter
 
+from accounts import metrics
 from accounts.views import company_required
-from inventory.models import Product
-from .models import Sale, SaleItem
+from inventory.models import Category, Product
+from inventory.pagination import keyset_page
+from inventory.search import filter_products
+from .models import Sale
 from .forms import CheckoutForm
+from .services import CheckoutError, checkout
+from . import product_index
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Longest a transaction writing products is expected to stay open. Product
+# updated_at is stamped before commit, so a row can become visible after
+# rows stamped later; catalog deltas reach back this far to catch it
+CATALOG_OVERLAP = timedelta(seconds=60)
+
+# Products per page in the POS grid
+PRODUCT_PAGE_SIZE = 40
+
+# Sales per page in the daily summary
+DAILY_SUMMARY_PAGE_SIZE = 25
+
+# Summed per hour by daily_summary
+DAILY_SUMMARY_FIELDS = (
+    'sales_count', 'total_amount', 'cash_amount', 'card_amount', 'transfer_amount',
+    'discount_total', 'tax_total', 'refunds_count', 'refunds_amount',
+)
+
+
+def day_range(day):
+    """
+    Filter kwargs selecting sales made on a local date.
+    
+    A plain created_at range (unlike created_at__date) can use the
+    (cashier, created_at) index.
+    """
+    tz = timezone.get_current_timezone()
+    return {
+        'created_at__gte': datetime.combine(day, time.min, tzinfo=tz),
+        'created_at__lt': datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz),
+    }
 
 
 # =============================================================================
@@ -37,15 +81,48 @@ def pos_feature_required(view_func):
     """Check if company has POS feature enabled."""
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if request.user.company:
-            subscription = getattr(request.user.company, 'subscription', None)
-            if subscription and not subscription.plan.has_pos:
-                messages.error(request, 'خطة شركتك لا تتضمن ميزة نقطة البيع.')
-                return redirect('accounts:company_dashboard')
+        if request.tenant.company_id and not request.tenant.has_pos:
+            messages.error(request, 'خطة شركتك لا تتضمن ميزة نقطة البيع.')
+            return redirect('accounts:company_dashboard')
         return view_func(request, *args, **kwargs)
     return wrapper
 
 
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+def product_data(product):
+    """Serialize a product for the POS JavaScript client."""
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': str(product.price),
+        'stock': product.stock,
+        'category_id': product.category_id,
+        'category_name': product.category.name if product.category else 'بدون فئة',
+        'barcode': product.barcode or '',
+        'sku': product.sku or '',
+        'image': product.image.url if product.image else ''
+    }
+
+
+def catalog_version(updated_at, count):
+    """Build a catalog version string from the latest update time and product count."""
+    if updated_at is None:
+        return f'0-{count}'
+    return f'{(updated_at - EPOCH) // timedelta(microseconds=1)}-{count}'
+
+
+def parse_catalog_version(version):
+    """Return the update time encoded in a catalog version, or None if invalid."""
+    try:
+        micros = int(version.split('-', 1)[0])
+    except (AttributeError, ValueError):
+        return None
+    return EPOCH + timedelta(microseconds=micros)
+
+
 # =============================================================================
 # POS INTERFACE
 # =============================================================================
@@ -55,33 +132,15 @@ def pos_feature_required(view_func):
 @pos_feature_required
 def pos_interface(request):
     """Main POS interface."""
-    company = request.user.company
+    company = request.tenant.company
     
-    # Get all active products with stock
-    products = Product.objects.filter(
-        company=company, is_active=True
-    ).select_related('category').order_by('category__name', 'name')
-    
-    # Get categories for filtering
-    categories = products.values_list('category__id', 'category__name').distinct()
-    
-    # Convert products to JSON for JavaScript
-    products_data = []
-    for product in products:
-        products_data.append({
-            'id': product.id,
-            'name': product.name,
-            'price': str(product.price),
-            'stock': product.stock,
-            'category_id': product.category_id if product.category else None,
-            'category_name': product.category.name if product.category else 'بدون فئة',
-            'barcode': product.barcode or '',
-            'image': product.image.url if product.image else ''
-        })
+    # Products are loaded page by page through the products API;
+    # only the categories that have active products are needed here
+    categories = Category.objects.filter(
+        company=company, products__is_active=True
+    ).distinct().order_by('name').values_list('id', 'name')
     
     context = {
-        'products': products,
-        'products_json': json.dumps(products_data),
         'categories': list(categories),
         'company': company,
         'checkout_form': CheckoutForm()
@@ -95,7 +154,9 @@ def pos_interface(request):
 @require_POST
 def process_checkout(request):
     """Process the checkout and create a sale."""
-    company = request.user.company
+    company = request.tenant.company
+    started = perf_counter()
+    outcome = 'error'
     
     try:
         # Parse cart data
@@ -111,10 +172,11 @@ def process_checkout(request):
         amount_paid = Decimal(request.POST.get('amount_paid', '0'))
         notes = request.POST.get('notes', '')
         
-        # Create sale
-        sale = Sale.objects.create(
-            company=company,
-            cashier=request.user,
+        # Create sale, items and stock changes in one atomic pass
+        sale = checkout(
+            company,
+            request.user,
+            cart_data,
             customer_name=customer_name,
             customer_phone=customer_phone,
             discount_percentage=discount_percentage,
@@ -122,32 +184,7 @@ def process_checkout(request):
             amount_paid=amount_paid,
             notes=notes
         )
-        
-        # Add items
-        for item in cart_data:
-            product = get_object_or_404(Product, id=item['id'], company=company)
-            
-            # Check stock
-            if product.stock < item['quantity']:
-                sale.delete()
-                return JsonResponse({
-                    'success': False, 
-                    'error': f'الكمية المطلوبة من {product.name} غير متوفرة'
-                })
-            
-            SaleItem.objects.create(
-                sale=sale,
-                product=product,
-                quantity=item['quantity'],
-                price=product.price,
-                cost=product.cost
-            )
-        
-        # Calculate totals
-        sale.calculate_totals()
-        
-        # Apply stock changes
-        sale.apply_stock_changes()
+        outcome = 'completed'
         
         return JsonResponse({
             'success': True,
@@ -157,8 +194,15 @@ def process_checkout(request):
             'change': str(sale.change)
         })
         
+    except CheckoutError as e:
+        outcome = 'rejected'
+        return JsonResponse({'success': False, 'error': str(e)})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
+    finally:
+        metrics.CHECKOUT_SECONDS.observe(
+            perf_counter() - started, company=company.pk, outcome=outcome
+        )
 
 
 @cashier_required
@@ -166,12 +210,12 @@ def process_checkout(request):
 def print_receipt(request, sale_id):
     """Display printable receipt."""
     sale = get_object_or_404(
-        Sale, id=sale_id, company=request.user.company
+        Sale, id=sale_id, company=request.tenant.company
     )
     
     return render(request, 'pos/receipt.html', {
         'sale': sale,
-        'company': request.user.company
+        'company': request.tenant.company
     })
 
 
@@ -183,27 +227,30 @@ def print_receipt(request, sale_id):
 @company_required
 def sales_history(request):
     """View cashier's sales history."""
-    sales = Sale.objects.filter(
-        cashier=request.user
-    ).order_by('-created_at')
+    sales = Sale.objects.filter(cashier=request.user)
     
     # Filter by date
     date_filter = request.GET.get('date')
     if date_filter:
-        sales = sales.filter(created_at__date=date_filter)
+        try:
+            day = parse_date(date_filter)
+        except ValueError:
+            day = None
+        if day:
+            sales = sales.filter(**day_range(day))
     
     # Today's summary
-    today = timezone.now().date()
+    today = timezone.localdate()
     today_sales = Sale.objects.filter(
         cashier=request.user,
-        created_at__date=today,
-        status=Sale.Status.COMPLETED
-    )
+        status=Sale.Status.COMPLETED,
+        **day_range(today)
+    ).aggregate(count=Count('id'), total=Sum('total'))
     
     context = {
-        'sales': sales[:50],  # Limit to 50 most recent
-        'today_count': today_sales.count(),
-        'today_total': today_sales.aggregate(total=Sum('total'))['total'] or 0
+        'sales': keyset_page(request, sales, ('-created_at', '-id'), 50),
+        'today_count': today_sales['count'],
+        'today_total': today_sales['total'] or 0
     }
     
     return render(request, 'pos/sales_history.html', context)
@@ -212,28 +259,60 @@ def sales_history(request):
 @cashier_required
 @company_required
 def daily_summary(request):
-    """Daily sales summary for cashier."""
-    today = timezone.now().date()
+    """
+    Daily sales summary for cashier.
+    
+    All figures come from a single query grouped by hour, using
+    conditional aggregation; day totals are the sum of the hours.
+    """
+    today = timezone.localdate()
     
     sales = Sale.objects.filter(
         cashier=request.user,
-        created_at__date=today,
-        status=Sale.Status.COMPLETED
+        status__in=[Sale.Status.COMPLETED, Sale.Status.REFUNDED],
+        **day_range(today)
     )
     
-    # Group by payment method
-    cash_sales = sales.filter(payment_method=Sale.PaymentMethod.CASH)
-    card_sales = sales.filter(payment_method=Sale.PaymentMethod.CARD)
-    transfer_sales = sales.filter(payment_method=Sale.PaymentMethod.TRANSFER)
+    completed = Q(status=Sale.Status.COMPLETED)
+    refunded = Q(status=Sale.Status.REFUNDED)
+    hours = list(
+        sales.values(hour=ExtractHour('created_at')).annotate(
+            sales_count=Count('id', filter=completed),
+            total_amount=Sum('total', filter=completed),
+            cash_amount=Sum('total', filter=completed & Q(payment_method=Sale.PaymentMethod.CASH)),
+            card_amount=Sum('total', filter=completed & Q(payment_method=Sale.PaymentMethod.CARD)),
+            transfer_amount=Sum('total', filter=completed & Q(payment_method=Sale.PaymentMethod.TRANSFER)),
+            discount_total=Sum('discount', filter=completed),
+            tax_total=Sum('tax_amount', filter=completed),
+            refunds_count=Count('id', filter=refunded),
+            refunds_amount=Sum('total', filter=refunded),
+        ).order_by('hour')
+    )
+    
+    day = {field: 0 for field in DAILY_SUMMARY_FIELDS}
+    for row in hours:
+        for field in DAILY_SUMMARY_FIELDS:
+            row[field] = row[field] or 0
+            day[field] += row[field]
+    
+    # Row count is already known from the summary, so skip the paginator's COUNT
+    paginator = Paginator(sales.order_by('-created_at'), DAILY_SUMMARY_PAGE_SIZE)
+    paginator.count = day['sales_count'] + day['refunds_count']
+    page = paginator.get_page(request.GET.get('page'))
     
     context = {
         'date': today,
-        'total_sales': sales.count(),
-        'total_amount': sales.aggregate(total=Sum('total'))['total'] or 0,
-        'cash_amount': cash_sales.aggregate(total=Sum('total'))['total'] or 0,
-        'card_amount': card_sales.aggregate(total=Sum('total'))['total'] or 0,
-        'transfer_amount': transfer_sales.aggregate(total=Sum('total'))['total'] or 0,
-        'sales': sales
+        'total_sales': day['sales_count'],
+        'total_amount': day['total_amount'],
+        'cash_amount': day['cash_amount'],
+        'card_amount': day['card_amount'],
+        'transfer_amount': day['transfer_amount'],
+        'discount_total': day['discount_total'],
+        'tax_total': day['tax_total'],
+        'refunds_count': day['refunds_count'],
+        'refunds_amount': day['refunds_amount'],
+        'hours': hours,
+        'sales': page
     }
     
     return render(request, 'pos/daily_summary.html', context)
@@ -243,20 +322,113 @@ def daily_summary(request):
 # API ENDPOINTS
 # =============================================================================
 
+@cashier_required
+@company_required
+@pos_feature_required
+def product_page(request):
+    """One page of active products for the POS grid, filtered server-side."""
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+    
+    products = Product.objects.filter(
+        company=request.tenant.company, is_active=True
+    ).select_related('category').order_by('category__name', 'name', 'id')
+    
+    category_id = request.GET.get('category')
+    if category_id and category_id.isdigit():
+        products = products.filter(category_id=category_id)
+    
+    products = filter_products(products, request.GET.get('q', ''))
+    
+    # Fetch one extra row to know if there is a next page without a COUNT
+    offset = (page - 1) * PRODUCT_PAGE_SIZE
+    rows = list(products[offset:offset + PRODUCT_PAGE_SIZE + 1])
+    
+    return JsonResponse({
+        'page': page,
+        'has_next': len(rows) > PRODUCT_PAGE_SIZE,
+        'products': [product_data(p) for p in rows[:PRODUCT_PAGE_SIZE]],
+    })
+
+
+@cashier_required
+@company_required
+@pos_feature_required
+def product_catalog(request):
+    """
+    Versioned product catalog for POS tills.
+    
+    The version (also sent as ETag) is derived from the latest
+    Product.updated_at and the active product count. Tills send
+    If-None-Match to get a 304 when nothing changed, and ?since=<version>
+    to receive only products changed after that version.
+    
+    updated_at is the time of the write (on PostgreSQL, the start of its
+    transaction), not of the commit, so a product committed late can
+    carry an older stamp than rows the till already has. Deltas therefore
+    overlap the since window by CATALOG_OVERLAP (tills upsert by id, so
+    repeats are harmless), and a version younger than CATALOG_OVERLAP is
+    marked provisional ('-p'): it stops matching once it settles, so the
+    till asks for one more delta instead of getting a 304. Transactions
+    open longer than CATALOG_OVERLAP can still be missed until the next
+    full sync.
+    """
+    products = Product.objects.filter(company=request.tenant.company)
+    latest = products.aggregate(
+        updated_at=Max('updated_at'),
+        count=Count('id', filter=Q(is_active=True))
+    )
+    version = catalog_version(latest['updated_at'], latest['count'])
+    if latest['updated_at'] and timezone.now() - latest['updated_at'] < CATALOG_OVERLAP:
+        version += '-p'
+    etag = f'"{version}"'
+    
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    
+    since = parse_catalog_version(request.GET.get('since'))
+    if since is not None:
+        changed = list(products.filter(
+            updated_at__gt=since - CATALOG_OVERLAP
+        ).select_related('category'))
+        data = {
+            'version': version,
+            'full': False,
+            'count': latest['count'],
+            'products': [product_data(p) for p in changed if p.is_active],
+            'removed': [p.id for p in changed if not p.is_active],
+        }
+    else:
+        active = products.filter(is_active=True).select_related('category').order_by('name')
+        data = {
+            'version': version,
+            'full': True,
+            'count': latest['count'],
+            'products': [product_data(p) for p in active],
+            'removed': [],
+        }
+    
+    response = JsonResponse(data)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @cashier_required
 @company_required
 def search_products(request):
     """Search products by name, SKU, or barcode."""
     query = request.GET.get('q', '')
-    company = request.user.company
+    company = request.tenant.company
     
-    products = Product.objects.filter(
-        company=company,
-        is_active=True
-    ).filter(
-        Q(name__icontains=query) |
-        Q(sku__icontains=query) |
-        Q(barcode__icontains=query)
+    products = filter_products(
+        Product.objects.filter(company=company, is_active=True),
+        query,
+        ranked=True
     )[:20]
     
     data = [{
@@ -270,27 +442,33 @@ def search_products(request):
     return JsonResponse({'products': data})
 
 
+@cashier_required
+@company_required
+@pos_feature_required
+def autocomplete(request):
+    """Name completions for the POS search box as compact [id, name, price] rows."""
+    results = product_index.complete(request.tenant.company_id, request.GET.get('q', ''))
+    
+    response = JsonResponse({'results': results})
+    response['Cache-Control'] = 'private, max-age=30'
+    return response
+
+
 @cashier_required
 @company_required
 def get_product_by_barcode(request):
-    """Get single product by barcode."""
-    barcode = request.GET.get('barcode', '')
-    company = request.user.company
+    """Get single product by barcode (or SKU)."""
+    barcode = request.GET.get('barcode', '').strip()
     
-    try:
-        product = Product.objects.get(
-            company=company,
-            barcode=barcode,
-            is_active=True
-        )
-        return JsonResponse({
-            'found': True,
-            'product': {
-                'id': product.id,
-                'name': product.name,
-                'price': str(product.price),
-                'stock': product.stock
-            }
-        })
-    except Product.DoesNotExist:
+    # Served from the in-memory barcode/SKU index, not the database
+    product = product_index.lookup(request.tenant.company_id, barcode)
+    metrics.BARCODE_LOOKUPS.inc(
+        company=request.tenant.company_id, result='miss' if product is None else 'hit'
+    )
+    if product is None:
         return JsonResponse({'found': False})
+    
+    return JsonResponse({
+        'found': True,
+        'product': product
+    })
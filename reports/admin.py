@@ -0,0 +1,16 @@
+from django.contrib import admin
+from .models import DailySalesRollup
+
+
+@admin.register(DailySalesRollup)
+class DailySalesRollupAdmin(admin.ModelAdmin):
+    """Rollups are maintained by checkouts/refunds and rebuild_sales_rollups."""
+    list_display = ['date', 'company', 'cashier', 'payment_method', 'sales_count', 'total', 'profit', 'refunds_count']
+    list_filter = ['company', 'payment_method', 'date']
+    readonly_fields = [field.name for field in DailySalesRollup._meta.fields]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
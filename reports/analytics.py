@@ -0,0 +1,89 @@
+"""
+Profit and margin analytics over POS sale items.
+
+Everything is computed by the database: item revenue, cost and profit
+are SQL expressions over SaleItem columns, grouped by product, category,
+cashier or period, so only one row per group is ever loaded, however
+many sale items are involved.
+
+Only completed sales are counted. Profit here is per item,
+(price - cost) x quantity, before sale-level discounts and tax; the
+daily sales rollups report profit after discounts.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek, TruncYear
+from django.utils import timezone
+
+from pos.models import Sale, SaleItem
+
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+ITEM_COST = ExpressionWrapper(F('cost') * F('quantity'), output_field=MONEY)
+ITEM_PROFIT = ExpressionWrapper((F('price') - F('cost')) * F('quantity'), output_field=MONEY)
+
+# Aggregates computed for every group. Order matters: an alias shadows the
+# SaleItem field of the same name for the aggregates that follow it.
+METRICS = {
+    'profit': Sum(ITEM_PROFIT),
+    'cost': Sum(ITEM_COST),
+    'quantity': Sum('quantity'),
+    'revenue': Sum('total'),
+}
+
+# dimension -> (group key, label)
+DIMENSIONS = {
+    'product': ('product_id', 'product__name'),
+    'category': ('product__category_id', 'product__category__name'),
+    'cashier': ('sale__cashier_id', 'sale__cashier__username'),
+}
+
+PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'year': TruncYear,
+}
+
+
+def sale_items(company, start, end):
+    """Items of the company's completed sales made between two local dates, inclusive."""
+    tz = timezone.get_current_timezone()
+    return SaleItem.objects.filter(
+        sale__company=company,
+        sale__status=Sale.Status.COMPLETED,
+        # A plain range on created_at (unlike __date) can use an index
+        sale__created_at__gte=datetime.combine(start, time.min, tzinfo=tz),
+        sale__created_at__lt=datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+
+def with_margin(row):
+    """Add margin (profit as a percentage of revenue) to an aggregated row."""
+    for metric in METRICS:
+        row[metric] = row[metric] or 0
+    row['margin'] = round(row['profit'] / row['revenue'] * 100, 2) if row['revenue'] else 0
+    return row
+
+
+def profit_totals(items):
+    return with_margin(items.aggregate(**METRICS))
+
+
+def profit_by(items, dimension, limit=None, offset=0):
+    """Profit grouped by product, category or cashier, most profitable first."""
+    key, label = DIMENSIONS[dimension]
+    rows = items.values(key=F(key), label=F(label)).annotate(**METRICS).order_by('-profit', 'key')
+    if limit is not None:
+        rows = rows[offset:offset + limit]
+    return [with_margin(row) for row in rows]
+
+
+def profit_by_period(items, period):
+    """Profit grouped by day, week, month or year of the sale, in order."""
+    trunc = PERIODS[period]('sale__created_at')
+    rows = items.values(period=trunc).annotate(**METRICS).order_by('period')
+    return [with_margin(row) for row in rows]
@@ -0,0 +1,82 @@
+"""Rebuild DailySalesRollup rows from Sale and SaleItem history."""
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.db.transaction import atomic
+
+from accounts.models import Company
+from pos.models import Sale, SaleItem
+from reports.models import DailySalesRollup
+
+
+KEY = ('date', 'cashier_id', 'payment_method')
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily sales rollups from sales history, one company at a time.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Only rebuild rollups of this company id.')
+    
+    def handle(self, *args, **options):
+        companies = Company.objects.order_by('pk').values_list('pk', flat=True)
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+        
+        rows = 0
+        for company_id in companies:
+            rollups = self.build(company_id)
+            with atomic():
+                DailySalesRollup.objects.filter(company_id=company_id).delete()
+                DailySalesRollup.objects.bulk_create(rollups, batch_size=500)
+            rows += len(rollups)
+        
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} daily sales rollups.'))
+    
+    def build(self, company_id):
+        completed = Q(status=Sale.Status.COMPLETED)
+        refunded = Q(status=Sale.Status.REFUNDED)
+        
+        sales = Sale.objects.filter(
+            company_id=company_id
+        ).filter(completed | refunded).annotate(
+            date=TruncDate('created_at')
+        ).values(*KEY).annotate(
+            # Refund sums first: later aliases shadow the Sale fields they sum
+            refunds_count=Count('id', filter=refunded),
+            refunds_total=Sum('total', filter=refunded),
+            sales_count=Count('id', filter=completed),
+            subtotal=Sum('subtotal', filter=completed),
+            discount=Sum('discount', filter=completed),
+            tax=Sum('tax_amount', filter=completed),
+            total=Sum('total', filter=completed),
+        ).order_by()
+        
+        costs = dict(
+            (tuple(row[key] for key in KEY), row['cost'])
+            for row in SaleItem.objects.filter(
+                sale__company_id=company_id, sale__status=Sale.Status.COMPLETED
+            ).values(
+                date=TruncDate('sale__created_at'),
+                cashier_id=F('sale__cashier_id'),
+                payment_method=F('sale__payment_method'),
+            ).annotate(
+                cost=Sum(F('cost') * F('quantity'))
+            ).order_by()
+        )
+        
+        rollups = []
+        for row in sales:
+            amounts = {field: row[field] or 0 for field in DailySalesRollup.AMOUNT_FIELDS if field in row}
+            cost = costs.get(tuple(row[key] for key in KEY)) or 0
+            rollups.append(DailySalesRollup(
+                company_id=company_id,
+                date=row['date'],
+                cashier_id=row['cashier_id'],
+                payment_method=row['payment_method'],
+                cost=cost,
+                profit=amounts['subtotal'] - amounts['discount'] - cost,
+                **amounts
+            ))
+        return rollups
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.11 on 2026-10-17 01:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0002_company_tax_enabled_company_tax_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='التاريخ')),
+                ('payment_method', models.CharField(max_length=20, verbose_name='طريقة الدفع')),
+                ('sales_count', models.IntegerField(default=0, verbose_name='عدد المبيعات')),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='المجموع الفرعي')),
+                ('discount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='الخصم')),
+                ('tax', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='الضريبة')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='الإجمالي')),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='التكلفة')),
+                ('profit', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='الربح')),
+                ('refunds_count', models.IntegerField(default=0, verbose_name='عدد المرتجعات')),
+                ('refunds_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='إجمالي المرتجعات')),
+                ('cashier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to=settings.AUTH_USER_MODEL, verbose_name='الكاشير')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='accounts.company', verbose_name='الشركة')),
+            ],
+            options={
+                'verbose_name': 'ملخص مبيعات يومي',
+                'verbose_name_plural': 'ملخصات المبيعات اليومية',
+                'ordering': ['-date'],
+                'unique_together': {('company', 'date', 'cashier', 'payment_method')},
+            },
+        ),
+    ]
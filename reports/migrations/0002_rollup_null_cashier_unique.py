@@ -0,0 +1,50 @@
+# Generated by Django 4.2.11 on 2026-10-17 02:31
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+AMOUNT_FIELDS = (
+    'sales_count', 'subtotal', 'discount', 'tax', 'total',
+    'cost', 'profit', 'refunds_count', 'refunds_total',
+)
+
+
+def merge_cashierless_rollups(apps, schema_editor):
+    """Merge the rows left without a cashier for the same company, day and payment method."""
+    DailySalesRollup = apps.get_model('reports', 'DailySalesRollup')
+    duplicates = DailySalesRollup.objects.filter(cashier__isnull=True).values(
+        'company_id', 'date', 'payment_method'
+    ).annotate(rows=Count('id')).filter(rows__gt=1).order_by()
+
+    for key in duplicates:
+        del key['rows']
+        keep, *merged = DailySalesRollup.objects.filter(cashier__isnull=True, **key).order_by('pk')
+        for rollup in merged:
+            for field in AMOUNT_FIELDS:
+                setattr(keep, field, getattr(keep, field) + getattr(rollup, field))
+        keep.save(update_fields=AMOUNT_FIELDS)
+        DailySalesRollup.objects.filter(pk__in=[rollup.pk for rollup in merged]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='dailysalesrollup',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='dailysalesrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('cashier__isnull', False)), fields=('company', 'date', 'cashier', 'payment_method'), name='rollup_cashier_unique'),
+        ),
+        migrations.RunPython(merge_cashierless_rollups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailysalesrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('cashier__isnull', True)), fields=('company', 'date', 'payment_method'), name='rollup_no_cashier_unique'),
+        ),
+    ]
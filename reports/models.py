@@ -0,0 +1,174 @@
+"""
+Reports models for multi-tenant SaaS platform.
+
+This module contains models for:
+- Daily Sales Rollups (pre-aggregated POS sales per day)
+"""
+
+from django.db import models
+from django.db.models import F, Q
+from django.db.transaction import atomic
+from django.utils import timezone
+from decimal import Decimal
+
+
+CENT = Decimal('0.01')
+
+
+# =============================================================================
+# DAILY SALES ROLLUP
+# =============================================================================
+
+class DailySalesRollupManager(models.Manager):
+    """Keeps rollups in step with checkouts and refunds."""
+    
+    def rollup_key(self, sale):
+        return {
+            'company_id': sale.company_id,
+            'date': timezone.localdate(sale.created_at),
+            'cashier_id': sale.cashier_id,
+            'payment_method': sale.payment_method,
+        }
+    
+    def record_sale(self, sale, cost):
+        """Add a completed sale to its day's rollup."""
+        self.add(sale, cost, sign=1)
+    
+    def record_refund(self, sale, cost):
+        """Move a refunded sale out of its day's totals and into its refunds."""
+        self.add(sale, cost, sign=-1)
+    
+    def add(self, sale, cost, sign):
+        # Amounts are rounded as they were stored on the sale
+        subtotal = Decimal(sale.subtotal).quantize(CENT)
+        discount = Decimal(sale.discount).quantize(CENT)
+        tax = Decimal(sale.tax_amount).quantize(CENT)
+        total = Decimal(sale.total).quantize(CENT)
+        
+        values = {
+            'sales_count': F('sales_count') + sign,
+            'subtotal': F('subtotal') + sign * subtotal,
+            'discount': F('discount') + sign * discount,
+            'tax': F('tax') + sign * tax,
+            'total': F('total') + sign * total,
+            'cost': F('cost') + sign * cost,
+            'profit': F('profit') + sign * (subtotal - discount - cost),
+        }
+        if sign < 0:
+            values['refunds_count'] = F('refunds_count') + 1
+            values['refunds_total'] = F('refunds_total') + total
+        
+        self.apply(self.rollup_key(sale), values)
+    
+    def apply(self, key, values):
+        """Update the rollup row of key, creating it first if needed."""
+        if not self.filter(**key).update(**values):
+            # First sale of the day for this key; another checkout may create it first
+            self.bulk_create([self.model(**key)], ignore_conflicts=True)
+            self.filter(**key).update(**values)
+    
+    @atomic
+    def detach_cashier(self, cashier_id):
+        """
+        Fold a cashier's rollups into the rows without a cashier.
+        
+        Called before the cashier is deleted: SET_NULL would otherwise turn
+        them into extra cashier-less rows, which refunds of the cashier's
+        sales (now without a cashier too) would all update.
+        """
+        rollups = list(self.filter(cashier_id=cashier_id))
+        for rollup in rollups:
+            self.apply(
+                {
+                    'company_id': rollup.company_id,
+                    'date': rollup.date,
+                    'cashier_id': None,
+                    'payment_method': rollup.payment_method,
+                },
+                {field: F(field) + getattr(rollup, field) for field in self.model.AMOUNT_FIELDS}
+            )
+        self.filter(pk__in=[rollup.pk for rollup in rollups]).delete()
+
+
+class DailySalesRollup(models.Model):
+    """
+    POS sales of one company, day, cashier and payment method.
+    
+    Amounts cover completed sales only: a refund removes the sale from the
+    day it was made and is counted in refunds_count/refunds_total there.
+    profit is subtotal - discount - cost, i.e. before tax.
+    """
+    
+    company = models.ForeignKey(
+        'accounts.Company', on_delete=models.CASCADE,
+        related_name='sales_rollups', verbose_name='الشركة'
+    )
+    date = models.DateField(verbose_name='التاريخ')
+    cashier = models.ForeignKey(
+        'accounts.User', on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='sales_rollups',
+        verbose_name='الكاشير'
+    )
+    payment_method = models.CharField(max_length=20, verbose_name='طريقة الدفع')
+    
+    sales_count = models.IntegerField(default=0, verbose_name='عدد المبيعات')
+    subtotal = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        verbose_name='المجموع الفرعي'
+    )
+    discount = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        verbose_name='الخصم'
+    )
+    tax = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        verbose_name='الضريبة'
+    )
+    total = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        verbose_name='الإجمالي'
+    )
+    cost = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        verbose_name='التكلفة'
+    )
+    profit = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        verbose_name='الربح'
+    )
+    
+    refunds_count = models.IntegerField(default=0, verbose_name='عدد المرتجعات')
+    refunds_total = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        verbose_name='إجمالي المرتجعات'
+    )
+    
+    objects = DailySalesRollupManager()
+    
+    # Summed by report views
+    AMOUNT_FIELDS = (
+        'sales_count', 'subtotal', 'discount', 'tax', 'total',
+        'cost', 'profit', 'refunds_count', 'refunds_total',
+    )
+    
+    class Meta:
+        verbose_name = 'ملخص مبيعات يومي'
+        verbose_name_plural = 'ملخصات المبيعات اليومية'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'date', 'cashier', 'payment_method'],
+                condition=Q(cashier__isnull=False),
+                name='rollup_cashier_unique',
+            ),
+            # NULLs never collide in a plain unique constraint; keep one
+            # cashier-less row per company, day and payment method
+            models.UniqueConstraint(
+                fields=['company', 'date', 'payment_method'],
+                condition=Q(cashier__isnull=True),
+                name='rollup_no_cashier_unique',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.company} - {self.date} - {self.total}"
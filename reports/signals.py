@@ -0,0 +1,23 @@
+"""Signal handlers for reports app."""
+
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from accounts.models import User
+from pos.signals import sale_completed, sale_refunded
+from .models import DailySalesRollup
+
+
+@receiver(sale_completed)
+def rollup_sale(sender, sale, cost, **kwargs):
+    DailySalesRollup.objects.record_sale(sale, cost)
+
+
+@receiver(sale_refunded)
+def rollup_refund(sender, sale, cost, **kwargs):
+    DailySalesRollup.objects.record_refund(sale, cost)
+
+
+@receiver(pre_delete, sender=User)
+def detach_cashier_rollups(sender, instance, **kwargs):
+    DailySalesRollup.objects.detach_cashier(instance.pk)
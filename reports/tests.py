@@ -0,0 +1,196 @@
+"""Tests for the reports app."""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Company, CompanySubscription, SubscriptionPlan, User
+from inventory.models import Category, Product
+from pos.models import Sale, SaleItem
+from pos.services import checkout
+from . import analytics
+from .models import DailySalesRollup
+
+
+class DeletedCashierRollupTests(TestCase):
+    """Rollups of deleted cashiers fold into one cashier-less row per day and payment method."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        cls.product = Product.objects.create(
+            company=cls.company, name='product', price=Decimal('10'), cost=Decimal('6'), stock=100
+        )
+    
+    def sell(self, cashier):
+        return checkout(
+            self.company, cashier, [{'id': self.product.pk, 'quantity': 1}],
+            payment_method=Sale.PaymentMethod.CASH, amount_paid=Decimal('10')
+        )
+    
+    def test_refund_after_cashiers_are_deleted_counts_once(self):
+        sales = []
+        for name in ('first', 'second'):
+            cashier = User.objects.create_user(
+                username=name, password='password', company=self.company, role=User.Role.CASHIER
+            )
+            sales.append(self.sell(cashier))
+            sales.append(self.sell(cashier))
+            cashier.delete()
+        
+        rollups = DailySalesRollup.objects.filter(company=self.company)
+        self.assertEqual(rollups.count(), 1)
+        self.assertEqual(rollups.get().sales_count, 4)
+        
+        Sale.objects.get(pk=sales[0].pk).refund()
+        
+        rollup = rollups.get()
+        self.assertEqual(rollup.cashier_id, None)
+        self.assertEqual(rollup.sales_count, 3)
+        self.assertEqual(rollup.total, Decimal('30.00'))
+        self.assertEqual(rollup.refunds_count, 1)
+
+
+class ReportRangeTests(TestCase):
+    """Invalid ?start=/?end= dates fall back to the current month."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        plan = SubscriptionPlan.objects.create(name='plan', max_products=100, max_users=10)
+        company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        CompanySubscription.objects.create(
+            company=company, plan=plan, status=CompanySubscription.Status.ACTIVE,
+            start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=30)
+        )
+        cls.accountant = User.objects.create_user(
+            username='accountant', password='password', company=company, role=User.Role.ACCOUNTANT
+        )
+    
+    def setUp(self):
+        self.client.force_login(self.accountant)
+        today = timezone.localdate()
+        self.default = (today.replace(day=1), today)
+    
+    def test_impossible_dates_use_default_range(self):
+        params = {'start': '2026-13-45', 'end': '2026-02-30'}
+        for name in ('reports:sales', 'reports:profit'):
+            response = self.client.get(reverse(name), params)
+            self.assertEqual(response.status_code, 200, name)
+            self.assertEqual((response.context['start'], response.context['end']), self.default, name)
+        
+        response = self.client.get(reverse('reports:profit_api'), params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['start'], data['end']), tuple(day.isoformat() for day in self.default))
+    
+    def test_malformed_date_uses_default(self):
+        response = self.client.get(reverse('reports:sales'), {'start': 'yesterday'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['start'], self.default[0])
+
+
+class ProfitAnalyticsTests(TestCase):
+    """The SQL profit aggregates agree with summing completed sale items one by one."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='company', email='company@example.com', phone='1')
+        other = Company.objects.create(name='other', email='other@example.com', phone='2')
+        drinks = Category.objects.create(company=cls.company, name='drinks')
+        food = Category.objects.create(company=cls.company, name='food')
+        products = [
+            Product.objects.create(
+                company=cls.company, category=category, name=name,
+                price=Decimal(price), cost=Decimal(cost), stock=1000
+            )
+            for category, name, price, cost in (
+                (drinks, 'tea', '5.50', '2.25'), (drinks, 'juice', '8', '6.10'),
+                (food, 'bread', '3', '1'), (None, 'bag', '0.75', '0.80'),
+            )
+        ]
+        cashiers = [
+            User.objects.create_user(
+                username=name, password='password', company=cls.company, role=User.Role.CASHIER
+            )
+            for name in ('first', 'second')
+        ]
+        
+        cls.today = timezone.localdate()
+        tz = timezone.get_current_timezone()
+        for i in range(20):
+            cart = [
+                {'id': products[(i + j) % len(products)].pk, 'quantity': (i + j) % 3 + 1}
+                for j in range(i % 3 + 1)
+            ]
+            sale = checkout(
+                cls.company, cashiers[i % 2], cart,
+                payment_method=Sale.PaymentMethod.CASH, amount_paid=Decimal('1000')
+            )
+            # Days 0-4 ago at noon, plus one sale 40 days ago, outside the range
+            days = 40 if i == 19 else i % 5
+            noon = datetime.combine(cls.today - timedelta(days=days), time(12), tzinfo=tz)
+            Sale.objects.filter(pk=sale.pk).update(created_at=noon)
+            if i % 7 == 3:
+                sale.refund()
+        
+        foreign = Product.objects.create(company=other, name='foreign', price=Decimal('9'), stock=10)
+        checkout(
+            other, None, [{'id': foreign.pk, 'quantity': 2}],
+            payment_method=Sale.PaymentMethod.CASH, amount_paid=Decimal('100')
+        )
+    
+    def setUp(self):
+        self.start = self.today - timedelta(days=29)
+        self.items = analytics.sale_items(self.company, self.start, self.today)
+    
+    def naive(self, key):
+        """{group: metrics} summed item by item in Python."""
+        groups = {}
+        items = SaleItem.objects.select_related('sale', 'product').filter(sale__company=self.company)
+        for item in items:
+            day = timezone.localtime(item.sale.created_at).date()
+            if item.sale.status != Sale.Status.COMPLETED or not self.start <= day <= self.today:
+                continue
+            row = groups.setdefault(key(item), dict.fromkeys(analytics.METRICS, 0))
+            row['profit'] += (item.price - item.cost) * item.quantity
+            row['cost'] += item.cost * item.quantity
+            row['quantity'] += item.quantity
+            row['revenue'] += item.total
+        return groups
+    
+    def assertRowsMatch(self, rows, expected):
+        self.assertEqual(len(rows), len(expected))
+        for row in rows:
+            self.assertEqual({metric: row[metric] for metric in analytics.METRICS}, expected[row['key']], row['key'])
+    
+    def test_totals(self):
+        expected = self.naive(lambda item: None)[None]
+        totals = analytics.profit_totals(self.items)
+        
+        self.assertEqual({metric: totals[metric] for metric in analytics.METRICS}, expected)
+        self.assertEqual(totals['margin'], round(expected['profit'] / expected['revenue'] * 100, 2))
+        self.assertTrue(Sale.objects.filter(company=self.company, status=Sale.Status.REFUNDED).exists())
+    
+    def test_by_dimension(self):
+        keys = {
+            'product': lambda item: item.product_id,
+            'category': lambda item: item.product.category_id,
+            'cashier': lambda item: item.sale.cashier_id,
+        }
+        for dimension, key in keys.items():
+            with self.subTest(dimension):
+                rows = analytics.profit_by(self.items, dimension)
+                self.assertRowsMatch(rows, self.naive(key))
+                profits = [row['profit'] for row in rows]
+                self.assertEqual(profits, sorted(profits, reverse=True))
+    
+    def test_by_period(self):
+        rows = analytics.profit_by_period(self.items, 'day')
+        for row in rows:
+            row['key'] = timezone.localtime(row['period']).date()
+        
+        self.assertRowsMatch(rows, self.naive(lambda item: timezone.localtime(item.sale.created_at).date()))
+        self.assertEqual([row['key'] for row in rows], sorted(row['key'] for row in rows))
@@ -0,0 +1,15 @@
+"""URL routing for reports app."""
+
+from django.urls import path
+from . import views
+
+app_name = 'reports'
+
+urlpatterns = [
+    # Sales
+    path('', views.sales_report, name='sales'),
+    
+    # Profit analytics
+    path('profit/', views.profit_report, name='profit'),
+    path('api/profit/', views.profit_api, name='profit_api'),
+]
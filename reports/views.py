@@ -0,0 +1,190 @@
+"""Views for reports app."""
+
+from django.shortcuts import render, redirect
+from django.http import JsonResponse
+from django.contrib.auth.decorators import login_required
+from django.contrib import messages
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from functools import wraps
+
+from accounts.views import company_required
+from pos.models import Sale
+from . import analytics
+from .models import DailySalesRollup
+
+
+# Sum of every rollup amount, for aggregate()/annotate()
+TOTALS = {field: Sum(field) for field in DailySalesRollup.AMOUNT_FIELDS}
+
+
+# =============================================================================
+# DECORATORS
+# =============================================================================
+
+def report_viewer_required(view_func):
+    """Restrict access to company managers and accountants."""
+    @wraps(view_func)
+    @login_required
+    def wrapper(request, *args, **kwargs):
+        if not (request.user.is_company_manager or request.user.is_accountant):
+            messages.error(request, 'هذه الصفحة مخصصة لمدير الشركة والمحاسبين فقط.')
+            return redirect('accounts:login')
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+def report_date(request, name):
+    """Return the date in ?name= (YYYY-MM-DD), or None if it is missing or invalid."""
+    try:
+        return parse_date(request.GET.get(name) or '')
+    except ValueError:
+        # Well-formed but impossible, e.g. 2026-13-45
+        return None
+
+
+def report_range(request):
+    """Return (start, end) from ?start=&end=, defaulting to the current month."""
+    today = timezone.localdate()
+    start = report_date(request, 'start') or today.replace(day=1)
+    end = report_date(request, 'end') or today
+    if start > end:
+        start, end = end, start
+    return start, end
+
+
+def report_choice(request, name, choices, default):
+    """Return ?name= if it is one of choices, else default."""
+    value = request.GET.get(name)
+    return value if value in choices else default
+
+
+def empty_totals(row):
+    """Replace the None sums of an empty range with zeros."""
+    return {key: value or 0 for key, value in row.items()}
+
+
+# =============================================================================
+# SALES REPORT
+# =============================================================================
+
+@report_viewer_required
+@company_required
+def sales_report(request):
+    """
+    Sales totals for a date range, read from daily rollups.
+    
+    Cost is proportional to the number of days (and cashiers/payment
+    methods) in the range, not to the number of sales.
+    """
+    start, end = report_range(request)
+    group = 'month' if request.GET.get('group') == 'month' else 'day'
+    
+    rollups = DailySalesRollup.objects.filter(
+        company=request.tenant.company, date__range=(start, end)
+    )
+    
+    period = TruncMonth('date') if group == 'month' else F('date')
+    by_period = rollups.values(period=period).annotate(**TOTALS).order_by('period')
+    
+    by_cashier = rollups.values(
+        'cashier_id', 'cashier__username', 'cashier__first_name', 'cashier__last_name'
+    ).annotate(**TOTALS).order_by('-total')
+    
+    methods = dict(Sale.PaymentMethod.choices)
+    by_payment_method = [
+        {**row, 'label': methods.get(row['payment_method'], row['payment_method'])}
+        for row in rollups.values('payment_method').annotate(**TOTALS).order_by('-total')
+    ]
+    
+    context = {
+        'start': start,
+        'end': end,
+        'group': group,
+        'totals': empty_totals(rollups.aggregate(**TOTALS)),
+        'by_period': by_period,
+        'by_cashier': by_cashier,
+        'by_payment_method': by_payment_method,
+    }
+    
+    return render(request, 'reports/sales.html', context)
+
+
+# =============================================================================
+# PROFIT ANALYTICS
+# =============================================================================
+
+# Groups shown on the profit report page
+PROFIT_REPORT_LIMIT = 50
+
+# Largest page the profit API returns
+PROFIT_API_MAX_LIMIT = 500
+
+
+@report_viewer_required
+@company_required
+def profit_report(request):
+    """Profit and margin by product, category, cashier or period."""
+    start, end = report_range(request)
+    dimension = report_choice(request, 'by', [*analytics.DIMENSIONS, 'period'], 'product')
+    period = report_choice(request, 'period', analytics.PERIODS, 'day')
+    
+    items = analytics.sale_items(request.tenant.company, start, end)
+    if dimension == 'period':
+        rows = analytics.profit_by_period(items, period)
+    else:
+        rows = analytics.profit_by(items, dimension, limit=PROFIT_REPORT_LIMIT)
+    
+    context = {
+        'start': start,
+        'end': end,
+        'dimension': dimension,
+        'period': period,
+        'totals': analytics.profit_totals(items),
+        'rows': rows,
+        'limit': PROFIT_REPORT_LIMIT,
+    }
+    
+    return render(request, 'reports/profit.html', context)
+
+
+@report_viewer_required
+@company_required
+def profit_api(request):
+    """
+    Profit analytics as JSON.
+    
+    Query parameters: start, end (YYYY-MM-DD), by=product|category|cashier|period,
+    period=day|week|month|year, and limit/offset for the grouped rows.
+    """
+    start, end = report_range(request)
+    dimension = report_choice(request, 'by', [*analytics.DIMENSIONS, 'period'], 'product')
+    period = report_choice(request, 'period', analytics.PERIODS, 'day')
+    try:
+        limit = min(max(1, int(request.GET.get('limit', 100))), PROFIT_API_MAX_LIMIT)
+        offset = max(0, int(request.GET.get('offset', 0)))
+    except ValueError:
+        return JsonResponse({'error': 'قيمة limit أو offset غير صالحة'}, status=400)
+    
+    items = analytics.sale_items(request.tenant.company, start, end)
+    if dimension == 'period':
+        rows = analytics.profit_by_period(items, period)
+        for row in rows:
+            row['key'] = row['label'] = row.pop('period').date().isoformat()
+    else:
+        rows = analytics.profit_by(items, dimension, limit=limit, offset=offset)
+    
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'by': dimension,
+        'period': period if dimension == 'period' else None,
+        'totals': analytics.profit_totals(items),
+        'rows': rows,
+    })